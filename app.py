@@ -5,9 +5,13 @@ from werkzeug.middleware.proxy_fix import ProxyFix
 import json
 from bot_handlers import BotHandler
 from config import Config
+from temp_storage import temp_storage
+from resilience import resilience
+from bandwidth import bandwidth
+from log_utils import setup_logging, get_stats as get_logging_stats
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging: records are written by a background thread, off the request path
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Create Flask app
@@ -23,14 +27,15 @@ def index():
     """Main page with bot setup instructions"""
     return render_template('index.html', 
                          bot_token=Config.TELEGRAM_BOT_TOKEN,
-                         webhook_url=Config.WEBHOOK_URL)
+                         webhook_url=Config.WEBHOOK_URL,
+                         max_file_size=Config.MAX_FILE_SIZE // (1024*1024))
 
 @app.route('/config')
 def config():
     """Configuration page for API keys and settings"""
     return render_template('config.html', 
                          telegram_token_configured=bool(Config.TELEGRAM_BOT_TOKEN),
-                         google_drive_configured=bool(Config.GOOGLE_DRIVE_CREDENTIALS),
+                         google_drive_configured=bool(Config.GOOGLE_DRIVE_CREDENTIALS or Config.GOOGLE_DRIVE_ACCOUNTS),
                          webhook_url=Config.WEBHOOK_URL,
                          max_file_size=Config.MAX_FILE_SIZE // (1024*1024))
 
@@ -38,7 +43,8 @@ def config():
 def dashboard():
     """Dashboard to monitor bot activity"""
     stats = bot_handler.get_stats()
-    return render_template('dashboard.html', stats=stats)
+    return render_template('dashboard.html', stats=stats, bandwidth=bandwidth.get_stats(),
+                         max_file_size=Config.MAX_FILE_SIZE // (1024*1024))
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
@@ -47,7 +53,8 @@ def webhook():
         if request.headers.get('content-type') == 'application/json':
             json_string = request.get_data().decode('utf-8')
             update = json.loads(json_string)
-            logger.debug(f"Received update: {update}")
+            # Only the id: formatting whole updates on every request is costly and logs user content
+            logger.debug("Received update %s", update.get('update_id'))
             
             # Process the update
             response = bot_handler.process_update(update)
@@ -58,7 +65,7 @@ def webhook():
         else:
             logger.error("Invalid content type")
             return jsonify({"error": "Invalid content type"}), 400
-            
+    
     except Exception as e:
         logger.error(f"Error processing webhook: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -80,12 +87,89 @@ def set_webhook():
 @app.route('/health')
 def health():
     """Health check endpoint"""
+    circuits = resilience.get_stats()
+    open_circuits = [endpoint for endpoint, stats in circuits.items() if stats['state'] != 'closed']
     return jsonify({
-        "status": "healthy",
+        "status": "degraded" if open_circuits else "healthy",
+        "open_circuits": open_circuits,
+        "circuits": circuits,
         "bot_configured": bool(Config.TELEGRAM_BOT_TOKEN),
-        "google_drive_configured": bool(Config.GOOGLE_DRIVE_CREDENTIALS)
+        "google_drive_configured": bool(Config.GOOGLE_DRIVE_CREDENTIALS or Config.GOOGLE_DRIVE_ACCOUNTS),
+        "temp_storage": temp_storage.usage(),
+        "drive_pool": bot_handler.google_drive.get_pool_stats(),
+        "drive_token": bot_handler.google_drive.get_token_stats(),
+        "drive_accounts": bot_handler.google_drive.get_account_stats(),
+        "updates": bot_handler.update_ledger.get_stats(),
+        "single_flight": bot_handler.single_flight.get_stats(),
+        "media": bot_handler.media_service.get_stats(),
+        "mirror": bot_handler.drive_watcher.get_stats(),
+        "bandwidth": bandwidth.get_stats(),
+        "logging": get_logging_stats()
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of bot, storage, Drive and circuit breaker metrics"""
+    lines = []
+    
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    
+    stats = bot_handler.get_stats()
+    for key in ('messages_processed', 'files_uploaded', 'files_downloaded', 'errors'):
+        metric(f"bot_{key}_total", 'counter', f"Bot {key.replace('_', ' ')}", [({}, stats.get(key, 0))])
+    
+    ledger = bot_handler.update_ledger.get_stats()
+    metric('bot_duplicate_updates_total', 'counter', 'Redelivered updates skipped', [({}, ledger['duplicate_updates'])])
+    metric('bot_jobs_attached_total', 'counter', 'Repeated requests attached to a running transfer',
+           [({}, ledger['jobs_attached'])])
+    
+    flights = bot_handler.single_flight.get_stats()
+    metric('bot_coalesced_requests_total', 'counter', 'Requests that shared an identical in-flight fetch',
+           [({}, flights['coalesced'])])
+    
+    media = bot_handler.media_service.get_stats()
+    metric('media_jobs_total', 'counter', 'ffmpeg media jobs completed', [({}, media['jobs'])])
+    metric('media_cpu_seconds_total', 'counter', 'CPU time used by ffmpeg media jobs', [({}, media['cpu_seconds'])])
+    
+    shaping = bandwidth.get_stats()
+    directions = ('ingress', 'egress')
+    metric('bandwidth_bytes_total', 'counter', 'Bytes moved by transfers per direction and priority class',
+           [({'direction': direction, 'class': name}, entry['bytes'])
+            for direction in directions for name, entry in shaping[direction]['classes'].items()])
+    metric('bandwidth_rate_bytes', 'gauge', 'Recent transfer rate in bytes/s per direction and priority class',
+           [({'direction': direction, 'class': name}, entry['rate'])
+            for direction in directions for name, entry in shaping[direction]['classes'].items()])
+    metric('bandwidth_throttled_seconds_total', 'counter', 'Time transfers slept to stay under the bandwidth caps',
+           [({'direction': direction, 'class': name}, entry['waited_seconds'])
+            for direction in directions for name, entry in shaping[direction]['classes'].items()])
+    metric('bandwidth_limit_bytes', 'gauge', 'Configured bandwidth cap in bytes/s, 0 when unlimited',
+           [({'direction': direction}, shaping[direction]['limit']) for direction in directions])
+    
+    usage = temp_storage.usage()
+    metric('temp_storage_reserved_bytes', 'gauge', 'Bytes reserved by spool files', [({}, usage['reserved'])])
+    metric('temp_storage_budget_bytes', 'gauge', 'Temp storage budget', [({}, usage['budget'])])
+    
+    pool = bot_handler.google_drive.get_pool_stats()
+    metric('drive_clients_in_use', 'gauge', 'Drive clients checked out', [({}, pool['in_use'])])
+    metric('drive_clients_size', 'gauge', 'Drive client pool size', [({}, pool['size'])])
+    metric('drive_client_overflows_total', 'counter', 'One-off Drive clients built instead of waiting on a full pool',
+           [({}, pool['overflows'])])
+    
+    circuits = resilience.get_stats()
+    states = {'closed': 0, 'half_open': 1, 'open': 2}
+    metric('circuit_state', 'gauge', 'Circuit breaker state (0 closed, 1 half-open, 2 open)',
+           [({'endpoint': endpoint}, states[stats['state']]) for endpoint, stats in circuits.items()])
+    for key in ('calls', 'failures', 'retries', 'short_circuits', 'opened'):
+        metric(f"endpoint_{key}_total", 'counter', f"Outbound {key.replace('_', ' ')} per endpoint",
+               [({'endpoint': endpoint}, stats[key]) for endpoint, stats in circuits.items()])
+    
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
@@ -0,0 +1,372 @@
+import collections
+import io
+import logging
+import os
+import threading
+import time
+import zipfile
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Media and archive formats are already compressed; deflating them only burns CPU
+STORED_EXTENSIONS = (
+    set(Config.ALLOWED_EXTENSIONS['video'])
+    | set(Config.ALLOWED_EXTENSIONS['audio'])
+    | set(Config.ALLOWED_EXTENSIONS['image'])
+    | set(Config.ALLOWED_EXTENSIONS['archive'])
+) - {'.wav', '.bmp'}
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+def compression_for(filename):
+    """Pick store mode for already-compressed formats and deflate for the rest"""
+    _, ext = os.path.splitext(filename.lower())
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+class ChunkPipe:
+    """
+    Bounded in-memory byte pipe between a producer and a consumer thread.
+    At most max_chunks writes are buffered, so a slow consumer throttles the
+    producer instead of letting data pile up in memory.
+    """
+    
+    def __init__(self, max_chunks=16):
+        self.chunks = collections.deque()
+        self.max_chunks = max_chunks
+        self.cond = threading.Condition()
+        self.eof = False
+        self.aborted = False
+        self._pending = memoryview(b'')
+    
+    def write(self, data):
+        """Queue bytes for the consumer, blocking while the pipe is full"""
+        if not data:
+            return 0
+        
+        with self.cond:
+            while len(self.chunks) >= self.max_chunks and not self.aborted:
+                self.cond.wait()
+            if self.aborted:
+                raise BrokenPipeError("Pipe consumer stopped reading")
+            self.chunks.append(bytes(data))
+            self.cond.notify_all()
+        return len(data)
+    
+    def close(self):
+        """Signal that the producer has written everything"""
+        with self.cond:
+            self.eof = True
+            self.cond.notify_all()
+    
+    def abort(self):
+        """Stop the pipe from either side, dropping anything still buffered"""
+        with self.cond:
+            self.aborted = True
+            self.chunks.clear()
+            self.cond.notify_all()
+    
+    def _next_chunk(self):
+        with self.cond:
+            while not self.chunks and not self.eof and not self.aborted:
+                self.cond.wait()
+            if self.chunks:
+                chunk = self.chunks.popleft()
+                self.cond.notify_all()
+                return chunk
+            return None
+    
+    def __iter__(self):
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return
+            yield chunk
+    
+    def read(self, size=-1):
+        """Read up to size bytes (everything when size is negative)"""
+        parts = []
+        remaining = size
+        while size < 0 or remaining > 0:
+            if not self._pending:
+                chunk = self._next_chunk()
+                if chunk is None:
+                    break
+                self._pending = memoryview(chunk)
+            
+            take = self._pending if size < 0 else self._pending[:remaining]
+            parts.append(take)
+            self._pending = self._pending[len(take):]
+            remaining -= len(take)
+        
+        return b''.join(parts)
+
+class PipedUpload:
+    """
+    Writable sink that feeds an uploader running in a background thread.
+    The consume callable receives the pipe (iterable of chunks with read())
+    and its return value becomes the result of close().
+    """
+    
+    def __init__(self, consume, name='upload'):
+        self.name = name
+        self.pipe = ChunkPipe()
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(consume,),
+                                       name=f'piped-{name}', daemon=True)
+        self.thread.start()
+    
+    def _run(self, consume):
+        try:
+            self.result = consume(self.pipe)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Unblock the producer if the consumer stopped early
+            self.pipe.abort()
+    
+    def write(self, data):
+        return self.pipe.write(data)
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        """Finish the upload and return the consumer's result"""
+        self.pipe.close()
+        self.thread.join()
+        if self.error:
+            raise self.error
+        if not self.result:
+            raise IOError(f"Upload of {self.name} failed")
+        return self.result
+    
+    def abort(self):
+        """Cancel the upload without waiting for the consumer to succeed"""
+        self.pipe.abort()
+        self.thread.join(timeout=30)
+
+class VolumeWriter(io.RawIOBase):
+    """
+    Non-seekable stream that cuts its output into volumes of at most
+    volume_size bytes. Each volume is a sink returned by open_volume(index)
+    (1-based); the concatenated volumes form the original byte stream.
+    """
+    
+    def __init__(self, open_volume, volume_size):
+        super().__init__()
+        self.open_volume = open_volume
+        self.volume_size = volume_size
+        self.index = 0
+        self.current = None
+        self.current_size = 0
+        self.position = 0
+        self.results = []
+    
+    def writable(self):
+        return True
+    
+    def seekable(self):
+        return False
+    
+    def tell(self):
+        return self.position
+    
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        written = 0
+        while written < len(view):
+            if self.current is None or self.current_size >= self.volume_size:
+                self._next_volume()
+            
+            room = self.volume_size - self.current_size
+            part = view[written:written + room]
+            self.current.write(part)
+            self.current_size += len(part)
+            written += len(part)
+        
+        self.position += written
+        return written
+    
+    def _next_volume(self):
+        if self.current is not None:
+            self.results.append(self.current.close())
+        self.index += 1
+        self.current = self.open_volume(self.index)
+        self.current_size = 0
+    
+    def close(self):
+        """Finish the last volume and return the results of every volume"""
+        if not self.closed:
+            try:
+                if self.current is not None:
+                    self.results.append(self.current.close())
+                    self.current = None
+            finally:
+                super().close()
+        return self.results
+    
+    def abort(self):
+        """Cancel the volume in progress"""
+        if self.current is not None:
+            self.current.abort()
+            self.current = None
+        if not self.closed:
+            super().close()
+
+class StreamingZipWriter:
+    """
+    Writes a zip archive straight into a non-seekable sink.
+    Entries are streamed with data descriptors, so neither an entry nor the
+    archive is ever held on disk or in memory.
+    """
+    
+    def __init__(self, sink):
+        self.sink = sink
+        self.zip = zipfile.ZipFile(sink, mode='w', allowZip64=True)
+        self.names = set()
+    
+    def _unique_name(self, arcname):
+        name = arcname
+        base, ext = os.path.splitext(arcname)
+        counter = 2
+        while name in self.names:
+            name = f"{base} ({counter}){ext}"
+            counter += 1
+        self.names.add(name)
+        return name
+    
+    def open_entry(self, arcname, size=None):
+        """Open a writable entry; size is a hint used to avoid zip64 headers"""
+        zinfo = zipfile.ZipInfo(self._unique_name(arcname), date_time=time.localtime()[:6])
+        zinfo.compress_type = compression_for(arcname)
+        force_zip64 = size is None or size >= zipfile.ZIP64_LIMIT
+        return self.zip.open(zinfo, mode='w', force_zip64=force_zip64)
+    
+    def add_file(self, file_path, arcname=None):
+        """Copy a local file into the archive in fixed-size chunks"""
+        arcname = arcname or os.path.basename(file_path)
+        with open(file_path, 'rb') as src, self.open_entry(arcname, os.path.getsize(file_path)) as dest:
+            while True:
+                chunk = src.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dest.write(chunk)
+    
+    def add_chunks(self, arcname, chunks, size=None):
+        """Write an iterable of byte chunks as one entry"""
+        with self.open_entry(arcname, size) as dest:
+            for chunk in chunks:
+                if chunk:
+                    dest.write(chunk)
+    
+    def close(self):
+        """Write the central directory and close the sink"""
+        self.zip.close()
+        return self.sink.close()
+    
+    def abort(self):
+        """Give up on the archive and cancel the sink"""
+        try:
+            self.sink.abort()
+        except Exception as e:
+            logger.error(f"Error aborting archive sink: {str(e)}")
+
+def deflate_bound(size):
+    """Largest deflate output for size bytes of input (zlib's compressBound), reached on incompressible data"""
+    return size + (size >> 12) + (size >> 14) + (size >> 25) + 13
+
+def estimate_zip_size(entries):
+    """
+    Upper bound on the archive size for (arcname, size) entries. It must never
+    be below the real size: callers decide up front whether to name the
+    output as numbered volumes.
+    """
+    total = 100
+    for name, size in entries:
+        data = size if compression_for(name) == zipfile.ZIP_STORED else deflate_bound(size)
+        # Local header + data descriptor + central directory record, with zip64 extras
+        total += data + 2 * len(name.encode('utf-8')) + 200
+    return total
+
+class MultipartStream(io.RawIOBase):
+    """
+    Readable multipart/form-data body around a buffer of known size.
+    The payload is served as memoryview slices of the original buffer, so a
+    memory-mapped file is never copied into an intermediate bytes object.
+    Small extra files (e.g. a thumbnail) go in attachments as
+    {field: (filename, bytes)}. A bandwidth flow, if given, is charged for
+    every read, including reads of a body sent again after a retry.
+    """
+    
+    def __init__(self, fields, file_field, filename, payload, boundary, attachments=None, flow=None):
+        super().__init__()
+        safe_name = filename.replace('"', "'")
+        head = b''.join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+            for name, value in fields.items()
+        )
+        for name, (attachment_name, data) in (attachments or {}).items():
+            head += (f'--{boundary}\r\n'
+                     f'Content-Disposition: form-data; name="{name}"; filename="{attachment_name}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8') + data + b'\r\n'
+        head += (f'--{boundary}\r\n'
+                 f'Content-Disposition: form-data; name="{file_field}"; filename="{safe_name}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+        tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        self.segments = [memoryview(head), memoryview(payload).cast('B'), memoryview(tail)]
+        self.length = sum(len(segment) for segment in self.segments)
+        self.segment_index = 0
+        self.offset = 0
+        self.flow = flow
+    
+    def __len__(self):
+        return self.length
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def tell(self):
+        return sum(len(segment) for segment in self.segments[:self.segment_index]) + self.offset
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Reposition the body, e.g. to send it again after a failed request"""
+        if whence == io.SEEK_CUR:
+            offset += self.tell()
+        elif whence == io.SEEK_END:
+            offset += self.length
+        offset = max(0, min(offset, self.length))
+        
+        self.segment_index = 0
+        self.offset = offset
+        while self.segment_index < len(self.segments) - 1 and self.offset >= len(self.segments[self.segment_index]):
+            self.offset -= len(self.segments[self.segment_index])
+            self.segment_index += 1
+        return offset
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length
+        
+        while self.segment_index < len(self.segments):
+            segment = self.segments[self.segment_index]
+            if self.offset < len(segment):
+                data = segment[self.offset:self.offset + size]
+                self.offset += len(data)
+                if self.flow is not None:
+                    self.flow.consume(len(data))
+                return data
+            self.segment_index += 1
+            self.offset = 0
+        return b''
+    
+    def close(self):
+        """Release the payload view so a memory-mapped source can be closed"""
+        if not self.closed:
+            for segment in self.segments:
+                segment.release()
+        super().close()
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from config import Config
+
+INGRESS = 'ingress'
+EGRESS = 'egress'
+DIRECTIONS = (INGRESS, EGRESS)
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+CLASSES = (INTERACTIVE, BULK)
+INTERACTIVE_GRACE = 1.0  # seconds an interactive transfer still counts as running after its next chunk is due
+
+class TokenBucket:
+    """
+    Token bucket that may go into debt: bytes are charged after they moved,
+    and the caller sleeps until the balance is paid back. Holds at most one
+    second of burst.
+    """
+    
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def set_rate(self, rate, now):
+        self._refill(now)
+        self.rate = rate
+    
+    def charge(self, nbytes, now):
+        """Take nbytes; returns the seconds until the balance is back at zero"""
+        self._refill(now)
+        self.tokens -= nbytes
+        return max(0.0, -self.tokens / self.rate)
+
+class RateMeter:
+    """Bytes per second over the last few seconds, kept in one-second slots"""
+    
+    def __init__(self, window):
+        self.window = window
+        self.slots = deque()
+        self.total = 0
+    
+    def _expire(self, second):
+        while self.slots and self.slots[0][0] <= second - self.window:
+            self.slots.popleft()
+    
+    def add(self, nbytes, now):
+        second = int(now)
+        if self.slots and self.slots[-1][0] == second:
+            self.slots[-1][1] += nbytes
+        else:
+            self.slots.append([second, nbytes])
+            self._expire(second)
+        self.total += nbytes
+    
+    def rate(self, now):
+        self._expire(int(now))
+        return sum(nbytes for _, nbytes in self.slots) / self.window
+
+class Flow:
+    """One transfer in one direction; every chunk loop reports the bytes it moved through consume()"""
+    
+    def __init__(self, manager, direction, priority):
+        self.manager = manager
+        self.direction = direction
+        self.priority = priority
+        self.transferred = 0
+    
+    def consume(self, nbytes):
+        if not nbytes:
+            return
+        self.transferred += nbytes
+        if self.priority == INTERACTIVE and self.transferred > self.manager.interactive_max:
+            # A transfer of unknown size that turned out large stops counting as interactive
+            self.priority = BULK
+        self.manager.consume(self.direction, self.priority, nbytes)
+    
+    def iter(self, chunks):
+        """Pass an iterable of byte chunks through, charging each one"""
+        for chunk in chunks:
+            self.consume(len(chunk))
+            yield chunk
+
+class ThrottledReader:
+    """File-like wrapper that charges every read to a flow; seek and tell pass through"""
+    
+    def __init__(self, raw, flow):
+        self.raw = raw
+        self.flow = flow
+    
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.flow.consume(len(data))
+        return data
+    
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.raw.seek(offset, whence)
+    
+    def tell(self):
+        return self.raw.tell()
+
+class BandwidthManager:
+    """
+    Shared shaper for every transfer chunk loop in the worker.
+    Each direction (ingress: Telegram, URL and Drive downloads; egress: Drive
+    and Telegram uploads) has a global token bucket capped at
+    BANDWIDTH_*_LIMIT bytes/s. Transfers are interactive (up to
+    BANDWIDTH_INTERACTIVE_MAX bytes) or bulk (larger files, folder and mirror
+    jobs); while interactive transfers run, bulk ones together get only
+    BANDWIDTH_BULK_SHARE of the cap, otherwise all of it.
+    """
+    
+    def __init__(self, ingress_limit=None, egress_limit=None, bulk_share=None, interactive_max=None):
+        self.limits = {
+            INGRESS: Config.BANDWIDTH_INGRESS_LIMIT if ingress_limit is None else ingress_limit,
+            EGRESS: Config.BANDWIDTH_EGRESS_LIMIT if egress_limit is None else egress_limit
+        }
+        self.bulk_share = Config.BANDWIDTH_BULK_SHARE if bulk_share is None else bulk_share
+        self.interactive_max = Config.BANDWIDTH_INTERACTIVE_MAX if interactive_max is None else interactive_max
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.buckets = {direction: TokenBucket(limit) for direction, limit in self.limits.items() if limit}
+        self.bulk_buckets = {direction: TokenBucket(limit) for direction, limit in self.limits.items() if limit}
+        self.interactive_until = dict.fromkeys(DIRECTIONS, 0.0)
+        self.meters = {(direction, priority): RateMeter(Config.BANDWIDTH_RATE_WINDOW)
+                       for direction in DIRECTIONS for priority in CLASSES}
+        self.waited = {key: 0.0 for key in self.meters}
+    
+    def classify(self, size=None):
+        if getattr(self._local, 'bulk', False):
+            return BULK
+        return BULK if size and size > self.interactive_max else INTERACTIVE
+    
+    def flow(self, direction, size=None, priority=None):
+        """Start accounting a transfer; size, when known, decides its class"""
+        return Flow(self, direction, priority or self.classify(size))
+    
+    @contextmanager
+    def bulk(self):
+        """Transfers this thread starts inside the block are bulk, whatever their size"""
+        previous = getattr(self._local, 'bulk', False)
+        self._local.bulk = True
+        try:
+            yield
+        finally:
+            self._local.bulk = previous
+    
+    def as_bulk(self, func):
+        """Wrap a function run on a pool thread so its transfers are bulk"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.bulk():
+                return func(*args, **kwargs)
+        return wrapper
+    
+    def consume(self, direction, priority, nbytes):
+        """Account bytes that just moved and sleep while the direction is over its cap"""
+        with self._lock:
+            now = time.monotonic()
+            self.meters[direction, priority].add(nbytes, now)
+            limit = self.limits[direction]
+            if not limit:
+                return
+            
+            delay = self.buckets[direction].charge(nbytes, now)
+            if priority == INTERACTIVE:
+                # Running until its next chunk of the same size is due
+                self.interactive_until[direction] = max(self.interactive_until[direction],
+                                                        now + delay + nbytes / limit + INTERACTIVE_GRACE)
+            else:
+                bucket = self.bulk_buckets[direction]
+                share = self.bulk_share if now < self.interactive_until[direction] else 1.0
+                bucket.set_rate(max(limit * share, 1.0), now)
+                delay = max(delay, bucket.charge(nbytes, now))
+            self.waited[direction, priority] += delay
+        
+        if delay > 0:
+            time.sleep(delay)
+    
+    def get_stats(self):
+        """Cap and live rate of each direction, per class, in bytes/s"""
+        with self._lock:
+            now = time.monotonic()
+            stats = {'bulk_share': self.bulk_share, 'interactive_max': self.interactive_max}
+            for direction in DIRECTIONS:
+                classes = {priority: {'rate': round(self.meters[direction, priority].rate(now)),
+                                      'bytes': self.meters[direction, priority].total,
+                                      'waited_seconds': round(self.waited[direction, priority], 2)}
+                           for priority in CLASSES}
+                stats[direction] = {'limit': self.limits[direction],
+                                    'rate': sum(entry['rate'] for entry in classes.values()),
+                                    'interactive_active': now < self.interactive_until[direction],
+                                    'classes': classes}
+            return stats
+
+bandwidth = BandwidthManager()
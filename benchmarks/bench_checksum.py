@@ -0,0 +1,96 @@
+"""
+Checksum benchmark: hashing throughput of the streaming checksum stage.
+
+Measures, over an in-memory buffer:
+  algorithms   - md5, sha256 and both together (what transfers compute), per block size
+  slicing      - memoryview slices vs bytes slices feeding the hashes
+  writer       - HashingWriter on a null sink vs plain writes, i.e. the cost added to a pipeline
+
+Usage:
+    python benchmarks/bench_checksum.py [--size-mb 256] [--repeat 3] [--json]
+"""
+import argparse
+import io
+import json
+import os
+import ssl
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from checksum import HashingWriter, StreamHasher, hash_buffer  # noqa: E402
+
+BLOCK_SIZES = [64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+class NullSink(io.RawIOBase):
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        return len(data)
+
+def best_throughput(func, size, repeat):
+    """MB/s of the fastest of repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return size / (1024 * 1024) / best
+
+def bytes_slices(data, block_size):
+    hasher = StreamHasher()
+    for start in range(0, len(data), block_size):
+        hasher.update(data[start:start + block_size])
+
+def through_writer(data, block_size, hashed):
+    sink = HashingWriter(NullSink(), StreamHasher()) if hashed else NullSink()
+    with memoryview(data) as view:
+        for start in range(0, len(view), block_size):
+            sink.write(view[start:start + block_size])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+    
+    size = args.size_mb * 1024 * 1024
+    data = os.urandom(size)
+    results = []
+    
+    for algorithms in (('md5',), ('sha256',), ('md5', 'sha256')):
+        for block_size in BLOCK_SIZES:
+            results.append({
+                'case': 'algorithms',
+                'variant': '+'.join(algorithms),
+                'block_kb': block_size // 1024,
+                'mb_per_s': best_throughput(
+                    lambda: hash_buffer(data, StreamHasher(algorithms), block_size), size, args.repeat)
+            })
+    
+    small_block = BLOCK_SIZES[0]
+    results.append({'case': 'slicing', 'variant': 'memoryview', 'block_kb': small_block // 1024,
+                    'mb_per_s': best_throughput(lambda: hash_buffer(data, None, small_block), size, args.repeat)})
+    results.append({'case': 'slicing', 'variant': 'bytes', 'block_kb': small_block // 1024,
+                    'mb_per_s': best_throughput(lambda: bytes_slices(data, small_block), size, args.repeat)})
+    
+    for hashed in (False, True):
+        results.append({'case': 'writer', 'variant': 'hashing' if hashed else 'plain', 'block_kb': 1024,
+                        'mb_per_s': best_throughput(lambda: through_writer(data, 1024 * 1024, hashed),
+                                                    size, args.repeat)})
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    print(f"hashlib backed by {ssl.OPENSSL_VERSION}")
+    print(f"{'case':<12}{'variant':<14}{'block KB':>10}{'MB/s':>12}")
+    for result in results:
+        print(f"{result['case']:<12}{result['variant']:<14}{result['block_kb']:>10}{result['mb_per_s']:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup benchmark: import time and first-request latency of a fresh worker.
+
+Every trial runs in a new interpreter, like a gunicorn worker booting on
+Render, and measures:
+  import_app      - import app (Flask app, BotHandler and services)
+  first_health    - first GET /health
+  first_webhook   - first POST /webhook with a /start update
+  first_drive     - first Drive client checkout (credentials, discovery, build)
+  second_drive    - Drive client checkout on another thread (pooled client)
+
+Telegram calls go to a local stand-in (benchmarks/fake_services.py), so no network access is needed.
+
+Usage:
+    python benchmarks/bench_startup.py [--trials 5] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import FakeBotApi, fake_service_account, start_server  # noqa: E402
+
+METRICS = ['import_app', 'first_health', 'first_webhook', 'first_drive', 'second_drive']
+
+def run_child():
+    """Measure one cold start; runs inside a fresh interpreter"""
+    sys.path.insert(0, ROOT)
+    results = {}
+    
+    start = time.perf_counter()
+    import app
+    results['import_app'] = time.perf_counter() - start
+    
+    client = app.app.test_client()
+    
+    start = time.perf_counter()
+    client.get('/health')
+    results['first_health'] = time.perf_counter() - start
+    
+    # A fresh update_id each trial, or the shared dedup ledger would skip it as a redelivery
+    update = {'update_id': int(time.time() * 1000), 'message': {'message_id': 1, 'chat': {'id': 1}, 'text': '/start'}}
+    start = time.perf_counter()
+    client.post('/webhook', data=json.dumps(update), content_type='application/json')
+    results['first_webhook'] = time.perf_counter() - start
+    
+    drive = app.bot_handler.google_drive
+    start = time.perf_counter()
+    with drive.client():
+        results['first_drive'] = time.perf_counter() - start
+    
+    def build_on_thread():
+        begin = time.perf_counter()
+        with drive.client():
+            results['second_drive'] = time.perf_counter() - begin
+    
+    thread = threading.Thread(target=build_on_thread)
+    thread.start()
+    thread.join()
+    
+    print(json.dumps(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        return run_child()
+    
+    server, bot_url = start_server(FakeBotApi)
+    temp_path = tempfile.mkdtemp(prefix='bench_startup_')
+    
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_BOT_TOKEN': 'bench',
+        'TELEGRAM_API_BASE_URL': bot_url,
+        'GOOGLE_DRIVE_CREDENTIALS': fake_service_account(),
+        'TEMP_STORAGE_PATH': temp_path,
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+    
+    trials = []
+    try:
+        for _ in range(args.trials):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'],
+                                    env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+            trials.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    finally:
+        server.shutdown()
+        shutil.rmtree(temp_path, ignore_errors=True)
+    
+    if args.json:
+        print(json.dumps(trials, indent=2))
+        return
+    
+    print(f"{'metric':<16}{'median ms':>12}{'max ms':>12}")
+    for metric in METRICS:
+        values = [trial[metric] * 1000 for trial in trials]
+        print(f"{metric:<16}{statistics.median(values):>12.1f}{max(values):>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+End-to-end transfer benchmark: synthetic update streams through /webhook.
+
+The bot runs in a fresh interpreter against local stand-ins for the Bot API
+and Drive (benchmarks/fake_services.py), so whole transfers run without
+network access or credentials:
+  upload    - Telegram document -> getFile, download, Drive resumable upload
+  download  - Drive link -> files.get, ranged get_media, sendDocument
+  mixed     - both, picked at random per update
+
+File sizes follow a weighted distribution and updates are posted from
+--concurrency threads. Reported: throughput (MB/s and updates/s), per-update
+latency p50/p95/p99, peak RSS of the bot process and peak temp-disk use.
+Uploads above the public 20MB getFile limit switch the run to --local-mode.
+With --baseline the run is compared to a saved --json result and the script
+exits 1 when throughput, p95 latency or peak RSS regress by more than
+--tolerance.
+
+Usage:
+    python benchmarks/bench_transfer.py [--mode upload|download|mixed] [--sizes 1MB:5,10MB:3]
+        [--updates 40] [--concurrency 4] [--seed 1] [--local-mode] [--json]
+        [--baseline results.json] [--tolerance 0.15]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import FakeBotApi, FakeDrive, bench_file_id, fake_service_account, start_server  # noqa: E402
+
+UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+PUBLIC_DOWNLOAD_LIMIT = 20 * 1024 ** 2  # getFile limit of the public Bot API
+SAMPLE_INTERVAL = 0.05
+
+def parse_sizes(spec):
+    """'1MB:5,10MB:3' -> [(1048576, 5), (10485760, 3)]; a missing weight counts as 1"""
+    distribution = []
+    for item in spec.split(','):
+        size, _, weight = item.strip().partition(':')
+        match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMG]?B)?', size.strip().upper())
+        if not match:
+            raise ValueError(f"Invalid size: {size}")
+        distribution.append((int(float(match.group(1)) * UNITS[match.group(2) or 'B']), float(weight or 1)))
+    return distribution
+
+def make_updates(mode, distribution, count, seed):
+    """Build the update stream; every update is a distinct file, so nothing is deduplicated or coalesced"""
+    rng = random.Random(seed)
+    sizes, weights = zip(*distribution)
+    updates = []
+    for index in range(count):
+        size = rng.choices(sizes, weights)[0]
+        kind = mode if mode != 'mixed' else rng.choice(('upload', 'download'))
+        message = {'message_id': index + 1, 'chat': {'id': 1000 + index}}
+        
+        if kind == 'upload':
+            message['document'] = {'file_id': bench_file_id(size, f"{seed}t{index}"),
+                                   'file_unique_id': f"{seed}u{index}",
+                                   'file_size': size, 'file_name': f"bench_{index}.bin"}
+        else:
+            file_id = bench_file_id(size, f"{seed}d{index}")
+            message['text'] = f"https://drive.google.com/file/d/{file_id}/view"
+        
+        updates.append({'kind': kind, 'size': size, 'update': {'update_id': index + 1, 'message': message}})
+    return updates
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def disk_usage(path):
+    """Bytes allocated by temp files, ignoring the state/token cache"""
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        if '.cache' in dirnames:
+            dirnames.remove('.cache')
+        for name in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+def run_child(concurrency):
+    """Post the updates read from stdin to /webhook; runs inside a fresh interpreter"""
+    sys.path.insert(0, ROOT)
+    updates = json.load(sys.stdin)
+    
+    import app
+    from config import Config
+    from temp_storage import temp_storage
+    
+    app.app.test_client().get('/health')
+    with app.bot_handler.google_drive.client():
+        pass
+    rss_idle = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    peak_disk = [0]
+    stop = threading.Event()
+    
+    def sample_disk():
+        while not stop.wait(SAMPLE_INTERVAL):
+            peak_disk[0] = max(peak_disk[0], disk_usage(Config.TEMP_STORAGE_PATH))
+    
+    local = threading.local()
+    
+    def post(entry):
+        if not hasattr(local, 'client'):
+            local.client = app.app.test_client()
+        start = time.perf_counter()
+        local.client.post('/webhook', data=json.dumps(entry['update']), content_type='application/json')
+        return time.perf_counter() - start
+    
+    sampler = threading.Thread(target=sample_disk, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(post, updates))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+    
+    stats = app.bot_handler.stats
+    print(json.dumps({
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'completed': stats['files_uploaded'] + stats['files_downloaded'],
+        'errors': stats['errors'],
+        'rss_idle_mb': rss_idle / 1024,
+        'rss_peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'temp_disk_peak_mb': peak_disk[0] / 1024 ** 2,
+        'temp_reserved_peak_mb': temp_storage.usage()['peak_reserved'] / 1024 ** 2
+    }))
+
+def summarize(args, updates, child, counters):
+    latencies = [value * 1000 for value in child['latencies']]
+    total_bytes = sum(entry['size'] for entry in updates)
+    return {
+        'mode': args.mode,
+        'sizes': args.sizes,
+        'updates': len(updates),
+        'concurrency': args.concurrency,
+        'completed': child['completed'],
+        'errors': child['errors'],
+        'total_mb': total_bytes / 1024 ** 2,
+        'elapsed_s': child['elapsed'],
+        'throughput_mb_s': total_bytes / 1024 ** 2 / child['elapsed'],
+        'updates_per_s': len(updates) / child['elapsed'],
+        'latency_p50_ms': percentile(latencies, 50),
+        'latency_p95_ms': percentile(latencies, 95),
+        'latency_p99_ms': percentile(latencies, 99),
+        'rss_idle_mb': child['rss_idle_mb'],
+        'rss_peak_mb': child['rss_peak_mb'],
+        'temp_disk_peak_mb': child['temp_disk_peak_mb'],
+        'temp_reserved_peak_mb': child['temp_reserved_peak_mb'],
+        'drive_mb_received': counters['drive']['bytes_received'] / 1024 ** 2,
+        'telegram_mb_received': counters['telegram']['bytes_received'] / 1024 ** 2
+    }
+
+def compare(result, baseline, tolerance):
+    """Regressions beyond tolerance, as printable lines"""
+    # (metric, True when higher is better)
+    checks = [('throughput_mb_s', True), ('latency_p95_ms', False), ('rss_peak_mb', False)]
+    regressions = []
+    for metric, higher_is_better in checks:
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{metric}: {old:.1f} -> {new:.1f} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('upload', 'download', 'mixed'), default='upload')
+    parser.add_argument('--sizes', default='1MB:5,10MB:3', help='weighted size distribution, SIZE:WEIGHT,...')
+    parser.add_argument('--updates', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--local-mode', action='store_true', help='run the bot with TELEGRAM_LOCAL_MODE (2GB limits)')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON (usable as a --baseline)')
+    parser.add_argument('--baseline', help='JSON result of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        return run_child(args.concurrency)
+    
+    updates = make_updates(args.mode, parse_sizes(args.sizes), args.updates, args.seed)
+    
+    # The public Bot API refuses to serve larger documents, so such uploads need a local server
+    if not args.local_mode and any(entry['kind'] == 'upload' and entry['size'] > PUBLIC_DOWNLOAD_LIMIT
+                                   for entry in updates):
+        print("Uploads above 20MB need a local Bot API server, running with --local-mode", file=sys.stderr)
+        args.local_mode = True
+    bot_server, bot_url = start_server(FakeBotApi)
+    drive_server, drive_url = start_server(FakeDrive)
+    temp_path = os.path.join(ROOT, 'temp_files', f"bench_transfer_{os.getpid()}")
+    
+    env = dict(os.environ)
+    env.update({
+        'TELEGRAM_BOT_TOKEN': 'bench',
+        'TELEGRAM_API_BASE_URL': bot_url,
+        'TELEGRAM_LOCAL_MODE': 'true' if args.local_mode else 'false',
+        'GOOGLE_DRIVE_CREDENTIALS': fake_service_account(f"{drive_url}/token"),
+        'GOOGLE_DRIVE_FOLDER_ID': 'bench',
+        'DRIVE_API_ROOT_URL': drive_url,
+        'TEMP_STORAGE_PATH': temp_path,
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+    env.pop('GOOGLE_DRIVE_ACCOUNTS', None)
+    
+    try:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child',
+                                 '--concurrency', str(args.concurrency)],
+                                input=json.dumps(updates), env=env, cwd=ROOT, capture_output=True, text=True)
+        if output.returncode != 0:
+            sys.stderr.write(output.stderr)
+            sys.exit(output.returncode)
+        child = json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        bot_server.shutdown()
+        drive_server.shutdown()
+        shutil.rmtree(temp_path, ignore_errors=True)
+    
+    result = summarize(args, updates, child, {'drive': FakeDrive.counters, 'telegram': FakeBotApi.counters})
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:<24}{value:>14.1f}" if isinstance(value, float) else f"{key:<24}{value:>14}")
+    
+    if result['completed'] < result['updates']:
+        print(f"{result['updates'] - result['completed']} transfer(s) failed", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+Local stand-ins for the Telegram Bot API and the Google Drive v3 API used by the benchmarks.
+
+FakeBotApi serves getFile, file downloads and the send* methods. FakeDrive
+implements the parts of Drive the bot uses: the OAuth token endpoint,
+files.get/list, resumable uploads, alt=media downloads with Range and
+permissions.create. File contents are synthetic: a file id encodes its
+size, and the bytes are derived from the id, so nothing is stored and every
+file has distinct content.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATTERN = os.urandom(1024 * 1024)
+FILE_ID_PATTERN = re.compile(r'^bench(?P<size>\d+)x(?P<serial>\w+)$')
+
+def bench_file_id(size, serial):
+    """File id (Telegram or Drive) that encodes the synthetic file's size"""
+    return f"bench{size}x{serial}"
+
+def file_size(file_id):
+    match = FILE_ID_PATTERN.match(file_id)
+    return int(match.group('size')) if match else 0
+
+def iter_content(file_id, start=0, end=None):
+    """Yield the bytes [start, end) of a synthetic file: a unique header, then a repeated random pattern"""
+    size = file_size(file_id)
+    end = size if end is None else min(end, size)
+    header = file_id.encode('ascii').ljust(64, b'\0')
+    position = start
+    while position < end:
+        if position < len(header):
+            chunk = header[position:min(end, len(header))]
+        else:
+            offset = (position - len(header)) % len(PATTERN)
+            chunk = memoryview(PATTERN)[offset:offset + min(end - position, len(PATTERN) - offset)]
+        yield chunk
+        position += len(chunk)
+
+_md5_cache = {}
+_md5_lock = threading.Lock()
+
+def content_md5(file_id):
+    with _md5_lock:
+        if file_id not in _md5_cache:
+            digest = hashlib.md5()
+            for chunk in iter_content(file_id):
+                digest.update(chunk)
+            _md5_cache[file_id] = digest.hexdigest()
+        return _md5_cache[file_id]
+
+def fake_service_account(token_uri='https://oauth2.googleapis.com/token'):
+    """Service account JSON with a freshly generated key"""
+    import rsa
+    
+    _, private_key = rsa.newkeys(1024)
+    return json.dumps({
+        'type': 'service_account',
+        'project_id': 'bench',
+        'private_key_id': 'bench',
+        'private_key': private_key.save_pkcs1().decode('ascii'),
+        'client_email': 'bench@bench.iam.gserviceaccount.com',
+        'client_id': '1',
+        'token_uri': token_uri
+    })
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        pass
+    
+    def read_body(self, sink=None):
+        """Read the request body, feeding it to sink(chunk) if given; returns the bytes when no sink"""
+        length = int(self.headers.get('Content-Length') or 0)
+        data = [] if sink is None else None
+        while length:
+            chunk = self.rfile.read(min(length, 1024 * 1024))
+            if not chunk:
+                break
+            length -= len(chunk)
+            if sink is None:
+                data.append(chunk)
+            else:
+                sink(chunk)
+        return b''.join(data) if data is not None else None
+    
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_content(self, file_id, start, end, status):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start))
+        if status == 206:
+            self.send_header('Content-Range', f"bytes {start}-{end - 1}/{file_size(file_id)}")
+        self.end_headers()
+        for chunk in iter_content(file_id, start, end):
+            self.wfile.write(chunk)
+
+class FakeBotApi(_Handler):
+    """Bot API: /bot<token>/<method> and /file/bot<token>/<path>"""
+    
+    counters = {'getFile': 0, 'downloads': 0, 'sendDocument': 0, 'sendMessage': 0, 'bytes_received': 0}
+    lock = threading.Lock()
+    
+    def count(self, key, amount=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def do_GET(self):
+        path = urlparse(self.path)
+        if path.path.startswith('/file/'):
+            file_id = path.path.rsplit('/', 1)[1]
+            self.count('downloads')
+            return self.send_content(file_id, 0, file_size(file_id), 200)
+        
+        method = path.path.rsplit('/', 1)[1]
+        self.count(method)
+        if method == 'getFile':
+            file_id = parse_qs(path.query).get('file_id', [''])[0]
+            return self.send_json({'ok': True, 'result': {'file_id': file_id, 'file_path': f"documents/{file_id}"}})
+        return self.send_json({'ok': True, 'result': True})
+    
+    def do_POST(self):
+        method = urlparse(self.path).path.rsplit('/', 1)[1]
+        self.count(method)
+        if method == 'sendDocument':
+            received = [0]
+            
+            def sink(chunk):
+                received[0] += len(chunk)
+            
+            if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                self.read_chunked(sink)
+            else:
+                self.read_body(sink)
+            self.count('bytes_received', received[0])
+            return self.send_json({'ok': True, 'result': {
+                'message_id': 1, 'document': {'file_id': f"sent-{uuid.uuid4().hex}", 'file_size': received[0]}}})
+        
+        self.read_body()
+        return self.send_json({'ok': True, 'result': {'message_id': 1}})
+    
+    def read_chunked(self, sink):
+        while True:
+            size = int(self.rfile.readline().strip().split(b';')[0], 16)
+            if size == 0:
+                self.rfile.readline()
+                return
+            sink(self.rfile.read(size))
+            self.rfile.readline()
+
+class FakeDrive(_Handler):
+    """Drive v3 under /drive/v3/ and /upload/drive/v3/, plus the OAuth /token endpoint"""
+    
+    sessions = {}
+    counters = {'token': 0, 'files.get': 0, 'files.list': 0, 'get_media': 0, 'uploads': 0,
+                'upload_chunks': 0, 'bytes_received': 0, 'permissions': 0}
+    lock = threading.Lock()
+    
+    def count(self, key, amount=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def metadata(self, file_id):
+        return {'id': file_id, 'name': f"{file_id}.bin", 'size': str(file_size(file_id)),
+                'md5Checksum': content_md5(file_id), 'mimeType': 'application/octet-stream',
+                'webViewLink': f"https://drive.google.com/file/d/{file_id}/view"}
+    
+    def do_GET(self):
+        path = urlparse(self.path)
+        query = parse_qs(path.query)
+        parts = path.path.strip('/').split('/')
+        
+        if parts[-1] == 'files':
+            self.count('files.list')
+            return self.send_json({'files': []})
+        
+        file_id = parts[-1]
+        if query.get('alt') == ['media']:
+            self.count('get_media')
+            size = file_size(file_id)
+            match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2)) + 1 if match.group(2) else size, size)
+                return self.send_content(file_id, start, end, 206)
+            return self.send_content(file_id, 0, size, 200)
+        
+        self.count('files.get')
+        return self.send_json(self.metadata(file_id))
+    
+    def do_POST(self):
+        path = urlparse(self.path)
+        query = parse_qs(path.query)
+        
+        if path.path == '/token':
+            self.read_body()
+            self.count('token')
+            return self.send_json({'access_token': 'bench', 'expires_in': 3600, 'token_type': 'Bearer'})
+        
+        if path.path.endswith('/permissions'):
+            self.read_body()
+            self.count('permissions')
+            return self.send_json({'id': 'anyoneWithLink'})
+        
+        if path.path.startswith('/upload/') and query.get('uploadType') == ['resumable']:
+            body = json.loads(self.read_body() or b'{}')
+            session_id = uuid.uuid4().hex
+            with self.lock:
+                self.sessions[session_id] = {'name': body.get('name', 'upload'), 'md5': hashlib.md5(), 'received': 0}
+            self.count('uploads')
+            host = self.headers.get('Host')
+            return self.send_json({}, headers={'Location': f"http://{host}/upload/session/{session_id}"})
+        
+        self.read_body()
+        return self.send_json({'error': {'code': 400, 'message': 'unsupported'}}, status=400)
+    
+    def do_PUT(self):
+        session_id = urlparse(self.path).path.rsplit('/', 1)[1]
+        session = self.sessions.get(session_id)
+        if session is None:
+            self.read_body()
+            return self.send_json({'error': {'code': 404, 'message': 'no such session'}}, status=404)
+        
+        def sink(chunk):
+            session['md5'].update(chunk)
+            session['received'] += len(chunk)
+        
+        before = session['received']
+        self.read_body(sink)
+        self.count('upload_chunks')
+        self.count('bytes_received', session['received'] - before)
+        
+        # Content-Range: bytes a-b/total, bytes a-b/* (more to come) or bytes */total (status query)
+        total = self.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+        if total != '*' and int(total) == session['received']:
+            with self.lock:
+                self.sessions.pop(session_id, None)
+            file_id = f"up{session_id}"
+            return self.send_json({'id': file_id, 'name': session['name'], 'size': str(session['received']),
+                                   'md5Checksum': session['md5'].hexdigest(),
+                                   'webViewLink': f"https://drive.google.com/file/d/{file_id}/view"})
+        
+        self.send_response(308)
+        if session['received']:
+            self.send_header('Range', f"bytes=0-{session['received'] - 1}")
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+def start_server(handler):
+    """Serve a handler on a free local port in a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
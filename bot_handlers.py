@@ -1,60 +1,169 @@
 import logging
 import os
 import requests
+import io
 import json
+import mmap
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse
 from config import Config
-from google_drive_service import GoogleDriveService
+from google_drive_service import GoogleDriveService, FOLDER_MIME_TYPE
 from torrent_service import TorrentService
 from file_utils import FileUtils
+from media_group_service import MediaGroupCollector
+from media_service import MediaService
+from drive_watcher import DriveWatcher
+from archive_utils import (PipedUpload, StreamingZipWriter, VolumeWriter, MultipartStream,
+                           estimate_zip_size, READ_CHUNK_SIZE)
+from temp_storage import temp_storage
+from bandwidth import bandwidth, BULK, EGRESS, INGRESS
+from resilience import TransientError, is_unsent, resilience
+from idempotency import UpdateLedger
+from singleflight import SingleFlight
+from checksum import HashingWriter, StreamHasher, hash_file
+from split_utils import (JoinSession, MANIFEST_SUFFIX, build_manifest, is_join_file, iter_part_ranges,
+                         manifest_name, part_name)
 
 logger = logging.getLogger(__name__)
 
+# Commands that start a transfer; a repeat while one runs is attached to it
+TRANSFER_COMMANDS = ('/upload', '/download', '/zip', '/torrent', '/clone')
+
 class BotHandler:
     def __init__(self):
         self.token = Config.TELEGRAM_BOT_TOKEN
-        self.api_url = f"https://api.telegram.org/bot{self.token}"
+        self.api_url = f"{Config.TELEGRAM_API_BASE_URL}/bot{self.token}"
+        self.file_url = f"{Config.TELEGRAM_API_BASE_URL}/file/bot{self.token}"
         self.google_drive = GoogleDriveService()
         self.torrent_service = TorrentService()
         self.file_utils = FileUtils()
+        self.transfer_pool = ThreadPoolExecutor(max_workers=Config.MAX_CONCURRENT_TRANSFERS,
+                                                thread_name_prefix='transfer')
+        self.part_upload_pool = ThreadPoolExecutor(max_workers=Config.MAX_PARALLEL_PART_UPLOADS,
+                                                   thread_name_prefix='part-upload')
+        # Server-side copies are API calls only, so they get their own wider pool
+        self.copy_pool = ThreadPoolExecutor(max_workers=Config.DRIVE_COPY_CONCURRENCY,
+                                            thread_name_prefix='drive-copy')
+        self.media_groups = MediaGroupCollector(self.handle_media_group)
+        self.media_service = MediaService()
+        self.join_sessions = {}
+        self.update_ledger = UpdateLedger()
+        self.single_flight = SingleFlight()
+        # Mirrored files are background traffic and yield bandwidth to interactive transfers
+        self.drive_watcher = DriveWatcher(self.google_drive, bandwidth.as_bulk(self.transfer_drive_file_to_telegram),
+                                          self.transfer_pool)
         self.stats = {
             'messages_processed': 0,
             'files_uploaded': 0,
             'files_downloaded': 0,
+            'files_cloned': 0,
             'errors': 0
         }
         
-        # Ensure temp directory exists
+        # Ensure temp directory exists and orphaned spool files get removed
         os.makedirs(Config.TEMP_STORAGE_PATH, exist_ok=True)
+        temp_storage.start_janitor(self.file_utils)
+        
+        # Mint the Drive access token before the first transfer needs it
+        self.google_drive.warm_up()
+        
+        # Mirror a Drive folder into a channel when MIRROR_FOLDER_ID and MIRROR_CHAT_ID are set
+        self.drive_watcher.start()
     
     def process_update(self, update):
         """Process incoming Telegram update"""
         try:
+            # Telegram redelivers updates when the webhook answers slowly; handle each one once
+            if 'update_id' in update and not self.update_ledger.claim_update(update['update_id']):
+                logger.info("Skipping redelivered update %s", update['update_id'])
+                return None
+            
             self.stats['messages_processed'] += 1
             
             if 'message' in update:
                 message = update['message']
                 chat_id = message['chat']['id']
                 
-                # Handle different message types
-                if 'text' in message:
-                    return self.handle_text_message(chat_id, message['text'])
-                elif 'document' in message:
-                    return self.handle_file_message(chat_id, message['document'], 'document')
-                elif 'video' in message:
-                    return self.handle_file_message(chat_id, message['video'], 'video')
-                elif 'audio' in message:
-                    return self.handle_file_message(chat_id, message['audio'], 'audio')
-                elif 'photo' in message:
-                    # Get the largest photo
-                    photo = max(message['photo'], key=lambda p: p['file_size'])
-                    return self.handle_file_message(chat_id, photo, 'photo')
+                # A resent file or command attaches to the transfer already running for it
+                job_key = self.get_job_key(chat_id, message)
+                if job_key:
+                    if not self.update_ledger.claim_job(job_key):
+                        return self.send_message(chat_id, Config.MESSAGES['already_in_progress'])
+                    try:
+                        return self.handle_message(chat_id, message)
+                    finally:
+                        self.update_ledger.release_job(job_key)
                 
+                return self.handle_message(chat_id, message)
+        
         except Exception as e:
             logger.error(f"Error processing update: {str(e)}")
             self.stats['errors'] += 1
             return None
     
+    def handle_message(self, chat_id, message):
+        """Dispatch a message to the text or file handlers"""
+        # Handle different message types
+        if 'text' in message:
+            return self.handle_text_message(chat_id, message['text'])
+        
+        file_entry = self.get_message_file(message)
+        if file_entry:
+            file_info, file_type = file_entry
+            
+            # While a /join is open, documents named like parts or a manifest belong to it
+            if self.active_join_session(chat_id):
+                if file_type == 'document' and is_join_file(file_info.get('file_name')):
+                    return self.handle_join_part(chat_id, file_info)
+                self.send_message(chat_id, Config.MESSAGES['join_not_a_part'].format(
+                    file_info.get('file_name') or file_type))
+            
+            # Album items arrive as separate updates; collect them first
+            if 'media_group_id' in message:
+                self.media_groups.add(message['media_group_id'], chat_id, file_info, file_type)
+                return None
+            
+            return self.handle_file_message(chat_id, file_info, file_type)
+        return None
+    
+    def get_job_key(self, chat_id, message):
+        """Identify the transfer a message starts, so a duplicate can be recognised; None for other messages"""
+        if 'text' in message:
+            text = ' '.join(message['text'].split())
+            if text.startswith(TRANSFER_COMMANDS) or self.is_google_drive_link(text) or self.is_magnet_link(text):
+                return f"{chat_id}:text:{text}"
+            return None
+        
+        # Albums and /join parts are collected and finish later
+        if 'media_group_id' in message:
+            return None
+        
+        file_entry = self.get_message_file(message)
+        if file_entry:
+            file_info, file_type = file_entry
+            if (file_type == 'document' and is_join_file(file_info.get('file_name'))
+                    and self.active_join_session(chat_id)):
+                return None
+            return f"{chat_id}:file:{file_info.get('file_unique_id') or file_info['file_id']}"
+        return None
+    
+    def get_message_file(self, message):
+        """Return (file_info, file_type) for a message carrying a file"""
+        if 'document' in message:
+            return message['document'], 'document'
+        elif 'video' in message:
+            return message['video'], 'video'
+        elif 'audio' in message:
+            return message['audio'], 'audio'
+        elif 'photo' in message:
+            # Get the largest photo
+            photo = max(message['photo'], key=lambda p: p['file_size'])
+            return photo, 'photo'
+        return None
+    
     def handle_text_message(self, chat_id, text):
         """Handle text messages and commands"""
         try:
@@ -78,6 +187,15 @@ class BotHandler:
             elif text.startswith('/torrent'):
                 return self.handle_torrent_command(chat_id, text)
             
+            elif text.startswith('/zip'):
+                return self.handle_zip_command(chat_id, text)
+            
+            elif text.startswith('/join'):
+                return self.handle_join_command(chat_id, text)
+            
+            elif text.startswith('/clone'):
+                return self.handle_clone_command(chat_id, text)
+            
             elif self.is_google_drive_link(text):
                 return self.handle_google_drive_download(chat_id, text)
             
@@ -87,7 +205,7 @@ class BotHandler:
             else:
                 return self.send_message(chat_id, 
                     "I don't understand that command. Use /help for available commands.")
-                
+        
         except Exception as e:
             logger.error(f"Error handling text message: {str(e)}")
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
@@ -103,19 +221,32 @@ class BotHandler:
             file_size = file_info.get('file_size', 0)
             
             # Check file size
-            if file_size > Config.MAX_FILE_SIZE:
+            if file_size > self.max_telegram_file_size():
                 return self.send_message(chat_id, Config.MESSAGES['file_too_large'])
             
-            # Download file from Telegram
-            file_path = self.download_telegram_file(file_id)
+            # Download file from Telegram, hashing it on the way
+            hasher = StreamHasher()
+            file_path = self.download_telegram_file(file_id, file_size or None, file_info.get('file_name'), hasher)
             if not file_path:
                 return self.send_message(chat_id, "Failed to download file from Telegram.")
             
-            # Upload to Google Drive
-            result = self.google_drive.upload_file(file_path, file_info.get('file_name', f'telegram_file_{file_id}'))
+            filename = file_info.get('file_name', f'telegram_file_{file_id}')
+            checksums = hasher.hexdigests()
             
-            # Cleanup temp file
-            self.file_utils.cleanup_file(file_path)
+            # MP4/MOV videos are made faststart (re-encoded above MEDIA_COMPRESS_ABOVE) on the media pool
+            media = self.media_service.process(file_path, filename, file_info.get('mime_type'))
+            if media and media.changed:
+                self.file_utils.cleanup_file(file_path)
+                file_path, filename, checksums = media.path, media.filename, None
+            
+            try:
+                # Upload to Google Drive
+                result = self.google_drive.upload_file(file_path, filename, checksums)
+            finally:
+                # Cleanup temp file
+                self.file_utils.cleanup_file(file_path)
+                if media:
+                    media.cleanup()
             
             if result:
                 self.stats['files_uploaded'] += 1
@@ -123,16 +254,94 @@ class BotHandler:
                     f"{Config.MESSAGES['upload_success']}\nGoogle Drive link: {result}")
             else:
                 return self.send_message(chat_id, "Failed to upload file to Google Drive.")
-                
+        
         except Exception as e:
             logger.error(f"Error handling file message: {str(e)}")
             self.stats['errors'] += 1
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
     
+    def handle_media_group(self, chat_id, items):
+        """Transfer all files of an album concurrently and reply once with every link"""
+        try:
+            self.send_message(chat_id, Config.MESSAGES['album_processing'].format(len(items)))
+            
+            futures = [self.transfer_pool.submit(self.transfer_album_item, file_info)
+                       for file_info, _ in items]
+            
+            lines = []
+            uploaded = 0
+            for index, future in enumerate(futures, 1):
+                name, link, error = future.result()
+                if link:
+                    uploaded += 1
+                    lines.append(f"{index}. {name}: {link}")
+                else:
+                    lines.append(f"{index}. {name}: ❌ {error}")
+            
+            self.stats['files_uploaded'] += uploaded
+            self.stats['errors'] += len(items) - uploaded
+            
+            return self.send_message(chat_id,
+                Config.MESSAGES['album_result'].format(uploaded, len(items), '\n'.join(lines)))
+        
+        except Exception as e:
+            logger.error(f"Error handling media group: {str(e)}")
+            self.stats['errors'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def transfer_album_item(self, file_info):
+        """Move one album file from Telegram to Google Drive, returning (name, link, error)"""
+        file_id = file_info['file_id']
+        filename = file_info.get('file_name', f'telegram_file_{file_id}')
+        
+        try:
+            if file_info.get('file_size', 0) > self.max_telegram_file_size():
+                return filename, None, "file is too large"
+            
+            hasher = StreamHasher()
+            file_path = self.download_telegram_file(file_id, file_info.get('file_size'), filename, hasher)
+            if not file_path:
+                return filename, None, "download from Telegram failed"
+            
+            # Same media stage as a single upload
+            checksums = hasher.hexdigests()
+            media = self.media_service.process(file_path, filename, file_info.get('mime_type'))
+            if media and media.changed:
+                self.file_utils.cleanup_file(file_path)
+                file_path, filename, checksums = media.path, media.filename, None
+            
+            try:
+                result = self.google_drive.upload_file(file_path, filename, checksums)
+            finally:
+                self.file_utils.cleanup_file(file_path)
+                if media:
+                    media.cleanup()
+            
+            if not result:
+                return filename, None, "upload to Google Drive failed"
+            return filename, result, None
+        
+        except Exception as e:
+            logger.error(f"Error transferring album item {file_id}: {str(e)}")
+            return filename, None, str(e)
+    
     def handle_status_command(self, chat_id):
         """Handle status command"""
         try:
             google_drive_status = "✅ Connected" if self.google_drive.is_configured() else "❌ Not configured"
+            temp_usage = temp_storage.usage()
+            drive_pool = self.google_drive.get_pool_stats()
+            drive_accounts = self.google_drive.get_account_stats() or {'accounts': []}
+            uploaded_today = sum(account['bytes_today'] for account in drive_accounts['accounts'])
+            available_accounts = sum(1 for account in drive_accounts['accounts'] if not account['blocked_for'])
+            media = self.media_service.get_stats()
+            media_status = (f"✅ {media['jobs']} jobs, {media['cpu_seconds']}s CPU" if media['enabled']
+                            else "⚪ Off")
+            shaping = bandwidth.get_stats()
+            bandwidth_status = ', '.join(
+                f"{direction} {shaping[direction]['rate'] // 1024}KB/s"
+                + (f" of {shaping[direction]['limit'] // 1024}KB/s" if shaping[direction]['limit'] else "")
+                for direction in (INGRESS, EGRESS))
             
             status_message = f"""🤖 Bot Status:
 
@@ -144,15 +353,20 @@ class BotHandler:
 
 🔧 Services:
 • Google Drive: {google_drive_status}
+• Drive connections: {drive_pool['in_use']} busy of {drive_pool['size']} (peak {drive_pool['peak_in_use']})
+• Drive accounts: {available_accounts} of {len(drive_accounts['accounts'])} available, {uploaded_today // (1024*1024)}MB uploaded today
+• Media processing: {media_status}
+• Bandwidth: {bandwidth_status}
 • Torrent Service: ✅ Ready
 • File Storage: ✅ Ready
 
 💾 Configuration:
-• Max file size: {Config.MAX_FILE_SIZE // (2*1024*1024*1024)}MB
-• Temp storage: {Config.TEMP_STORAGE_PATH}"""
+• Max file size: {Config.TELEGRAM_FILE_LIMIT // (1024*1024)}MB from chats, {Config.MAX_FILE_SIZE // (1024*1024)}MB from links
+• Temp storage: {Config.TEMP_STORAGE_PATH}
+• Temp space in use: {temp_usage['reserved'] // (1024*1024)}MB of {temp_usage['budget'] // (1024*1024)}MB"""
             
             return self.send_message(chat_id, status_message)
-            
+        
         except Exception as e:
             logger.error(f"Error handling status command: {str(e)}")
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
@@ -170,29 +384,42 @@ class BotHandler:
             # Send processing message
             self.send_message(chat_id, Config.MESSAGES['processing'])
             
-            # Download file from URL
-            file_path = self.file_utils.download_from_url(url)
-            if not file_path:
-                return self.send_message(chat_id, "Failed to download file from the provided URL.")
-            
-            # Upload to Google Drive
-            filename = os.path.basename(urlparse(url).path) or 'downloaded_file'
-            result = self.google_drive.upload_file(file_path, filename)
-            
-            # Cleanup temp file
-            self.file_utils.cleanup_file(file_path)
+            # Everyone posting the same link at once shares one download and upload
+            (result, error), _ = self.single_flight.do(
+                f"url:{self.file_utils.normalize_url(url)}", self.transfer_url_to_drive, url)
             
             if result:
-                self.stats['files_uploaded'] += 1
                 return self.send_message(chat_id, 
                     f"{Config.MESSAGES['upload_success']}\nGoogle Drive link: {result}")
             else:
-                return self.send_message(chat_id, "Failed to upload file to Google Drive.")
-                
+                return self.send_message(chat_id, error)
+        
         except Exception as e:
             logger.error(f"Error handling upload command: {str(e)}")
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
     
+    def transfer_url_to_drive(self, url):
+        """Download a URL and upload it to Google Drive, returning (drive_link, error_message)"""
+        # Download file from URL, hashing it on the way
+        hasher = StreamHasher()
+        file_path = self.file_utils.download_from_url(url, hasher=hasher)
+        if not file_path:
+            return None, "Failed to download file from the provided URL."
+        
+        try:
+            # Upload to Google Drive
+            filename = os.path.basename(urlparse(url).path) or 'downloaded_file'
+            result = self.google_drive.upload_file(file_path, filename, hasher.hexdigests())
+        finally:
+            # Cleanup temp file
+            self.file_utils.cleanup_file(file_path)
+        
+        if not result:
+            return None, "Failed to upload file to Google Drive."
+        
+        self.stats['files_uploaded'] += 1
+        return result, None
+    
     def handle_download_command(self, chat_id, text):
         """Handle download command"""
         try:
@@ -201,13 +428,290 @@ class BotHandler:
                 return self.send_message(chat_id, 
                     "Please provide a Google Drive link after /download command.\nExample: /download https://drive.google.com/file/d/...")
             
-            url = parts[1].strip()
-            return self.handle_google_drive_download(chat_id, url)
+            args = parts[1].split()
+            url = args[0]
+            
+            # "/download <folder link> zip" packs the folder into one archive
+            if len(args) > 1 and args[-1].lower() == 'zip':
+                folder_id = self.extract_google_drive_folder_id(url)
+                if not folder_id:
+                    return self.send_message(chat_id, "Only Google Drive folder links can be zipped.")
+                return self.handle_google_drive_folder_archive(chat_id, folder_id)
             
+            return self.handle_google_drive_download(chat_id, url)
+        
         except Exception as e:
             logger.error(f"Error handling download command: {str(e)}")
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
     
+    def handle_zip_command(self, chat_id, text):
+        """Handle zip command: pack several links into one archive on Google Drive"""
+        try:
+            links = text.split()[1:]
+            if not links:
+                return self.send_message(chat_id,
+                    "Please provide one or more links after /zip command.\nExample: /zip https://example.com/a.pdf https://drive.google.com/file/d/...")
+            
+            self.send_message(chat_id, Config.MESSAGES['processing'])
+            
+            archive_name = f"files_{time.strftime('%Y%m%d_%H%M%S')}.zip"
+            upload = PipedUpload(
+                lambda pipe: self.google_drive.upload_stream(pipe, archive_name, 'application/zip'),
+                archive_name)
+            archive = StreamingZipWriter(upload)
+            
+            try:
+                for link in links:
+                    self.add_link_to_archive(archive, link)
+                result = archive.close()
+            except Exception:
+                archive.abort()
+                raise
+            
+            self.stats['files_uploaded'] += 1
+            return self.send_message(chat_id,
+                f"{Config.MESSAGES['upload_success']}\nGoogle Drive link: {result}")
+        
+        except Exception as e:
+            logger.error(f"Error handling zip command: {str(e)}")
+            self.stats['errors'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def add_link_to_archive(self, archive, link):
+        """Stream one Google Drive file or URL into an open archive"""
+        file_id = self.extract_google_drive_file_id(link) if self.is_google_drive_link(link) else None
+        if file_id:
+            file_info = self.google_drive.get_file_info(file_id)
+            if not file_info or not self.google_drive.is_downloadable(file_info):
+                raise ValueError(f"Cannot read Google Drive file {file_id}")
+            # The archive is uploaded to Drive while it is written, so neither side may wait on the pool
+            with archive.open_entry(file_info['name'], int(file_info.get('size', 0)) or None) as entry:
+                self.google_drive.download_to_stream(file_id, entry, file_info.get('md5Checksum'), file_info.get('size'),
+                                                     wait=False)
+            return
+        
+        response = self.file_utils.open_url_stream(link)
+        if response is None:
+            raise ValueError(f"Invalid link: {link}")
+        with response:
+            content_length = int(response.headers.get('content-length') or 0) or None
+            archive.add_chunks(self.file_utils.get_filename_from_url(link, response),
+                               bandwidth.flow(INGRESS, content_length).iter(
+                                   response.iter_content(chunk_size=READ_CHUNK_SIZE)),
+                               content_length)
+    
+    def handle_join_command(self, chat_id, text):
+        """Handle join command: collect split parts and reassemble them on Google Drive"""
+        try:
+            parts = text.split()
+            action = parts[1].lower() if len(parts) > 1 else 'start'
+            
+            if action == 'cancel':
+                self.join_sessions.pop(chat_id, None)
+                return self.send_message(chat_id, Config.MESSAGES['join_cancelled'])
+            
+            if action == 'done':
+                session = self.join_sessions.pop(chat_id, None)
+                if not session or not session.ordered_parts():
+                    return self.send_message(chat_id, Config.MESSAGES['join_no_parts'])
+                missing = session.missing_parts()
+                if missing:
+                    self.join_sessions[chat_id] = session
+                    return self.send_message(chat_id,
+                        Config.MESSAGES['join_missing'].format(', '.join(missing)))
+                return self.handle_join_complete(chat_id, session)
+            
+            self.join_sessions[chat_id] = JoinSession()
+            return self.send_message(chat_id, Config.MESSAGES['join_started'])
+        
+        except Exception as e:
+            logger.error(f"Error handling join command: {str(e)}")
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def active_join_session(self, chat_id):
+        """The chat's open /join session, or None; a session idle for JOIN_SESSION_TTL is dropped"""
+        session = self.join_sessions.get(chat_id)
+        if session and session.is_expired(Config.JOIN_SESSION_TTL):
+            if self.join_sessions.pop(chat_id, None) is session:
+                logger.info(f"Join session of chat {chat_id} expired")
+            return None
+        return session
+    
+    def handle_join_part(self, chat_id, file_info):
+        """Record a part or manifest sent during a /join and finish once everything arrived"""
+        try:
+            session = self.active_join_session(chat_id)
+            if session is None:
+                return self.handle_file_message(chat_id, file_info, 'document')
+            
+            name = file_info.get('file_name', '')
+            if not is_join_file(name):
+                return self.send_message(chat_id, Config.MESSAGES['join_not_a_part'].format(name or 'This file'))
+            
+            # Every part is fetched back with getFile when the join runs
+            limit = self.max_telegram_file_size()
+            if file_info.get('file_size', 0) > limit:
+                return self.send_message(chat_id,
+                    Config.MESSAGES['join_part_too_large'].format(name, limit // (1024 * 1024)))
+            
+            if name.endswith(MANIFEST_SUFFIX):
+                buffer = io.BytesIO()
+                if not self.stream_telegram_file(file_info['file_id'], buffer):
+                    return self.send_message(chat_id, "Failed to download the manifest from Telegram.")
+                session.set_manifest(json.loads(buffer.getvalue().decode('utf-8')))
+            else:
+                session.add_part(name, file_info)
+            
+            if session.is_complete() and self.join_sessions.pop(chat_id, None) is session:
+                return self.handle_join_complete(chat_id, session)
+            return None
+        
+        except Exception as e:
+            logger.error(f"Error handling join part: {str(e)}")
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def handle_join_complete(self, chat_id, session):
+        """Stream every part, in order, into a single upload to Google Drive"""
+        try:
+            self.send_message(chat_id, Config.MESSAGES['processing'])
+            
+            filename = session.target_name()
+            upload = PipedUpload(
+                lambda pipe: self.google_drive.upload_stream(pipe, filename), filename)
+            
+            try:
+                dest = HashingWriter(upload, StreamHasher(()))
+                for name, file_info in session.ordered_parts():
+                    if not self.stream_telegram_file(file_info['file_id'], dest):
+                        raise IOError(f"Failed to download part {name} from Telegram")
+                
+                # Don't store a file that came out shorter or longer than the manifest says
+                dest.hasher.verify(session.total_size(), what=filename)
+                result = upload.close()
+            except Exception:
+                upload.abort()
+                raise
+            
+            self.stats['files_uploaded'] += 1
+            return self.send_message(chat_id,
+                f"{Config.MESSAGES['upload_success']}\nGoogle Drive link: {result}")
+        
+        except Exception as e:
+            logger.error(f"Error joining parts: {str(e)}")
+            self.stats['errors'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def handle_clone_command(self, chat_id, text):
+        """Handle clone command: copy a shared Drive file or folder into our Drive without downloading it"""
+        try:
+            parts = text.split()
+            if len(parts) < 2 or not self.is_google_drive_link(parts[1]):
+                return self.send_message(chat_id,
+                    "Please provide a Google Drive link after /clone command.\nExample: /clone https://drive.google.com/drive/folders/...")
+            
+            url = parts[1]
+            folder_id = self.extract_google_drive_folder_id(url)
+            if folder_id:
+                return self.handle_clone_folder(chat_id, folder_id)
+            
+            file_id = self.extract_google_drive_file_id(url)
+            if not file_id:
+                return self.send_message(chat_id, Config.MESSAGES['invalid_link'])
+            
+            self.send_message(chat_id, Config.MESSAGES['processing'])
+            
+            file_info = self.google_drive.get_file_info(file_id)
+            if not file_info:
+                return self.send_message(chat_id, Config.MESSAGES['clone_no_access'])
+            
+            result = self.google_drive.copy_file(file_id, int(file_info.get('size') or 0))
+            if not result:
+                return self.send_message(chat_id, "Failed to copy file on Google Drive.")
+            
+            self.stats['files_cloned'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['clone_success'].format(result.get('webViewLink')))
+        
+        except Exception as e:
+            logger.error(f"Error handling clone command: {str(e)}")
+            self.stats['errors'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def handle_clone_folder(self, chat_id, folder_id):
+        """Recreate a shared Drive folder tree in our Drive, copying its files concurrently"""
+        try:
+            folder_info = self.google_drive.get_file_info(folder_id)
+            if not folder_info:
+                return self.send_message(chat_id, Config.MESSAGES['clone_no_access'])
+            
+            self.send_message(chat_id, Config.MESSAGES['clone_processing'])
+            
+            # The whole tree goes to one account, since parents must be in the same Drive
+            account = self.google_drive.account_for(folder_info['name'])
+            if not account:
+                return self.send_message(chat_id, Config.MESSAGES['google_drive_error'])
+            
+            root = self.google_drive.create_folder(folder_info['name'], account=account, public=True)
+            if not root:
+                return self.send_message(chat_id, "Failed to create the folder on Google Drive.")
+            
+            copied = 0
+            failed = []
+            pending = set()
+            folders = [(folder_id, root['id'], '')]
+            listing_error = None
+            
+            # Folders are created while listing, one page at a time; file copies run
+            # on the copy pool with at most DRIVE_COPY_CONCURRENCY in flight
+            try:
+                while folders:
+                    source_id, target_id, path = folders.pop()
+                    for file_info in self.google_drive.iter_files(source_id, page_size=1000):
+                        relative_path = f"{path}{file_info['name']}"
+                        
+                        if file_info.get('mimeType') == FOLDER_MIME_TYPE:
+                            subfolder = self.google_drive.create_folder(file_info['name'], target_id, account)
+                            if subfolder:
+                                folders.append((file_info['id'], subfolder['id'], f"{relative_path}/"))
+                            else:
+                                failed.append((f"{relative_path}/", "could not create folder"))
+                            continue
+                        
+                        if len(pending) >= Config.DRIVE_COPY_CONCURRENCY:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            copied += self._collect_folder_results(done, failed)
+                        
+                        pending.add(self.copy_pool.submit(
+                            self.clone_drive_file, relative_path, file_info, target_id, account))
+            except Exception as e:
+                # Copies already started still finish; the summary says the clone is incomplete
+                listing_error = str(e)
+            
+            done, _ = wait(pending)
+            copied += self._collect_folder_results(done, failed)
+            
+            self.stats['files_cloned'] += copied
+            summary = Config.MESSAGES['clone_folder_result'].format(copied, copied + len(failed), root.get('webViewLink'))
+            if failed:
+                summary += "\nFailed:\n" + "\n".join(f"• {path}: {error}" for path, error in failed)
+            if listing_error:
+                self.stats['errors'] += 1
+                summary += "\n" + Config.MESSAGES['folder_incomplete'].format(listing_error)
+            return self.send_message(chat_id, summary)
+        
+        except Exception as e:
+            logger.error(f"Error cloning Google Drive folder: {str(e)}")
+            self.stats['errors'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def clone_drive_file(self, relative_path, file_info, parent_id, account):
+        """Copy one file of a folder being cloned, returning (relative_path, error)"""
+        # The cloned root folder is shared, so the copies inherit its permission
+        result = self.google_drive.copy_file(file_info['id'], int(file_info.get('size') or 0),
+                                             parent_id, account, public=False)
+        if not result:
+            return relative_path, "copy failed"
+        return relative_path, None
+    
     def handle_torrent_command(self, chat_id, text):
         """Handle torrent command"""
         try:
@@ -218,7 +722,7 @@ class BotHandler:
             
             magnet_link = parts[1].strip()
             return self.handle_torrent_download(chat_id, magnet_link)
-            
+        
         except Exception as e:
             logger.error(f"Error handling torrent command: {str(e)}")
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
@@ -226,6 +730,11 @@ class BotHandler:
     def handle_google_drive_download(self, chat_id, url):
         """Handle Google Drive file download"""
         try:
+            # Folder links stream every file inside the folder
+            folder_id = self.extract_google_drive_folder_id(url)
+            if folder_id:
+                return self.handle_google_drive_folder_download(chat_id, folder_id)
+            
             # Send processing message
             self.send_message(chat_id, Config.MESSAGES['processing'])
             
@@ -234,27 +743,179 @@ class BotHandler:
             if not file_id:
                 return self.send_message(chat_id, Config.MESSAGES['invalid_link'])
             
-            # Download from Google Drive
-            file_path = self.google_drive.download_file(file_id)
-            if not file_path:
-                return self.send_message(chat_id, "Failed to download file from Google Drive.")
+            # One download per Drive file; requests arriving meanwhile reuse the Telegram copy
+            (sent_file_id, error), shared = self.single_flight.do(
+                f"drive:{file_id}", self.transfer_drive_link_to_telegram, chat_id, file_id)
             
-            # Send file to Telegram
-            result = self.send_file_to_telegram(chat_id, file_path)
+            if shared and not error:
+                # Files sent in parts have no single file_id to forward; fetch them again
+                if isinstance(sent_file_id, str):
+                    if not self.send_document_by_id(chat_id, sent_file_id):
+                        error = "Failed to send file to Telegram."
+                else:
+                    sent_file_id, error = self.transfer_drive_link_to_telegram(chat_id, file_id)
             
+            if error:
+                return self.send_message(chat_id, error)
+            return self.send_message(chat_id, Config.MESSAGES['download_success'])
+        
+        except Exception as e:
+            logger.error(f"Error handling Google Drive download: {str(e)}")
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def transfer_drive_link_to_telegram(self, chat_id, file_id):
+        """Download a Drive file and send it to a chat, returning (telegram_file_id or True, error_message)"""
+        # Download from Google Drive
+        file_info = self.google_drive.get_file_info(file_id)
+        if not file_info:
+            return None, "Failed to download file from Google Drive."
+        
+        file_path = self.google_drive.download_file(file_id, file_info)
+        if not file_path:
+            return None, "Failed to download file from Google Drive."
+        
+        try:
+            # Send file to Telegram
+            result = self.send_file_to_telegram(chat_id, file_path, file_info.get('name'), file_info.get('mimeType'))
+        finally:
             # Cleanup temp file
             self.file_utils.cleanup_file(file_path)
+        
+        if not result:
+            return None, "Failed to send file to Telegram."
+        
+        self.stats['files_downloaded'] += 1
+        return result, None
+    
+    def handle_google_drive_folder_download(self, chat_id, folder_id):
+        """Download every file of a Google Drive folder and send each to Telegram as it finishes"""
+        try:
+            self.send_message(chat_id, Config.MESSAGES['folder_processing'])
             
-            if result:
-                self.stats['files_downloaded'] += 1
-                return self.send_message(chat_id, Config.MESSAGES['download_success'])
-            else:
-                return self.send_message(chat_id, "Failed to send file to Telegram.")
-                
+            sent = 0
+            failed = []
+            pending = set()
+            listing_error = None
+            
+            # The listing is paged lazily and at most MAX_CONCURRENT_TRANSFERS files
+            # are in flight, so memory and temp disk stay flat for any folder size
+            try:
+                for relative_path, file_info in self.google_drive.walk_folder(folder_id):
+                    if len(pending) >= Config.MAX_CONCURRENT_TRANSFERS:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        sent += self._collect_folder_results(done, failed)
+                    
+                    pending.add(self.transfer_pool.submit(
+                        bandwidth.as_bulk(self.transfer_drive_file_to_telegram), chat_id, relative_path, file_info))
+            except Exception as e:
+                # Files already started still finish; the summary says the folder is incomplete
+                listing_error = str(e)
+            
+            done, _ = wait(pending)
+            sent += self._collect_folder_results(done, failed)
+            
+            if not sent and not failed and not listing_error:
+                return self.send_message(chat_id, Config.MESSAGES['folder_empty'])
+            
+            self.stats['files_downloaded'] += sent
+            summary = Config.MESSAGES['folder_result'].format(sent, sent + len(failed))
+            if failed:
+                summary += "\nFailed:\n" + "\n".join(f"• {path}: {error}" for path, error in failed)
+            if listing_error:
+                self.stats['errors'] += 1
+                summary += "\n" + Config.MESSAGES['folder_incomplete'].format(listing_error)
+            return self.send_message(chat_id, summary)
+        
         except Exception as e:
-            logger.error(f"Error handling Google Drive download: {str(e)}")
+            logger.error(f"Error handling Google Drive folder download: {str(e)}")
+            self.stats['errors'] += 1
+            return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
+    
+    def handle_google_drive_folder_archive(self, chat_id, folder_id):
+        """Stream a Drive folder into a zip sent to Telegram, split into volumes when too large"""
+        try:
+            self.send_message(chat_id, Config.MESSAGES['processing'])
+            
+            folder_info = self.google_drive.get_file_info(folder_id) or {}
+            base_name = folder_info.get('name', f'drive_folder_{folder_id}').replace('/', '_')
+            
+            # Only metadata is collected up front, to decide whether volumes are needed
+            entries = [(path, info) for path, info in self.google_drive.walk_folder(folder_id)
+                       if self.google_drive.is_downloadable(info)]
+            if not entries:
+                return self.send_message(chat_id, Config.MESSAGES['folder_empty'])
+            
+            expected_size = estimate_zip_size((path, int(info.get('size', 0))) for path, info in entries)
+            split = expected_size > Config.ARCHIVE_VOLUME_SIZE
+            
+            # The first volume is on its way to Telegram before a second one could open, so
+            # its name is fixed up front; the estimate is an upper bound, so an archive
+            # judged to fit in one volume never needs a second
+            def open_volume(index):
+                if not split and index > 1:
+                    raise RuntimeError(f"{base_name}.zip outgrew its size estimate")
+                name = f"{base_name}.zip.{index:03d}" if split else f"{base_name}.zip"
+                return PipedUpload(lambda pipe: self.send_stream_to_telegram(chat_id, pipe, name), name)
+            
+            volumes = VolumeWriter(open_volume, Config.ARCHIVE_VOLUME_SIZE)
+            archive = StreamingZipWriter(volumes)
+            
+            try:
+                with bandwidth.bulk():
+                    for relative_path, file_info in entries:
+                        with archive.open_entry(relative_path, int(file_info.get('size', 0)) or None) as entry:
+                            self.google_drive.download_to_stream(file_info['id'], entry, file_info.get('md5Checksum'),
+                                                                 file_info.get('size'))
+                results = archive.close()
+            except Exception:
+                archive.abort()
+                raise
+            
+            self.stats['files_downloaded'] += len(entries)
+            message = Config.MESSAGES['archive_result'].format(len(entries), len(results))
+            if len(results) > 1:
+                message += "\n" + Config.MESSAGES['archive_join_hint'].format(base_name)
+            return self.send_message(chat_id, message)
+        
+        except Exception as e:
+            logger.error(f"Error archiving Google Drive folder: {str(e)}")
+            self.stats['errors'] += 1
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
     
+    def _collect_folder_results(self, futures, failed):
+        """Count successful folder transfers and record failures"""
+        sent = 0
+        for future in futures:
+            relative_path, error = future.result()
+            if error:
+                failed.append((relative_path, error))
+            else:
+                sent += 1
+        return sent
+    
+    def transfer_drive_file_to_telegram(self, chat_id, relative_path, file_info):
+        """Move one Drive file to Telegram, returning (relative_path, error)"""
+        try:
+            if not self.google_drive.is_downloadable(file_info):
+                return relative_path, "Google Docs files cannot be downloaded"
+            
+            # Same policy as a single link: send_file_to_telegram splits files above TELEGRAM_UPLOAD_LIMIT
+            file_path = self.google_drive.download_file(file_info['id'], file_info)
+            if not file_path:
+                return relative_path, "download from Google Drive failed"
+            
+            try:
+                if not self.send_file_to_telegram(chat_id, file_path, file_info['name'], file_info.get('mimeType')):
+                    return relative_path, "sending to Telegram failed"
+            finally:
+                self.file_utils.cleanup_file(file_path)
+            
+            return relative_path, None
+        
+        except Exception as e:
+            logger.error(f"Error transferring Drive file {relative_path}: {str(e)}")
+            return relative_path, str(e)
+    
     def handle_torrent_download(self, chat_id, magnet_link):
         """Handle torrent download (simplified implementation)"""
         try:
@@ -271,57 +932,294 @@ class BotHandler:
                     f"Full torrent support requires additional infrastructure.")
             else:
                 return self.send_message(chat_id, "Failed to process torrent.")
-                
+        
         except Exception as e:
             logger.error(f"Error handling torrent download: {str(e)}")
             return self.send_message(chat_id, Config.MESSAGES['error_occurred'].format(str(e)))
     
-    def download_telegram_file(self, file_id):
-        """Download file from Telegram"""
+    def max_telegram_file_size(self):
+        """Largest Telegram file the bot can fetch: the configured cap or the getFile limit"""
+        return Config.TELEGRAM_FILE_LIMIT
+    
+    def get_telegram_file_path(self, file_id):
+        """Resolve a file_id with getFile; a local Bot API server returns an absolute path"""
+        response = self.telegram_request('get', 'getFile', params={'file_id': file_id})
+        if response.status_code != 200:
+            return None
+        
+        file_info = response.json()
+        if not file_info['ok']:
+            return None
+        
+        return file_info['result']['file_path']
+    
+    def local_telegram_file(self, file_path):
+        """Return the path when a local Bot API server stored the file on a shared filesystem"""
+        if Config.TELEGRAM_LOCAL_MODE and os.path.isabs(file_path) and os.path.isfile(file_path):
+            return file_path
+        return None
+    
+    def download_telegram_file(self, file_id, file_size=None, filename=None, hasher=None):
+        """Download file from Telegram; a hasher sees every byte and the size Telegram reported is checked"""
+        local_file_path = None
         try:
-            # Get file info
-            response = requests.get(f"{self.api_url}/getFile?file_id={file_id}")
-            if response.status_code != 200:
-                return None
-            
-            file_info = response.json()
-            if not file_info['ok']:
+            file_path = self.get_telegram_file_path(file_id)
+            if not file_path:
                 return None
             
-            file_path = file_info['result']['file_path']
-            download_url = f"https://api.telegram.org/file/bot{self.token}/{file_path}"
-            
-            # Download file
-            response = requests.get(download_url)
-            if response.status_code != 200:
-                return None
+            # A local Bot API server already has the file on disk: hard-link it instead of copying
+            source_path = self.local_telegram_file(file_path)
+            if source_path:
+                local_file_path = self.file_utils.temp_storage.allocate(
+                    'tg', filename or file_id, os.path.getsize(source_path), preallocate=False)
+                os.remove(local_file_path)
+                try:
+                    os.link(source_path, local_file_path)
+                    # A hard link shares the server's blocks and uses no extra space
+                    self.file_utils.temp_storage.adjust(local_file_path, 0)
+                except OSError:
+                    # Different filesystem; copyfile uses an in-kernel copy where available
+                    shutil.copyfile(source_path, local_file_path)
+                
+                # No bytes streamed through us, so hash the file once via mmap
+                if hasher is not None:
+                    hash_file(local_file_path, hasher)
+                    hasher.verify(file_size, what=f"Telegram file {file_id}")
+                return local_file_path
             
             # Save to temp file
-            local_file_path = os.path.join(Config.TEMP_STORAGE_PATH, f"tg_{file_id}")
-            with open(local_file_path, 'wb') as f:
-                f.write(response.content)
+            local_file_path = self.file_utils.temp_storage.allocate('tg', filename or file_id, file_size)
+            with self.file_utils.temp_storage.open_spool(local_file_path) as f:
+                dest = HashingWriter(f, hasher or StreamHasher(()))
+                if not self.stream_telegram_file(file_id, dest, file_path, file_size):
+                    f.close()
+                    self.file_utils.cleanup_file(local_file_path)
+                    return None
+                f.truncate()
             
+            # A short read would otherwise be uploaded as if it were the whole file
+            dest.hasher.verify(file_size, what=f"Telegram file {file_id}")
             return local_file_path
-            
+        
         except Exception as e:
             logger.error(f"Error downloading Telegram file: {str(e)}")
+            if local_file_path:
+                self.file_utils.cleanup_file(local_file_path)
             return None
     
-    def send_file_to_telegram(self, chat_id, file_path):
-        """Send file to Telegram"""
+    def stream_telegram_file(self, file_id, dest, file_path=None, size=None):
+        """Write a Telegram file into a writable object chunk by chunk; size, if known, sets its bandwidth class"""
         try:
-            with open(file_path, 'rb') as f:
-                files = {'document': f}
-                data = {'chat_id': chat_id}
-                
-                response = requests.post(f"{self.api_url}/sendDocument", 
-                                       files=files, data=data)
-                
-                return response.status_code == 200
-                
+            # Get file info
+            file_path = file_path or self.get_telegram_file_path(file_id)
+            if not file_path:
+                return False
+            
+            source_path = self.local_telegram_file(file_path)
+            if source_path:
+                with open(source_path, 'rb') as src:
+                    shutil.copyfileobj(src, dest, READ_CHUNK_SIZE)
+                return True
+            
+            # Download file
+            flow = bandwidth.flow(INGRESS, size)
+            with self.telegram_request('get', 'file', url=f"{self.file_url}/{file_path}", stream=True) as response:
+                if response.status_code != 200:
+                    return False
+                for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+                    dest.write(chunk)
+                    flow.consume(len(chunk))
+            
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error streaming Telegram file: {str(e)}")
+            return False
+    
+    def send_file_to_telegram(self, chat_id, file_path, filename=None, mime_type=None):
+        """Send file to Telegram; returns the new file_id, True when sent in parts, or False"""
+        media = None
+        try:
+            filename = filename or os.path.basename(file_path)
+            file_size = os.path.getsize(file_path)
+            
+            # Files above the Bot API limit are sent as numbered parts plus a manifest
+            if file_size > Config.TELEGRAM_UPLOAD_LIMIT:
+                return self.send_file_in_parts(chat_id, file_path, filename)
+            
+            if file_size == 0:
+                return self.send_buffer_to_telegram(chat_id, b'', filename)
+            
+            # Videos go out faststart with a thumbnail, so they play right away
+            media = self.media_service.process(file_path, filename, mime_type, thumbnail=True, compress=False)
+            thumbnail = None
+            if media:
+                file_path, filename = media.path, media.filename
+                thumbnail = media.read_thumbnail()
+            
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self.send_buffer_to_telegram(chat_id, mapped, filename, thumbnail)
+        
         except Exception as e:
             logger.error(f"Error sending file to Telegram: {str(e)}")
             return False
+        
+        finally:
+            if media:
+                media.cleanup()
+    
+    def send_file_in_parts(self, chat_id, file_path, filename):
+        """Split a large file into byte ranges of a memory-mapped source and upload them concurrently"""
+        try:
+            file_size = os.path.getsize(file_path)
+            part_size = Config.SPLIT_PART_SIZE
+            
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                slices = []
+                try:
+                    parts = []
+                    futures = []
+                    for index, start, end in iter_part_ranges(file_size, part_size):
+                        name = part_name(filename, index)
+                        parts.append((name, end - start))
+                        slices.append(view[start:end])
+                        futures.append(self.part_upload_pool.submit(
+                            self.send_buffer_to_telegram, chat_id, slices[-1], name))
+                    
+                    results = [future.result() for future in futures]
+                finally:
+                    # Every view must be released before the mapping can close
+                    for part_view in slices:
+                        part_view.release()
+                    view.release()
+            
+            if not all(results):
+                logger.error(f"Failed to send {results.count(False)} of {len(results)} parts of {filename}")
+                return False
+            
+            manifest = build_manifest(filename, file_size, part_size, parts)
+            if not self.send_buffer_to_telegram(chat_id, manifest, manifest_name(filename)):
+                return False
+            
+            # Every part and the manifest arrived; the how-to-join note is best effort.
+            # /join is only offered when the bot can download the parts again
+            message = 'split_result' if part_size <= self.max_telegram_file_size() else 'split_result_no_join'
+            if not self.send_message(chat_id, Config.MESSAGES[message].format(len(parts), filename)):
+                logger.warning(f"Could not send the join instructions for {filename}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error sending file in parts: {str(e)}")
+            return False
+    
+    def send_buffer_to_telegram(self, chat_id, buffer, filename, thumbnail=None):
+        """Send a document from an in-memory or memory-mapped buffer without copying it; thumbnail is JPEG bytes"""
+        try:
+            boundary = uuid.uuid4().hex
+            fields = {'chat_id': chat_id}
+            attachments = None
+            if thumbnail:
+                fields['thumbnail'] = 'attach://thumbnail'
+                attachments = {'thumbnail': ('thumbnail.jpg', thumbnail)}
+            body = MultipartStream(fields, 'document', filename, buffer, boundary, attachments,
+                                   flow=bandwidth.flow(EGRESS, len(buffer)))
+            try:
+                response = self.telegram_request('post', 'sendDocument', data=body,
+                                                 headers={'Content-Type': f'multipart/form-data; boundary={boundary}',
+                                                          'Content-Length': str(len(body))})
+            finally:
+                body.close()
+            
+            if response.status_code != 200:
+                logger.error(f"Telegram rejected {filename}: {response.status_code}")
+                return False
+            return self.sent_file_id(response)
+        
+        except Exception as e:
+            logger.error(f"Error sending buffer to Telegram: {str(e)}")
+            return False
+    
+    def sent_file_id(self, response):
+        """file_id of the document in a send* response, so it can be forwarded without re-uploading; True if absent"""
+        try:
+            message = response.json().get('result')
+            if isinstance(message, dict):
+                for kind in ('document', 'video', 'audio', 'animation'):
+                    if kind in message:
+                        return message[kind]['file_id']
+        except (ValueError, KeyError, TypeError):
+            pass
+        return True
+    
+    def send_document_by_id(self, chat_id, file_id):
+        """Send a file Telegram already stores, by its file_id"""
+        try:
+            response = self.telegram_request('post', 'sendDocument', json={'chat_id': chat_id, 'document': file_id})
+            return response.status_code == 200
+        
+        except Exception as e:
+            logger.error(f"Error sending document {file_id}: {str(e)}")
+            return False
+    
+    def send_stream_to_telegram(self, chat_id, chunks, filename):
+        """Send a document to Telegram from an iterable of byte chunks without buffering it"""
+        try:
+            boundary = uuid.uuid4().hex
+            safe_name = filename.replace('"', "'")
+            # Streams of unknown length are archive volumes, i.e. bulk
+            chunks = bandwidth.flow(EGRESS, priority=BULK).iter(chunks)
+            
+            def body():
+                yield (f'--{boundary}\r\n'
+                       f'Content-Disposition: form-data; name="chat_id"\r\n\r\n{chat_id}\r\n'
+                       f'--{boundary}\r\n'
+                       f'Content-Disposition: form-data; name="document"; filename="{safe_name}"\r\n'
+                       f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+                for chunk in chunks:
+                    yield chunk
+                yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+            
+            # A generator body is sent with chunked transfer encoding; it cannot be replayed, so no retries
+            response = self.telegram_request('post', 'sendDocument', retry=False, data=body(),
+                                             headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+            return response.status_code == 200
+        
+        except Exception as e:
+            logger.error(f"Error streaming file to Telegram: {str(e)}")
+            return False
+    
+    def telegram_request(self, method, api_method, url=None, retry=True, **kwargs):
+        """
+        Call the Bot API through its circuit breaker. 429 and 5xx answers and
+        connection errors are retried with backoff, honouring retry_after;
+        other answers are returned to the caller as before. send* methods post
+        a new message every time they run, so they are only retried when
+        Telegram cannot have acted on the request.
+        """
+        url = url or f"{self.api_url}/{api_method}"
+        body = kwargs.get('data')
+        kwargs.setdefault('timeout', (Config.TELEGRAM_CONNECT_TIMEOUT, Config.TELEGRAM_HTTP_TIMEOUT))
+        if retry and api_method.startswith('send'):
+            retry = is_unsent
+        
+        def send():
+            # Replay a seekable body from the start on every attempt
+            if hasattr(body, 'seek'):
+                body.seek(0)
+            response = requests.request(method, url, **kwargs)
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = None
+                try:
+                    retry_after = response.json().get('parameters', {}).get('retry_after')
+                except ValueError:
+                    pass
+                response.close()
+                raise TransientError(f"Telegram {api_method} answered {response.status_code}", retry_after,
+                                     response.status_code)
+            return response
+        
+        return resilience.call(f"telegram:{api_method}", send, retry=retry)
     
     def send_message(self, chat_id, text):
         """Send text message to Telegram"""
@@ -332,9 +1230,9 @@ class BotHandler:
                 'parse_mode': 'HTML'
             }
             
-            response = requests.post(f"{self.api_url}/sendMessage", json=data)
+            response = self.telegram_request('post', 'sendMessage', json=data)
             return response.status_code == 200
-            
+        
         except Exception as e:
             logger.error(f"Error sending message: {str(e)}")
             return False
@@ -343,20 +1241,20 @@ class BotHandler:
         """Set up Telegram webhook"""
         try:
             data = {'url': Config.WEBHOOK_URL}
-            response = requests.post(f"{self.api_url}/setWebhook", json=data)
+            response = self.telegram_request('post', 'setWebhook', json=data)
             
             if response.status_code == 200:
                 result = response.json()
                 return result.get('ok', False)
             return False
-            
+        
         except Exception as e:
             logger.error(f"Error setting webhook: {str(e)}")
             return False
     
     def is_google_drive_link(self, text):
-        """Check if text is a Google Drive link"""
-        return 'drive.google.com' in text and '/file/d/' in text
+        """Check if text is a Google Drive file or folder link"""
+        return 'drive.google.com' in text and ('/file/d/' in text or '/folders/' in text)
     
     def is_magnet_link(self, text):
         """Check if text is a magnet link"""
@@ -371,6 +1269,15 @@ class BotHandler:
         except:
             return None
     
+    def extract_google_drive_folder_id(self, url):
+        """Extract folder ID from Google Drive folder URL"""
+        try:
+            if '/folders/' in url:
+                return url.split('/folders/')[1].split('/')[0].split('?')[0]
+            return None
+        except:
+            return None
+    
     def get_stats(self):
         """Get bot statistics"""
         return self.stats.copy()
@@ -6,14 +6,31 @@ class Config:
     TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
     TELEGRAM_API_ID = os.environ.get('TELEGRAM_API_ID')
     TELEGRAM_API_HASH = os.environ.get('TELEGRAM_API_HASH')
+    # Point at a self-hosted Bot API server (telegram-bot-api --local) to lift the file size limits
+    TELEGRAM_API_BASE_URL = os.environ.get('TELEGRAM_API_BASE_URL', 'https://api.telegram.org').rstrip('/')
+    TELEGRAM_LOCAL_MODE = os.environ.get('TELEGRAM_LOCAL_MODE', 'false').lower() == 'true'
     WEBHOOK_URL = os.environ.get('WEBHOOK_URL', 'https://your-app-name.onrender.com/webhook')
     
     # Google Drive Configuration
     GOOGLE_DRIVE_CREDENTIALS = os.environ.get('GOOGLE_DRIVE_CREDENTIALS')
     GOOGLE_DRIVE_FOLDER_ID = os.environ.get('GOOGLE_DRIVE_FOLDER_ID')
+    # Optional JSON list of {"credentials": {...}, "folder_id": "..."} to spread uploads over several accounts
+    GOOGLE_DRIVE_ACCOUNTS = os.environ.get('GOOGLE_DRIVE_ACCOUNTS')
+    DRIVE_ROUTING_STRATEGY = os.environ.get('DRIVE_ROUTING_STRATEGY', 'least_used')  # least_used or hash
+    DRIVE_DAILY_UPLOAD_QUOTA = int(os.environ.get('DRIVE_DAILY_UPLOAD_QUOTA', 750 * 1024 ** 3))  # bytes per account per day
+    DRIVE_RATE_LIMIT_COOLDOWN = int(os.environ.get('DRIVE_RATE_LIMIT_COOLDOWN', 60))  # seconds, doubled on repeats
+    TOKEN_CACHE_DIR = os.environ.get('TOKEN_CACHE_DIR', os.path.join(os.environ.get('TEMP_STORAGE_PATH', './temp_files'), '.cache'))
+    TOKEN_REFRESH_MARGIN = int(os.environ.get('TOKEN_REFRESH_MARGIN', 600))  # refresh tokens this many seconds before expiry
+    STATE_DB_PATH = os.environ.get('STATE_DB_PATH', os.path.join(TOKEN_CACHE_DIR, 'bot_state.db'))  # update/job dedup
+    DRIVE_DISCOVERY_PATH = os.environ.get('DRIVE_DISCOVERY_PATH')  # optional pinned drive.v3.json, defaults to the bundled copy
+    DRIVE_API_ROOT_URL = os.environ.get('DRIVE_API_ROOT_URL')  # optional Drive API host override, e.g. a local stand-in for benchmarks
     
     # File Configuration
-    MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE', 50 * 1024 * 1024))  # 50MB default
+    # getFile serves up to 20MB from the public Bot API and up to 2GB from a local server
+    TELEGRAM_DOWNLOAD_LIMIT = (2000 if TELEGRAM_LOCAL_MODE else 20) * 1024 * 1024
+    MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE',
+                                       (2000 if TELEGRAM_LOCAL_MODE else 50) * 1024 * 1024))  # 50MB default, 2GB in local mode
+    TELEGRAM_FILE_LIMIT = min(MAX_FILE_SIZE, TELEGRAM_DOWNLOAD_LIMIT)  # largest file the bot accepts from a chat
     ALLOWED_EXTENSIONS = {
         'video': ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm'],
         'audio': ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.m4a'],
@@ -22,62 +39,186 @@ class Config:
         'archive': ['.zip', '.rar', '.7z', '.tar', '.gz']
     }
     
+    # Transfer Configuration
+    TELEGRAM_UPLOAD_LIMIT = int(os.environ.get('TELEGRAM_UPLOAD_LIMIT',
+                                               (2000 if TELEGRAM_LOCAL_MODE else 50) * 1024 * 1024))  # Bot API sendDocument limit
+    ARCHIVE_VOLUME_SIZE = int(os.environ.get('ARCHIVE_VOLUME_SIZE', 49 * 1024 * 1024))  # leaves room for multipart headers
+    # Parts must stay within getFile's limit, or /join could not fetch them back
+    SPLIT_PART_SIZE = int(os.environ.get('SPLIT_PART_SIZE', min(49 * 1024 * 1024, TELEGRAM_DOWNLOAD_LIMIT)))
+    MAX_PARALLEL_PART_UPLOADS = int(os.environ.get('MAX_PARALLEL_PART_UPLOADS', 3))
+    JOIN_SESSION_TTL = int(os.environ.get('JOIN_SESSION_TTL', 3600))  # seconds an idle /join stays open
+    DRIVE_CHUNK_SIZE = int(os.environ.get('DRIVE_CHUNK_SIZE', 8 * 1024 * 1024))  # must be a multiple of 256KB
+    DEDUP_MIN_SIZE = int(os.environ.get('DEDUP_MIN_SIZE', 10 * 1024 * 1024))  # smaller uploads skip the duplicate-content lookup
+    
     # Storage Configuration
     TEMP_STORAGE_PATH = os.environ.get('TEMP_STORAGE_PATH', './temp_files')
+    TEMP_STORAGE_BUDGET = int(os.environ.get('TEMP_STORAGE_BUDGET', 4 * MAX_FILE_SIZE))  # bytes of spool files at once
+    TEMP_ADMISSION_TIMEOUT = float(os.environ.get('TEMP_ADMISSION_TIMEOUT', 300))  # seconds a job waits for space
+    TEMP_JANITOR_INTERVAL = int(os.environ.get('TEMP_JANITOR_INTERVAL', 600))  # seconds between orphan sweeps
+    TEMP_ORPHAN_AGE_HOURS = float(os.environ.get('TEMP_ORPHAN_AGE_HOURS', 6))
+    
+    # Concurrency Configuration
+    MAX_CONCURRENT_TRANSFERS = int(os.environ.get('MAX_CONCURRENT_TRANSFERS', 4))
+    DRIVE_CLIENT_POOL_SIZE = int(os.environ.get('DRIVE_CLIENT_POOL_SIZE', 8))  # parallel Drive connections per worker
+    DRIVE_HTTP_TIMEOUT = int(os.environ.get('DRIVE_HTTP_TIMEOUT', 120))  # seconds
+    TELEGRAM_CONNECT_TIMEOUT = int(os.environ.get('TELEGRAM_CONNECT_TIMEOUT', 10))  # seconds
+    TELEGRAM_HTTP_TIMEOUT = int(os.environ.get('TELEGRAM_HTTP_TIMEOUT', 300))  # seconds to wait for each read, incl. the answer to an upload
+    URL_HTTP_TIMEOUT = int(os.environ.get('URL_HTTP_TIMEOUT', 60))  # seconds to connect and between bytes of a URL download
+    DRIVE_COPY_CONCURRENCY = int(os.environ.get('DRIVE_COPY_CONCURRENCY', 8))  # parallel server-side copies per /clone
+    MEDIA_GROUP_WINDOW = float(os.environ.get('MEDIA_GROUP_WINDOW', 1.5))  # seconds to wait for the rest of an album
+    
+    # Bandwidth Configuration
+    BANDWIDTH_INGRESS_LIMIT = int(os.environ.get('BANDWIDTH_INGRESS_LIMIT', 0))  # bytes/s for all downloads together, 0 = unlimited
+    BANDWIDTH_EGRESS_LIMIT = int(os.environ.get('BANDWIDTH_EGRESS_LIMIT', 0))  # bytes/s for all uploads together, 0 = unlimited
+    BANDWIDTH_INTERACTIVE_MAX = int(os.environ.get('BANDWIDTH_INTERACTIVE_MAX', 20 * 1024 * 1024))  # larger transfers are bulk
+    BANDWIDTH_BULK_SHARE = float(os.environ.get('BANDWIDTH_BULK_SHARE', 0.25))  # share of a cap bulk gets while interactive transfers run
+    BANDWIDTH_RATE_WINDOW = int(os.environ.get('BANDWIDTH_RATE_WINDOW', 5))  # seconds averaged for the live rates
+    
+    # Resilience Configuration
+    RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 4))  # attempts per Drive/Telegram call
+    RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 0.5))  # seconds, doubled per attempt with jitter
+    RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 30))  # longest single wait; longer retry_after fails fast
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5))  # consecutive failures to open
+    BREAKER_RESET_TIMEOUT = float(os.environ.get('BREAKER_RESET_TIMEOUT', 30))  # seconds before a probe call
+    UPDATE_DEDUP_WINDOW = int(os.environ.get('UPDATE_DEDUP_WINDOW', 10000))  # recent update_ids remembered
+    JOB_CLAIM_TTL = int(os.environ.get('JOB_CLAIM_TTL', 3600))  # seconds before an unfinished job can be retaken
+    
+    # Media Processing Configuration
+    MEDIA_PROCESSING = os.environ.get('MEDIA_PROCESSING', 'false').lower() == 'true'  # opt-in, and only when ffmpeg is installed
+    FFMPEG_PATH = os.environ.get('FFMPEG_PATH', 'ffmpeg')
+    FFPROBE_PATH = os.environ.get('FFPROBE_PATH', 'ffprobe')
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))  # ffmpeg processes at once
+    MEDIA_FFMPEG_THREADS = int(os.environ.get('MEDIA_FFMPEG_THREADS', 2))  # threads per ffmpeg process
+    MEDIA_COMPRESS_ABOVE = int(os.environ.get('MEDIA_COMPRESS_ABOVE', 0))  # re-encode uploaded videos above this many bytes, 0 = never
+    MEDIA_COMPRESS_CRF = int(os.environ.get('MEDIA_COMPRESS_CRF', 28))  # x264 quality when re-encoding, lower is better
+    MEDIA_JOB_TIMEOUT = int(os.environ.get('MEDIA_JOB_TIMEOUT', 900))  # seconds per ffmpeg run
+    
+    # Logging Configuration
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()  # json (one object per line) or text
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # records buffered before new ones are dropped
+    LOG_SAMPLE_EVERY = int(os.environ.get('LOG_SAMPLE_EVERY', 50))  # keep 1 in N per-chunk/progress records
+    
+    # Folder Mirror Configuration
+    MIRROR_FOLDER_ID = os.environ.get('MIRROR_FOLDER_ID')  # Drive folder whose new files are sent to MIRROR_CHAT_ID
+    MIRROR_CHAT_ID = os.environ.get('MIRROR_CHAT_ID')  # channel/chat id or @channelusername; the bot must be able to post
+    MIRROR_POLL_INTERVAL = int(os.environ.get('MIRROR_POLL_INTERVAL', 60))  # seconds between changes feed polls
+    MIRROR_BACKFILL = os.environ.get('MIRROR_BACKFILL', 'false').lower() == 'true'  # also send existing files on first run
+    MIRROR_MAX_ATTEMPTS = int(os.environ.get('MIRROR_MAX_ATTEMPTS', 3))  # tries per file before it is given up
     
     # Bot Messages
     MESSAGES = {
         'welcome': """🤖 Welcome to File Transfer Bot!
-        
+
 Available commands:
 /start - Show this help message
 /upload [file/link] - Upload file to Google Drive
 /download [google_drive_link] - Download from Google Drive to Telegram
 /torrent [magnet_link] - Handle torrent downloads
+/zip [links] - Pack several files into one archive on Google Drive
+/join - Reassemble a file that was sent in parts
+/clone [google_drive_link] - Copy a shared Drive file or folder into our Drive
 /status - Check bot status
 /help - Show detailed help
 
 Simply send me a file and I'll upload it to Google Drive!""",
         
-        'help': """📖 Detailed Help:
+        'help': f"""📖 Detailed Help:
 
 🔸 File Upload:
 - Send any file directly to upload to Google Drive
 - Use /upload command with file or link
+- Albums are uploaded together and answered in one message
 - Supported: Videos, Audio, Documents, Images, Archives
 
 🔸 Google Drive Download:
 - Use /download with Google Drive share link
+- Folder links send every file in the folder
+- Add "zip" after a folder link to get it as one archive
 - Files will be sent back to Telegram
 
+🔸 Drive Copy:
+- Use /clone with a shared Drive file or folder link
+- The copy is made by Google Drive itself, nothing is downloaded
+
+🔸 Large Files:
+- Files above the Telegram limit are sent as parts with a manifest
+- Use /join, then send the parts back to rebuild the file on Google Drive
+
+🔸 Archives:
+- Use /zip with several links to store them as one zip on Google Drive
+
 🔸 Torrent Handling:
 - Use /torrent with magnet link (basic support)
 - Files will be processed and uploaded to Google Drive
 
 🔸 Limits:
-- Maximum file size: 50MB
+- Maximum file size: {TELEGRAM_FILE_LIMIT // (1024 * 1024)}MB for files sent to the bot, {MAX_FILE_SIZE // (1024 * 1024)}MB for links
 - Supported formats: Most common file types
 
 🔸 Commands:
 /status - Check bot and service status
 /help - Show this help message""",
         
-        'file_too_large': '❌ File is too large. Maximum size is 50MB.',
+        'file_too_large': f'❌ File is too large. Maximum size is {TELEGRAM_FILE_LIMIT // (1024 * 1024)}MB.',
         'unsupported_format': '❌ Unsupported file format.',
         'upload_success': '✅ File uploaded to Google Drive successfully!',
         'download_success': '✅ File downloaded and sent successfully!',
         'error_occurred': '❌ An error occurred: {}',
         'processing': '⏳ Processing your request...',
+        'already_in_progress': '⏳ Already working on this one, the result will follow.',
+        'album_processing': '⏳ Processing {} files from your album...',
+        'album_result': '✅ Uploaded {} of {} album files to Google Drive:\n{}',
+        'folder_processing': '⏳ Downloading folder, files will arrive as they finish...',
+        'folder_result': '✅ Sent {} of {} files from the folder.',
+        'folder_empty': '📂 The folder has no files to download.',
+        'folder_incomplete': '⚠️ Listing the folder failed part way, so some files are missing: {}',
+        'archive_result': '✅ Sent {} files as an archive in {} part(s).',
+        'archive_join_hint': 'Join the parts before extracting: cat {0}.zip.* > {0}.zip',
+        'split_result': '📦 {1} was sent in {0} parts. Join them with: cat {1}.0* > {1}, or send them back after /join.',
+        'split_result_no_join': '📦 {1} was sent in {0} parts. Join them with: cat {1}.0* > {1}',
+        'join_started': '🧩 Send the parts and the .manifest.json file. They are joined on Google Drive once all parts arrive (or send /join done).',
+        'join_cancelled': '🧩 Join cancelled.',
+        'join_no_parts': '❌ No parts received. Start with /join and send the parts.',
+        'join_missing': '❌ Still missing parts: {}',
+        'join_part_too_large': '❌ {} is larger than the {}MB the bot can download from Telegram, so it cannot be joined here.',
+        'join_not_a_part': '📎 {} is not a part or manifest, so it is handled as a normal upload. /join is still open; send /join cancel to stop it.',
+        'clone_processing': '⏳ Copying folder on Google Drive...',
+        'clone_success': '✅ File copied to Google Drive!\nGoogle Drive link: {}',
+        'clone_folder_result': '✅ Copied {} of {} files to Google Drive.\nFolder link: {}',
+        'clone_no_access': '❌ Could not open that Drive link. Make sure it is shared with "anyone with the link".',
         'invalid_link': '❌ Invalid or unsupported link format.',
         'google_drive_error': '❌ Google Drive service is not configured properly.'
     }
     
+    _credentials_dict = None
+    
     @classmethod
     def get_credentials_dict(cls):
-        """Parse Google Drive credentials from environment variable"""
+        """Parse Google Drive credentials from environment variable (parsed once)"""
         if cls.GOOGLE_DRIVE_CREDENTIALS:
-            try:
-                return json.loads(cls.GOOGLE_DRIVE_CREDENTIALS)
-            except json.JSONDecodeError:
-                return None
+            if cls._credentials_dict is None:
+                try:
+                    cls._credentials_dict = json.loads(cls.GOOGLE_DRIVE_CREDENTIALS)
+                except json.JSONDecodeError:
+                    return None
+            return cls._credentials_dict
         return None
+    
+    @classmethod
+    def get_drive_accounts(cls):
+        """List of (credentials_dict, folder_id) for every configured Drive account"""
+        if cls.GOOGLE_DRIVE_ACCOUNTS:
+            try:
+                accounts = []
+                for entry in json.loads(cls.GOOGLE_DRIVE_ACCOUNTS):
+                    credentials = entry['credentials']
+                    if isinstance(credentials, str):
+                        credentials = json.loads(credentials)
+                    accounts.append((credentials, entry.get('folder_id') or cls.GOOGLE_DRIVE_FOLDER_ID))
+                return accounts
+            except (json.JSONDecodeError, KeyError, TypeError):
+                return []
+        
+        credentials = cls.get_credentials_dict()
+        return [(credentials, cls.GOOGLE_DRIVE_FOLDER_ID)] if credentials else []
@@ -49,5 +49,5 @@ if [ "$1" = "dev" ]; then
     python app.py
 else
     echo "🏭 Running in production mode..."
-    gunicorn --bind 0.0.0.0:${PORT:-5000} --reuse-port --reload main:app
+    gunicorn --bind 0.0.0.0:${PORT:-5000} --reuse-port --workers 1 --threads 8 --reload main:app
 fi
\ No newline at end of file
@@ -0,0 +1,200 @@
+import bisect
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from googleapiclient.errors import HttpError
+from config import Config
+from token_cache import FileLock
+from resilience import RATE_LIMIT_REASONS, drive_error_reasons
+
+logger = logging.getLogger(__name__)
+
+# Drive error reasons that mean "this account cannot upload right now"
+DAILY_LIMIT_REASONS = {'quotaExceeded', 'dailyLimitExceeded', 'uploadLimitExceeded', 'storageQuotaExceeded'}
+
+def quota_error_reason(error):
+    """Return the quota/rate-limit reason of a Drive HttpError, or None for other errors"""
+    if not isinstance(error, HttpError) or error.resp.status not in (403, 429):
+        return None
+    
+    for reason in drive_error_reasons(error):
+        if reason in RATE_LIMIT_REASONS or reason in DAILY_LIMIT_REASONS:
+            return reason
+    return 'rateLimitExceeded' if error.resp.status == 429 else None
+
+def seconds_until_quota_reset():
+    """Drive upload quotas roll over at midnight UTC"""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    tomorrow = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+class DriveAccount:
+    """A service account, its upload folder and its own pool of Drive clients"""
+    
+    def __init__(self, credentials_dict, folder_id=None):
+        self.credentials_dict = credentials_dict
+        self.name = credentials_dict.get('client_email', 'service-account')
+        self.folder_id = folder_id
+        self.credentials = None
+        self.token_manager = None
+        self.pool = None
+    
+    def __repr__(self):
+        return f"DriveAccount({self.name})"
+
+class UsageLedger:
+    """
+    Bytes uploaded per account today, plus accounts that are blocked by a
+    quota error. Kept in a JSON file under TOKEN_CACHE_DIR so every worker on
+    the host routes against the same numbers.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(Config.TOKEN_CACHE_DIR, 'drive_usage.json')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._thread_lock = threading.Lock()
+        self._snapshot = {}
+        self._snapshot_time = 0
+    
+    def _today(self):
+        return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d')
+    
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        
+        # Counters from previous days no longer apply
+        if entries.get('date') != self._today():
+            entries = {'date': self._today(), 'accounts': {}}
+        return entries
+    
+    def _save(self, entries):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+        self._snapshot = entries
+        self._snapshot_time = time.monotonic()
+    
+    def _update(self, name, update):
+        with FileLock(f"{self.path}.lock", self._thread_lock):
+            entries = self._load()
+            entry = entries['accounts'].setdefault(name, {'bytes': 0, 'blocked_until': 0, 'strikes': 0})
+            update(entry)
+            self._save(entries)
+    
+    def snapshot(self, max_age=5):
+        """Usage of every account, re-read from disk at most every max_age seconds"""
+        if time.monotonic() - self._snapshot_time > max_age or self._snapshot.get('date') != self._today():
+            with FileLock(f"{self.path}.lock", self._thread_lock):
+                self._snapshot = self._load()
+                self._snapshot_time = time.monotonic()
+        return self._snapshot.get('accounts', {})
+    
+    def record_upload(self, name, size):
+        def update(entry):
+            entry['bytes'] += size
+            entry['strikes'] = 0
+        self._update(name, update)
+    
+    def block(self, name, seconds):
+        def update(entry):
+            entry['blocked_until'] = max(entry['blocked_until'], time.time() + seconds)
+            entry['strikes'] += 1
+        self._update(name, update)
+    
+    def strikes(self, name):
+        return self.snapshot(max_age=0).get(name, {}).get('strikes', 0)
+
+class AccountRouter:
+    """
+    Picks the account for each upload.
+    'least_used' sends the upload to the account with the most quota left
+    today; 'hash' places accounts on a consistent hash ring so the same key
+    (e.g. a file name) keeps landing on the same account. Either way, accounts
+    without room for the file or blocked by a quota error are skipped.
+    """
+    
+    VIRTUAL_NODES = 64
+    
+    def __init__(self, accounts, strategy=None, daily_quota=None, ledger=None):
+        self.accounts = accounts
+        self.strategy = strategy or Config.DRIVE_ROUTING_STRATEGY
+        self.daily_quota = daily_quota or Config.DRIVE_DAILY_UPLOAD_QUOTA
+        self.ledger = ledger or UsageLedger()
+        self.failovers = 0
+        
+        self.ring = sorted(
+            (self._hash(f"{account.name}#{replica}"), index)
+            for index, account in enumerate(accounts)
+            for replica in range(self.VIRTUAL_NODES)
+        )
+        self.ring_keys = [position for position, _ in self.ring]
+    
+    def _hash(self, key):
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+    
+    def _is_available(self, account, size, usage, now):
+        entry = usage.get(account.name, {})
+        if entry.get('blocked_until', 0) > now:
+            return False
+        return entry.get('bytes', 0) + (size or 0) <= self.daily_quota
+    
+    def candidates(self, key='', size=None):
+        """Accounts in the order they should be tried for this upload"""
+        usage = self.ledger.snapshot()
+        now = time.time()
+        
+        if self.strategy == 'hash' and len(self.accounts) > 1:
+            start = bisect.bisect(self.ring_keys, self._hash(key or ''))
+            ordered = []
+            for offset in range(len(self.ring)):
+                index = self.ring[(start + offset) % len(self.ring)][1]
+                if self.accounts[index] not in ordered:
+                    ordered.append(self.accounts[index])
+        else:
+            ordered = sorted(self.accounts, key=lambda account: usage.get(account.name, {}).get('bytes', 0))
+        
+        return [account for account in ordered if self._is_available(account, size, usage, now)]
+    
+    def record_upload(self, account, size):
+        if size:
+            self.ledger.record_upload(account.name, size)
+    
+    def report_quota_error(self, account, reason):
+        """Take an account out of rotation after a quota error"""
+        self.failovers += 1
+        if reason in DAILY_LIMIT_REASONS:
+            seconds = seconds_until_quota_reset()
+        else:
+            # Back off harder each time; a rate limit that keeps recurring is the daily cap
+            seconds = min(Config.DRIVE_RATE_LIMIT_COOLDOWN * 2 ** self.ledger.strikes(account.name),
+                          seconds_until_quota_reset())
+        self.ledger.block(account.name, seconds)
+        logger.warning(f"Drive account {account.name} hit {reason}, paused for {int(seconds)}s")
+    
+    def get_stats(self):
+        """Per-account upload volume today and availability"""
+        usage = self.ledger.snapshot()
+        now = time.time()
+        return {
+            'strategy': self.strategy,
+            'daily_quota': self.daily_quota,
+            'failovers': self.failovers,
+            'accounts': [
+                {
+                    'name': account.name,
+                    'folder_id': account.folder_id,
+                    'bytes_today': usage.get(account.name, {}).get('bytes', 0),
+                    'blocked_for': max(int(usage.get(account.name, {}).get('blocked_until', 0) - now), 0)
+                }
+                for account in self.accounts
+            ]
+        }
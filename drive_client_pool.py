@@ -0,0 +1,110 @@
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class DriveClientPool:
+    """
+    Checkout/return pool of Drive API clients.
+    Each client owns its own authorized httplib2 connection (which is not
+    thread-safe), while all of them share one credential, so N transfers can
+    run in parallel without serializing on a single connection. Clients are
+    built on demand up to the pool size; further callers wait for a return.
+    
+    Two checkouts that feed each other (a Drive download streamed into a
+    piped Drive upload) would deadlock a full pool whichever took the last
+    client, so both check out with wait=False: when the pool is exhausted
+    they get a one-off overflow client instead of waiting.
+    """
+    
+    def __init__(self, build_client, size):
+        self.build_client = build_client
+        self.size = max(1, size)
+        self.idle = collections.deque()
+        self.created = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.overflows = 0
+        self.wait_time = 0.0
+        self.cond = threading.Condition()
+    
+    def acquire(self, wait=True):
+        """Take an idle client, build a new one below the size limit, or wait for one; None means overflow"""
+        with self.cond:
+            if not self.idle and self.created >= self.size and not wait:
+                self.overflows += 1
+                return None
+            
+            if not self.idle and self.created >= self.size:
+                self.waits += 1
+                started = time.monotonic()
+                while not self.idle and self.created >= self.size:
+                    self.cond.wait()
+                self.wait_time += time.monotonic() - started
+            
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            if self.idle:
+                return self.idle.pop()
+            self.created += 1
+        
+        # Build outside the lock so slow construction doesn't block returns
+        try:
+            return self.build_client()
+        except Exception:
+            with self.cond:
+                self.created -= 1
+                self.in_use -= 1
+                self.cond.notify()
+            raise
+    
+    def release(self, client, discard=False):
+        """Return a client; discarded clients (e.g. after a transport error) are rebuilt later"""
+        with self.cond:
+            self.in_use -= 1
+            if discard:
+                self.created -= 1
+            else:
+                self.idle.append(client)
+            self.cond.notify()
+    
+    @contextlib.contextmanager
+    def client(self, wait=True):
+        """Context manager that checks a client out for the duration of the block"""
+        client = self.acquire(wait)
+        if client is None:
+            # Overflow: never counted against the pool, dropped after use
+            yield self.build_client()
+            return
+        
+        discard = False
+        try:
+            yield client
+        except (ConnectionError, OSError):
+            # The connection may be half-used; don't hand it to the next caller
+            discard = True
+            raise
+        finally:
+            self.release(client, discard)
+    
+    def stats(self):
+        """Pool utilisation"""
+        with self.cond:
+            return {
+                'size': self.size,
+                'created': self.created,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'peak_in_use': self.peak_in_use,
+                'utilisation': round(self.in_use / self.size, 2),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'overflows': self.overflows,
+                'avg_wait_ms': round(self.wait_time * 1000 / self.waits, 1) if self.waits else 0.0
+            }
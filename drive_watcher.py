@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from config import Config
+from google_drive_service import FOLDER_MIME_TYPE
+
+logger = logging.getLogger(__name__)
+
+class MirrorState:
+    """
+    Persistent state of the folder mirror, in the same SQLite file as the
+    update ledger: the changes feed page token, the files already mirrored,
+    the files waiting for another attempt, and a lease so only one worker on
+    the host polls at a time.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or Config.STATE_DB_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+    
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS mirror_state (key TEXT PRIMARY KEY, value TEXT)')
+            conn.execute('CREATE TABLE IF NOT EXISTS mirrored (file_id TEXT PRIMARY KEY, md5 TEXT, mirrored_at REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS mirror_retries '
+                         '(file_id TEXT PRIMARY KEY, folder_id TEXT, info TEXT, attempts INTEGER)')
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner INTEGER, expires REAL)')
+            self._conn = conn
+        return self._conn
+    
+    def get(self, key):
+        with self._lock:
+            row = self._connection().execute('SELECT value FROM mirror_state WHERE key = ?', (key,)).fetchone()
+            return row[0] if row else None
+    
+    def set(self, key, value):
+        with self._lock:
+            self._connection().execute('INSERT OR REPLACE INTO mirror_state (key, value) VALUES (?, ?)', (key, value))
+    
+    def is_mirrored(self, file_id):
+        with self._lock:
+            return self._connection().execute('SELECT 1 FROM mirrored WHERE file_id = ?', (file_id,)).fetchone() is not None
+    
+    def pending_retries(self, folder_id):
+        """Metadata of the files of a mirror that failed and are due another attempt"""
+        with self._lock:
+            rows = self._connection().execute('SELECT info FROM mirror_retries WHERE folder_id = ?',
+                                              (folder_id,)).fetchall()
+        return [json.loads(info) for info, in rows]
+    
+    def is_pending_retry(self, file_id):
+        with self._lock:
+            return self._connection().execute('SELECT 1 FROM mirror_retries WHERE file_id = ?',
+                                              (file_id,)).fetchone() is not None
+    
+    def record_failure(self, folder_id, file_info, max_attempts):
+        """Count a failed attempt; the file stays queued until it has had max_attempts. Returns the count"""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute('SELECT attempts FROM mirror_retries WHERE file_id = ?', (file_info['id'],)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            if attempts < max_attempts:
+                conn.execute('INSERT OR REPLACE INTO mirror_retries (file_id, folder_id, info, attempts) '
+                             'VALUES (?, ?, ?, ?)', (file_info['id'], folder_id, json.dumps(file_info), attempts))
+            else:
+                conn.execute('DELETE FROM mirror_retries WHERE file_id = ?', (file_info['id'],))
+            return attempts
+    
+    def mark_mirrored(self, file_id, md5=None):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO mirrored (file_id, md5, mirrored_at) VALUES (?, ?, ?)',
+                         (file_id, md5, time.time()))
+            conn.execute('DELETE FROM mirror_retries WHERE file_id = ?', (file_id,))
+    
+    def acquire_lease(self, name, ttl):
+        """True if this worker holds the lease, renewing it, or took it over after it expired"""
+        with self._lock:
+            now = time.time()
+            cursor = self._connection().execute(
+                'INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires '
+                'WHERE leases.expires < ? OR leases.owner = ?',
+                (name, os.getpid(), now + ttl, now, os.getpid()))
+            return cursor.rowcount == 1
+    
+    @contextmanager
+    def hold_lease(self, name, ttl):
+        """
+        Keep renewing a lease acquired with acquire_lease while the block
+        runs, however long it takes. Yields an event that is set if a renewal
+        failed, i.e. another worker may have taken over.
+        """
+        done = threading.Event()
+        lost = threading.Event()
+        
+        def renew():
+            while not done.wait(ttl / 3):
+                try:
+                    renewed = self.acquire_lease(name, ttl)
+                except sqlite3.Error as e:
+                    logger.error(f"Error renewing lease {name}: {str(e)}")
+                    renewed = False
+                if not renewed:
+                    lost.set()
+        
+        heartbeat = threading.Thread(target=renew, name=f"lease-{name}", daemon=True)
+        heartbeat.start()
+        try:
+            yield lost
+        finally:
+            done.set()
+            heartbeat.join()
+
+class DriveWatcher:
+    """
+    Mirrors new files of a Drive folder (and its subfolders) into a Telegram
+    chat. Each poll reads the Drive changes feed from the persisted page
+    token, so API calls scale with the number of changes, not the folder
+    size. New files are sent concurrently on the transfer pool; the token is
+    saved only after the batch finished, and files already mirrored are
+    skipped, so a restart neither loses nor repeats files. A file that fails
+    is queued in MirrorState and tried again on the next polls, also after a
+    restart, up to MIRROR_MAX_ATTEMPTS times. The polling worker holds the
+    lease for the whole poll, so no other worker replays the same token.
+    """
+    
+    def __init__(self, google_drive, send_file, executor, folder_id=None, chat_id=None, state=None):
+        self.google_drive = google_drive
+        self.send_file = send_file
+        self.executor = executor
+        self.folder_id = folder_id or Config.MIRROR_FOLDER_ID
+        self.chat_id = chat_id or Config.MIRROR_CHAT_ID
+        self.state = state or MirrorState()
+        self.folders = None
+        self.stats = {'polls': 0, 'changes_seen': 0, 'mirrored': 0, 'skipped': 0, 'failed': 0, 'last_poll': None}
+        self._thread = None
+        self._stop = threading.Event()
+    
+    @property
+    def enabled(self):
+        return bool(self.folder_id and self.chat_id)
+    
+    def start(self):
+        if not self.enabled or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='drive-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Mirroring Drive folder {self.folder_id} to chat {self.chat_id}")
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        lease = f"mirror:{self.folder_id}"
+        ttl = Config.MIRROR_POLL_INTERVAL * 3
+        while not self._stop.wait(Config.MIRROR_POLL_INTERVAL):
+            # Several gunicorn workers share the host; one of them polls
+            if not self.state.acquire_lease(lease, ttl):
+                continue
+            try:
+                with self.state.hold_lease(lease, ttl) as lost:
+                    self.poll(lost)
+            except Exception as e:
+                logger.error(f"Error polling Drive changes: {str(e)}")
+    
+    def poll(self, lease_lost=None):
+        """Process the changes since the saved page token; returns the number of files mirrored"""
+        token = self.state.get(f"page_token:{self.folder_id}")
+        if token is None:
+            # First run: start from now, optionally sending what the folder already holds
+            token = self.google_drive.get_start_page_token()
+            if Config.MIRROR_BACKFILL:
+                self._mirror_batch(info for _, info in self.google_drive.walk_folder(self.folder_id)
+                                   if self._should_mirror(info))
+            self.state.set(f"page_token:{self.folder_id}", token)
+            return 0
+        
+        if self.folders is None:
+            self.folders = {self.folder_id, *self.google_drive.iter_subfolders(self.folder_id)}
+        
+        # Files that failed on earlier polls go first
+        mirrored = self._mirror_batch(self.state.pending_retries(self.folder_id))
+        
+        while token:
+            if lease_lost is not None and lease_lost.is_set():
+                # Stop at a page boundary; the new holder continues from the saved token
+                raise RuntimeError(f"Lost the mirror lease of {self.folder_id}")
+            changes, next_page, new_start = self.google_drive.list_changes(token)
+            self.stats['changes_seen'] += len(changes)
+            mirrored += self._mirror_batch(self._new_files(changes))
+            
+            # Only after the page's files are sent, so a crash replays rather than loses them
+            token = next_page or new_start
+            self.state.set(f"page_token:{self.folder_id}", token)
+            if not next_page:
+                break
+        
+        self.stats['polls'] += 1
+        self.stats['last_poll'] = time.time()
+        return mirrored
+    
+    def _new_files(self, changes):
+        """Files from a page of changes that belong to the watched tree and were not mirrored yet"""
+        for change in changes:
+            file_info = change.get('file')
+            if change.get('removed') or not file_info or file_info.get('trashed'):
+                continue
+            if not self.folders.intersection(file_info.get('parents', [])):
+                continue
+            
+            if file_info.get('mimeType') == FOLDER_MIME_TYPE:
+                # A new subfolder; its files arrive as changes of their own
+                self.folders.add(file_info['id'])
+                continue
+            
+            if self._should_mirror(file_info):
+                yield file_info
+    
+    def _should_mirror(self, file_info):
+        # Renames and other metadata edits show up as changes too
+        if (not self.google_drive.is_downloadable(file_info) or self.state.is_pending_retry(file_info['id'])
+                or self.state.is_mirrored(file_info['id'])):
+            self.stats['skipped'] += 1
+            return False
+        return True
+    
+    def _mirror_batch(self, files):
+        """Send files concurrently, at most MAX_CONCURRENT_TRANSFERS in flight, and wait for all of them"""
+        futures = {}
+        mirrored = 0
+        for file_info in files:
+            if len(futures) >= Config.MAX_CONCURRENT_TRANSFERS:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                mirrored += self._collect(done, futures)
+            futures[self.executor.submit(self.send_file, self.chat_id, file_info['name'], file_info)] = file_info
+        
+        done, _ = wait(futures)
+        return mirrored + self._collect(done, futures)
+    
+    def _collect(self, done, futures):
+        mirrored = 0
+        for future in done:
+            file_info = futures.pop(future)
+            _, error = future.result()
+            if error:
+                attempts = self.state.record_failure(self.folder_id, file_info, Config.MIRROR_MAX_ATTEMPTS)
+                logger.warning(f"Could not mirror {file_info['name']} (attempt {attempts}): {error}")
+                self.stats['failed'] += 1
+            else:
+                self.state.mark_mirrored(file_info['id'], file_info.get('md5Checksum'))
+                self.stats['mirrored'] += 1
+                mirrored += 1
+        return mirrored
+    
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        return stats
@@ -2,8 +2,11 @@ import os
 import logging
 import requests
 import mimetypes
-from urllib.parse import urlparse
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 from config import Config
+from temp_storage import temp_storage
+from archive_utils import READ_CHUNK_SIZE
+from bandwidth import bandwidth, INGRESS
 
 logger = logging.getLogger(__name__)
 
@@ -12,25 +15,17 @@ class FileUtils:
     
     def __init__(self):
         self.temp_path = Config.TEMP_STORAGE_PATH
+        self.temp_storage = temp_storage
         os.makedirs(self.temp_path, exist_ok=True)
     
-    def download_from_url(self, url, filename=None):
-        """Download file from URL"""
+    def download_from_url(self, url, filename=None, hasher=None):
+        """Download file from URL; a hasher sees every byte as it is written"""
+        local_file_path = None
         try:
-            # Validate URL
-            parsed_url = urlparse(url)
-            if not parsed_url.scheme or not parsed_url.netloc:
-                logger.error("Invalid URL format")
+            response = self.open_url_stream(url)
+            if response is None:
                 return None
             
-            # Make request with headers
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, stream=True)
-            response.raise_for_status()
-            
             # Check content length
             content_length = response.headers.get('content-length')
             if content_length and int(content_length) > Config.MAX_FILE_SIZE:
@@ -42,32 +37,84 @@ class FileUtils:
                 filename = self.get_filename_from_url(url, response)
             
             # Create local file path
-            local_file_path = os.path.join(self.temp_path, f"url_{filename}")
+            local_file_path = self.temp_storage.allocate(
+                'url', filename, int(content_length) if content_length else None)
             
             # Download file
             total_size = 0
-            with open(local_file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+            flow = bandwidth.flow(INGRESS, int(content_length) if content_length else None)
+            with self.temp_storage.open_spool(local_file_path) as f:
+                for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
                     if chunk:
                         f.write(chunk)
                         total_size += len(chunk)
+                        flow.consume(len(chunk))
+                        if hasher is not None:
+                            hasher.update(chunk)
                         
                         # Check size limit during download
                         if total_size > Config.MAX_FILE_SIZE:
                             f.close()
-                            os.remove(local_file_path)
+                            self.cleanup_file(local_file_path)
                             logger.error("File size exceeded limit during download")
                             return None
+                f.truncate()
+            
+            self.temp_storage.adjust(local_file_path, total_size)
+            
+            # Content-Length counts encoded bytes, so it only says something about identity responses
+            if content_length and not response.headers.get('content-encoding') and int(content_length) != total_size:
+                self.cleanup_file(local_file_path)
+                logger.error(f"Truncated download: expected {content_length} bytes, got {total_size}")
+                return None
             
             logger.info(f"Downloaded file: {filename} ({total_size} bytes)")
             return local_file_path
-            
+        
         except requests.RequestException as e:
             logger.error(f"Request error downloading file: {str(e)}")
-            return None
         except Exception as e:
             logger.error(f"Error downloading file from URL: {str(e)}")
+        
+        # The path is still active, so the janitor would never return its reservation
+        if local_file_path:
+            self.cleanup_file(local_file_path)
+        return None
+    
+    def open_url_stream(self, url):
+        """Open a streaming GET request for a URL, returning the response"""
+        # Validate URL
+        parsed_url = urlparse(url)
+        if not parsed_url.scheme or not parsed_url.netloc:
+            logger.error("Invalid URL format")
             return None
+        
+        # Make request with headers
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        }
+        
+        response = requests.get(url, headers=headers, stream=True, timeout=Config.URL_HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response
+    
+    def normalize_url(self, url):
+        """Canonical form of a URL, so equivalent links map to the same key"""
+        parsed = urlparse(url.strip())
+        scheme = parsed.scheme.lower()
+        host = (parsed.hostname or '').lower()
+        
+        # Drop default ports, fragments and the order of query parameters
+        port = parsed.port
+        if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+            host = f"{host}:{port}"
+        
+        # Credentials pick what the server returns, so links with different ones are different files
+        userinfo, _, _ = parsed.netloc.rpartition('@')
+        if userinfo:
+            host = f"{userinfo}@{host}"
+        query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+        return urlunparse((scheme, host, parsed.path or '/', parsed.params, query, ''))
     
     def get_filename_from_url(self, url, response=None):
         """Extract filename from URL or response headers"""
@@ -90,7 +137,7 @@ class FileUtils:
             content_type = response.headers.get('content-type', '') if response else ''
             extension = mimetypes.guess_extension(content_type.split(';')[0]) or '.bin'
             return f"downloaded_file{extension}"
-            
+        
         except Exception as e:
             logger.error(f"Error getting filename: {str(e)}")
             return "downloaded_file.bin"
@@ -105,7 +152,7 @@ class FileUtils:
                     return file_type
             
             return 'unknown'
-            
+        
         except Exception as e:
             logger.error(f"Error determining file type: {str(e)}")
             return 'unknown'
@@ -126,18 +173,22 @@ class FileUtils:
     def cleanup_file(self, file_path):
         """Delete temporary file"""
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logger.debug(f"Cleaned up file: {file_path}")
+            existed = os.path.exists(file_path)
+            
+            # Also returns the file's reservation to the temp storage budget
+            self.temp_storage.release(file_path)
+            
+            if existed:
+                logger.debug("Cleaned up file: %s", file_path)
                 return True
             return False
-            
+        
         except Exception as e:
             logger.error(f"Error cleaning up file: {str(e)}")
             return False
     
-    def cleanup_old_files(self, max_age_hours=24):
-        """Clean up old temporary files"""
+    def cleanup_old_files(self, max_age_hours=24, exclude=()):
+        """Clean up old temporary files, skipping paths still in use"""
         try:
             import time
             current_time = time.time()
@@ -146,7 +197,7 @@ class FileUtils:
             for filename in os.listdir(self.temp_path):
                 file_path = os.path.join(self.temp_path, filename)
                 
-                if os.path.isfile(file_path):
+                if os.path.isfile(file_path) and file_path not in exclude:
                     file_age = current_time - os.path.getmtime(file_path)
                     
                     if file_age > (max_age_hours * 3600):
@@ -155,7 +206,7 @@ class FileUtils:
             
             logger.info(f"Cleaned up {cleaned_count} old files")
             return cleaned_count
-            
+        
         except Exception as e:
             logger.error(f"Error cleaning up old files: {str(e)}")
             return 0
@@ -178,7 +229,7 @@ class FileUtils:
                 'supported': self.is_supported_file(filename),
                 'path': file_path
             }
-            
+        
         except Exception as e:
             logger.error(f"Error getting file info: {str(e)}")
             return None
@@ -192,14 +243,14 @@ class FileUtils:
             
             # Check file size
             if file_info['size'] > Config.MAX_FILE_SIZE:
-                return False, f"File too large (max {Config.MAX_FILE_SIZE // (2*1024*1024*1024)}MB)"
+                return False, f"File too large (max {Config.MAX_FILE_SIZE // (1024*1024)}MB)"
             
             # Check if file type is supported
             if not file_info['supported']:
                 return False, "Unsupported file type"
             
             return True, "File is valid"
-            
+        
         except Exception as e:
             logger.error(f"Error validating file: {str(e)}")
             return False, f"Validation error: {str(e)}"
@@ -1,79 +1,303 @@
 import os
 import logging
 import json
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+import threading
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload, MediaUpload
 from googleapiclient.errors import HttpError
 import io
+import itertools
+import mimetypes
 from config import Config
+from temp_storage import temp_storage
+from drive_client_pool import DriveClientPool
+from token_cache import TokenManager, get_service_account_credentials
+from drive_accounts import AccountRouter, DriveAccount, quota_error_reason
+from resilience import is_retryable, is_unsent, resilience
+from checksum import ChecksumMismatch, HashingWriter, StreamHasher, hash_file
+from bandwidth import bandwidth, EGRESS, INGRESS, ThrottledReader
 
 logger = logging.getLogger(__name__)
 
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+GOOGLE_APPS_MIME_PREFIX = 'application/vnd.google-apps.'
+FILE_FIELDS = "id, name, size, md5Checksum, createdTime, modifiedTime, webViewLink, mimeType"
+
+class StreamingMediaUpload(MediaUpload):
+    """
+    Resumable upload fed from a forward-only reader of unknown length.
+    Only the chunk currently being sent is buffered; the upload finishes
+    when the reader returns a short read.
+    """
+    
+    def __init__(self, reader, mimetype='application/octet-stream', chunksize=None):
+        super().__init__()
+        self._reader = reader
+        self._mimetype = mimetype
+        self._chunksize = chunksize or Config.DRIVE_CHUNK_SIZE
+        self._buffer = bytearray()
+        self._buffer_start = 0
+        self.hasher = StreamHasher(('md5',))
+    
+    def chunksize(self):
+        return self._chunksize
+    
+    def mimetype(self):
+        return self._mimetype
+    
+    def size(self):
+        return None
+    
+    def resumable(self):
+        return True
+    
+    def has_stream(self):
+        return False
+    
+    def getbytes(self, begin, length):
+        """Return bytes from begin; data before the last requested chunk is gone"""
+        if begin < self._buffer_start:
+            raise ValueError("Cannot rewind a streaming upload")
+        
+        # Drop what the server has acknowledged
+        del self._buffer[:begin - self._buffer_start]
+        self._buffer_start = begin
+        
+        while len(self._buffer) < length:
+            data = self._reader.read(length - len(self._buffer))
+            if not data:
+                break
+            # Every byte is read from the source exactly once, so hash it here
+            self.hasher.update(data)
+            self._buffer += data
+        
+        return bytes(self._buffer[:length])
+    
+    def can_restart(self):
+        """True while the first chunk is still buffered, so a new upload can start from byte 0"""
+        return self._buffer_start == 0
+    
+    def to_json(self):
+        raise NotImplementedError("Streaming uploads cannot be serialized")
+
 class GoogleDriveService:
+    # Parsed discovery document, shared by every client in the process
+    _discovery_document = None
+    _discovery_lock = threading.Lock()
+    
     def __init__(self):
-        self.service = None
+        self.accounts = []
+        self.router = None
+        self.credentials = None
+        self.token_manager = None
         self.folder_id = Config.GOOGLE_DRIVE_FOLDER_ID
-        self._initialize_service()
+        self.pool = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+    
+    def _ensure_initialized(self):
+        """Create credentials on first use instead of at import time"""
+        if self._initialized:
+            return
+        
+        with self._init_lock:
+            if not self._initialized:
+                self._initialize_service()
+                self._initialized = True
     
     def _initialize_service(self):
         """Initialize Google Drive service"""
         try:
-            credentials_dict = Config.get_credentials_dict()
-            if not credentials_dict:
+            account_configs = Config.get_drive_accounts()
+            if not account_configs:
                 logger.warning("Google Drive credentials not configured")
                 return
             
-            # Create credentials from service account info
-            credentials = Credentials.from_service_account_info(
-                credentials_dict,
-                scopes=['https://www.googleapis.com/auth/drive']
-            )
-            
-            # Build the service
-            self.service = build('drive', 'v3', credentials=credentials)
-            logger.info("Google Drive service initialized successfully")
+            accounts = []
+            for credentials_dict, folder_id in account_configs:
+                account = DriveAccount(credentials_dict, folder_id)
+                
+                # Create credentials from service account info
+                account.credentials = get_service_account_credentials(credentials_dict)
+                
+                # Keep the access token fresh in the background, shared with other workers
+                account.token_manager = TokenManager(account.credentials)
+                account.token_manager.start()
+                
+                account.pool = DriveClientPool(
+                    lambda credentials=account.credentials: self._build_service(credentials),
+                    Config.DRIVE_CLIENT_POOL_SIZE)
+                accounts.append(account)
             
+            # The first account serves reads (metadata, downloads, listings)
+            primary = accounts[0]
+            self.accounts = accounts
+            self.router = AccountRouter(accounts)
+            self.folder_id = primary.folder_id
+            self.token_manager = primary.token_manager
+            self.pool = primary.pool
+            self.credentials = primary.credentials
+            logger.info(f"Google Drive service initialized successfully with {len(accounts)} account(s)")
+        
         except Exception as e:
             logger.error(f"Failed to initialize Google Drive service: {str(e)}")
-            self.service = None
+            self.credentials = None
+    
+    @classmethod
+    def get_discovery_document(cls):
+        """Load and parse the Drive v3 discovery document once, from disk, never the network"""
+        if cls._discovery_document is None:
+            with cls._discovery_lock:
+                if cls._discovery_document is None:
+                    if Config.DRIVE_DISCOVERY_PATH and os.path.isfile(Config.DRIVE_DISCOVERY_PATH):
+                        with open(Config.DRIVE_DISCOVERY_PATH, 'r', encoding='utf-8') as f:
+                            document = f.read()
+                    else:
+                        # Bundled with google-api-python-client
+                        document = get_static_doc('drive', 'v3')
+                    
+                    if document is None:
+                        raise RuntimeError("Drive v3 discovery document not available")
+                    document = json.loads(document)
+                    if Config.DRIVE_API_ROOT_URL:
+                        # API and upload URLs are both derived from rootUrl
+                        document['rootUrl'] = Config.DRIVE_API_ROOT_URL.rstrip('/') + '/'
+                    cls._discovery_document = document
+        return cls._discovery_document
+    
+    def _build_service(self, credentials):
+        """Build a Drive API client with its own connection, bound to an account's shared credentials"""
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=Config.DRIVE_HTTP_TIMEOUT))
+        return build_from_document(self.get_discovery_document(), http=http)
+    
+    def client(self, account=None, wait=True):
+        """Check a Drive client out of an account's pool (the primary by default): with self.client() as service: ..."""
+        self._ensure_initialized()
+        return (account or self).pool.client(wait)
+    
+    def _execute(self, endpoint, request, classify=is_retryable, retry=True):
+        """Execute a Drive API request with retries and the endpoint's circuit breaker"""
+        return resilience.call(f"drive:{endpoint}", request.execute, retry=retry, classify=classify)
+    
+    def _is_retryable_upload_error(self, error):
+        """With several accounts a quota error fails over to the next account instead of retrying"""
+        if len(self.accounts) > 1 and quota_error_reason(error):
+            return False
+        return is_retryable(error)
+    
+    def _make_public(self, service, file_id):
+        """Let anyone with the link read the file"""
+        self._execute('permissions.create', service.permissions().create(
+            fileId=file_id,
+            body={'role': 'reader', 'type': 'anyone'}
+        ))
+    
+    def _upload_with_failover(self, key, size, upload, can_retry=lambda: True, wait=True):
+        """
+        Run upload(account, service) on the account picked by the router.
+        Quota and rate-limit errors take the account out of rotation and
+        move on to the next one while the upload can still be restarted.
+        """
+        candidates = self.router.candidates(key, size)
+        if not candidates:
+            raise RuntimeError("Every Google Drive account is out of upload quota for today")
+        
+        for attempt, account in enumerate(candidates):
+            try:
+                with self.client(account, wait) as service:
+                    file_result = upload(account, service)
+                self.router.record_upload(account, size or int(file_result.get('size') or 0))
+                return file_result
+            except HttpError as e:
+                reason = quota_error_reason(e)
+                if not reason:
+                    raise
+                self.router.report_quota_error(account, reason)
+                if attempt == len(candidates) - 1 or not can_retry():
+                    raise
+                logger.info("Retrying upload of %s on the next Drive account", key)
+    
+    def warm_up(self):
+        """Initialize credentials and fetch a token in the background, off the request path"""
+        threading.Thread(target=self._ensure_initialized, name='drive-warm-up', daemon=True).start()
+    
+    def get_token_stats(self):
+        """Access token freshness and refresh counters per account"""
+        return {account.name: account.token_manager.get_stats() for account in self.accounts}
+    
+    def get_pool_stats(self):
+        """Utilisation of the Drive client pools, summed over all accounts"""
+        totals = {'size': 0, 'created': 0, 'in_use': 0, 'idle': 0, 'peak_in_use': 0, 'checkouts': 0, 'waits': 0,
+                  'overflows': 0}
+        for account in self.accounts:
+            stats = account.pool.stats()
+            for key in totals:
+                totals[key] += stats[key]
+        totals['utilisation'] = round(totals['in_use'] / totals['size'], 2) if totals['size'] else 0.0
+        return totals
+    
+    def get_account_stats(self):
+        """Upload volume and quota state of each Drive account"""
+        return self.router.get_stats() if self.router else None
     
     def is_configured(self):
         """Check if Google Drive service is properly configured"""
-        return self.service is not None
+        self._ensure_initialized()
+        return self.credentials is not None
     
-    def upload_file(self, file_path, filename):
-        """Upload file to Google Drive"""
+    def upload_file(self, file_path, filename, checksums=None):
+        """Upload file to Google Drive; checksums from the download that produced the file avoid a second pass"""
         try:
-            if not self.service:
+            if not self.is_configured():
                 logger.error("Google Drive service not configured")
                 return None
             
-            # File metadata
-            file_metadata = {
-                'name': filename,
-                'parents': [self.folder_id] if self.folder_id else []
-            }
-            
-            # Create media upload
-            media = MediaFileUpload(file_path, resumable=True)
-            
-            # Upload file
-            file_result = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,webViewLink'
-            ).execute()
-            
-            # Make file shareable
-            self.service.permissions().create(
-                fileId=file_result['id'],
-                body={'role': 'reader', 'type': 'anyone'}
-            ).execute()
-            
-            logger.info(f"File uploaded successfully: {file_result['name']}")
-            return file_result.get('webViewLink')
+            checksums = checksums or hash_file(file_path).hexdigests()
             
+            # Identical content already on Drive is reused instead of uploaded again;
+            # below DEDUP_MIN_SIZE the lookup costs more than uploading once more
+            existing = None
+            if checksums['size'] >= Config.DEDUP_MIN_SIZE:
+                existing = self.find_by_sha256(checksums['sha256'])
+            if existing:
+                logger.info("Skipping upload of %s, same content as %s", filename, existing['name'])
+                return existing.get('webViewLink')
+            
+            def upload(account, service):
+                file_metadata = {
+                    'name': filename,
+                    'parents': [account.folder_id] if account.folder_id else [],
+                    'appProperties': {'sha256': checksums['sha256']}
+                }
+                
+                # Upload file; a retried execute() resumes the same resumable session
+                file_result = self._execute('files.create', service.files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id,name,size,md5Checksum,webViewLink'
+                ), classify=self._is_retryable_upload_error)
+                
+                # Checked on the account that stored it, so a corrupt copy is deleted there
+                self._verify_upload(service, file_result, checksums['md5'], checksums['size'])
+                
+                # Make file shareable
+                self._make_public(service, file_result['id'])
+                return file_result
+            
+            # Create media upload; every read of the file is charged to the egress cap
+            file_size = os.path.getsize(file_path)
+            with open(file_path, 'rb') as source:
+                media = MediaIoBaseUpload(ThrottledReader(source, bandwidth.flow(EGRESS, file_size)),
+                                          mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                                          resumable=True)
+                file_result = self._upload_with_failover(filename, file_size, upload)
+            
+            logger.info("File uploaded successfully: %s", file_result['name'])
+            return file_result.get('webViewLink')
+        
         except HttpError as e:
             logger.error(f"Google Drive API error: {str(e)}")
             return None
@@ -81,71 +305,337 @@ class GoogleDriveService:
             logger.error(f"Error uploading file to Google Drive: {str(e)}")
             return None
     
-    def download_file(self, file_id):
-        """Download file from Google Drive"""
+    def upload_stream(self, reader, filename, mimetype='application/octet-stream'):
+        """Upload data read from a stream of unknown length to Google Drive"""
         try:
-            if not self.service:
+            if not self.is_configured():
                 logger.error("Google Drive service not configured")
                 return None
             
-            # Get file metadata
-            file_metadata = self.service.files().get(fileId=file_id).execute()
-            filename = file_metadata.get('name', f'downloaded_{file_id}')
+            media = StreamingMediaUpload(ThrottledReader(reader, bandwidth.flow(EGRESS)), mimetype)
+            
+            def upload(account, service):
+                file_metadata = {
+                    'name': filename,
+                    'parents': [account.folder_id] if account.folder_id else []
+                }
+                request = service.files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id,name,size,md5Checksum,webViewLink'
+                )
+                
+                file_result = None
+                while file_result is None:
+                    # After an error next_chunk asks Drive how much arrived and resumes from there
+                    status, file_result = resilience.call('drive:files.create', request.next_chunk,
+                                                          classify=self._is_retryable_upload_error)
+                    if status:
+                        logger.debug("Drive upload %s: %d bytes sent", filename, status.resumable_progress,
+                                     extra={'sample': 'drive.upload'})
+                
+                # The whole stream has passed the hasher once Drive answered with the file
+                self._verify_upload(service, file_result, media.hasher.hexdigest('md5'), media.hasher.size)
+                
+                # Make file shareable
+                self._make_public(service, file_result['id'])
+                return file_result
+            
+            # A stream can only move to another account before any of it was acknowledged. Its
+            # producer may be a Drive download holding a client, so never wait on a full pool
+            file_result = self._upload_with_failover(filename, None, upload, media.can_restart, wait=False)
+            
+            logger.info("Stream uploaded successfully: %s", file_result['name'])
+            return file_result.get('webViewLink')
+        
+        except HttpError as e:
+            logger.error(f"Google Drive API error: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error uploading stream to Google Drive: {str(e)}")
+            return None
+    
+    def account_for(self, key):
+        """The account the router would use for key, for work that must stay within one account (a folder tree)"""
+        self._ensure_initialized()
+        candidates = self.router.candidates(key) if self.router else []
+        return candidates[0] if candidates else None
+    
+    def copy_file(self, file_id, size=None, parent_id=None, account=None, public=True):
+        """
+        Copy a Drive file server-side with files.copy; no content passes
+        through the bot. Without an account the copy goes into the routed
+        account's folder, with failover; with one it goes into parent_id of
+        that account. Copies into a shared folder inherit its permission, so
+        they can skip their own (public=False). Returns the copy's metadata,
+        or None on failure.
+        """
+        try:
+            if not self.is_configured():
+                logger.error("Google Drive service not configured")
+                return None
+            
+            def copy(account, service):
+                parent = parent_id or account.folder_id
+                file_result = self._execute('files.copy', service.files().copy(
+                    fileId=file_id,
+                    body={'parents': [parent]} if parent else {},
+                    fields='id,name,size,md5Checksum,webViewLink',
+                    supportsAllDrives=True
+                ), classify=self._is_retryable_upload_error, retry=is_unsent)
+                
+                if public:
+                    self._make_public(service, file_result['id'])
+                return file_result
+            
+            if account is None:
+                return self._upload_with_failover(file_id, size, copy)
+            
+            with self.client(account) as service:
+                file_result = copy(account, service)
+            # Copies count against the account's daily upload quota like uploads do
+            self.router.record_upload(account, int(file_result.get('size') or 0))
+            return file_result
+        
+        except HttpError as e:
+            logger.error(f"Google Drive API error copying {file_id}: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error copying file {file_id}: {str(e)}")
+            return None
+    
+    def create_folder(self, name, parent_id=None, account=None, public=False):
+        """Create a folder under parent_id (the account's folder by default), returning its metadata or None"""
+        try:
+            if not self.is_configured():
+                return None
+            
+            account = account or self.accounts[0]
+            parent = parent_id or account.folder_id
+            with self.client(account) as service:
+                folder = self._execute('files.create', service.files().create(
+                    body={'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent] if parent else []},
+                    fields='id,name,webViewLink',
+                    supportsAllDrives=True
+                ), retry=is_unsent)
+                if public:
+                    self._make_public(service, folder['id'])
+            return folder
+        
+        except Exception as e:
+            logger.error(f"Error creating folder {name}: {str(e)}")
+            return None
+    
+    def _verify_upload(self, service, file_result, md5, size):
+        """Compare what Drive stored with what was sent; a corrupt copy is deleted with the client that uploaded it"""
+        stored_size = int(file_result.get('size') or size)
+        stored_md5 = file_result.get('md5Checksum')
+        if stored_size != size or (stored_md5 and stored_md5 != md5):
+            try:
+                self._execute('files.delete', service.files().delete(fileId=file_result['id']))
+            except Exception as e:
+                logger.error(f"Error deleting corrupt upload {file_result['id']}: {str(e)}")
+            raise ChecksumMismatch(f"{file_result.get('name')}: Drive stored {stored_size} bytes with md5 "
+                                   f"{stored_md5}, sent {size} bytes with md5 {md5}")
+    
+    def find_by_sha256(self, sha256):
+        """A file previously uploaded with the same content by any account, or None"""
+        for account in self.accounts:
+            try:
+                with self.client(account) as service:
+                    results = self._execute('files.list', service.files().list(
+                        q=f"appProperties has {{ key='sha256' and value='{sha256}' }} and trashed = false",
+                        pageSize=1,
+                        fields="files(id, name, size, webViewLink)",
+                        supportsAllDrives=True,
+                        includeItemsFromAllDrives=True
+                    ))
+            except Exception as e:
+                # One account failing to answer must not hide a copy held by another
+                logger.error(f"Error looking up duplicate content in {account.name}: {str(e)}")
+                continue
+            
+            files = results.get('files', [])
+            if files:
+                return files[0]
+        return None
+    
+    def download_file(self, file_id, file_metadata=None, hasher=None):
+        """Download file from Google Drive, verifying its size and md5Checksum on the way"""
+        local_file_path = None
+        try:
+            if not self.is_configured():
+                logger.error("Google Drive service not configured")
+                return None
             
-            # Download file content
-            request = self.service.files().get_media(fileId=file_id)
+            # Get file metadata unless the caller already listed it
+            if file_metadata is None:
+                with self.client() as service:
+                    file_metadata = self._execute('files.get', service.files().get(fileId=file_id, fields=FILE_FIELDS))
+            filename = file_metadata.get('name', f'downloaded_{file_id}')
             
             # Create local file path
-            local_file_path = os.path.join(Config.TEMP_STORAGE_PATH, f"gd_{filename}")
+            size = int(file_metadata['size']) if file_metadata.get('size') else None
+            local_file_path = temp_storage.allocate('gd', filename.replace('/', '_'), size)
             
             # Download in chunks
-            with open(local_file_path, 'wb') as fh:
-                downloader = MediaIoBaseDownload(fh, request)
-                done = False
-                while done is False:
-                    status, done = downloader.next_chunk()
-                    logger.debug(f"Download progress: {int(status.progress() * 100)}%")
-            
-            logger.info(f"File downloaded successfully: {filename}")
-            return local_file_path
+            with temp_storage.open_spool(local_file_path) as fh:
+                self.download_to_stream(file_id, fh, file_metadata.get('md5Checksum'), size, hasher)
+                fh.truncate()
             
+            logger.info("File downloaded successfully: %s", filename)
+            return local_file_path
+        
         except HttpError as e:
             logger.error(f"Google Drive API error: {str(e)}")
+            if local_file_path:
+                temp_storage.release(local_file_path)
             return None
         except Exception as e:
             logger.error(f"Error downloading file from Google Drive: {str(e)}")
+            if local_file_path:
+                temp_storage.release(local_file_path)
             return None
     
+    def download_to_stream(self, file_id, fh, md5=None, size=None, hasher=None, wait=True):
+        """
+        Write the content of a Drive file into any writable object, chunk by
+        chunk, checking md5 and size. Pass wait=False when fh feeds a Drive
+        upload, whose client may be the one this download would wait for.
+        """
+        dest = HashingWriter(fh, hasher or StreamHasher(('md5',)))
+        flow = bandwidth.flow(INGRESS, int(size) if size else None)
+        with self.client(wait=wait) as service:
+            request = service.files().get_media(fileId=file_id)
+            downloader = MediaIoBaseDownload(dest, request, chunksize=Config.DRIVE_CHUNK_SIZE)
+            done = False
+            while done is False:
+                received = dest.hasher.size
+                status, done = resilience.call('drive:files.get_media', downloader.next_chunk)
+                flow.consume(dest.hasher.size - received)
+                # Lazily formatted and sampled: with DEBUG on, 1 in LOG_SAMPLE_EVERY chunks is logged
+                logger.debug("Drive download %s: %.0f%%", file_id, status.progress() * 100,
+                             extra={'sample': 'drive.download'})
+        
+        dest.hasher.verify(size, md5, what=f"Drive file {file_id}")
+        return dest.hasher
+    
     def list_files(self, folder_id=None, limit=10):
         """List files in Google Drive folder"""
         try:
-            if not self.service:
+            if not self.is_configured():
                 return []
             
-            query = f"'{folder_id or self.folder_id}' in parents" if (folder_id or self.folder_id) else ""
-            
-            results = self.service.files().list(
-                q=query,
-                pageSize=limit,
-                fields="nextPageToken, files(id, name, size, createdTime, webViewLink)"
-            ).execute()
-            
-            return results.get('files', [])
-            
+            return list(itertools.islice(self.iter_files(folder_id, page_size=min(limit, 1000)), limit))
+        
         except Exception as e:
             logger.error(f"Error listing files: {str(e)}")
             return []
     
+    def iter_files(self, folder_id=None, page_size=100):
+        """Yield every file in a Google Drive folder, fetching one page at a time; a failed page raises"""
+        if not self.is_configured():
+            return
+        
+        folder_id = folder_id or self.folder_id
+        query = f"'{folder_id}' in parents and trashed = false" if folder_id else "trashed = false"
+        page_token = None
+        
+        try:
+            while True:
+                # Hold a client only for the page request, not while the caller consumes it
+                with self.client() as service:
+                    results = self._execute('files.list', service.files().list(
+                        q=query,
+                        pageSize=page_size,
+                        pageToken=page_token,
+                        fields="nextPageToken, files(id, name, size, md5Checksum, mimeType, createdTime, webViewLink)",
+                        supportsAllDrives=True,
+                        includeItemsFromAllDrives=True
+                    ))
+                
+                for file_info in results.get('files', []):
+                    yield file_info
+                
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        
+        except HttpError as e:
+            # Callers must know the listing is incomplete, not mistake it for the end of the folder
+            logger.error(f"Google Drive API error while listing {folder_id}: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Error listing files in {folder_id}: {str(e)}")
+            raise
+    
+    def get_start_page_token(self):
+        """Token for the current state of the changes feed; later changes are listed relative to it"""
+        with self.client() as service:
+            return self._execute('changes.getStartPageToken',
+                                 service.changes().getStartPageToken(supportsAllDrives=True))['startPageToken']
+    
+    def list_changes(self, page_token, page_size=1000):
+        """One page of the changes feed: (changes, next_page_token, new_start_page_token)"""
+        with self.client() as service:
+            results = self._execute('changes.list', service.changes().list(
+                pageToken=page_token,
+                pageSize=page_size,
+                spaces='drive',
+                includeRemoved=True,
+                fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}, parents, trashed))",
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ))
+        return results.get('changes', []), results.get('nextPageToken'), results.get('newStartPageToken')
+    
+    def iter_subfolders(self, folder_id):
+        """Yield the id of every folder below folder_id; lists folders only, never their files"""
+        pending = [folder_id]
+        while pending:
+            parent = pending.pop()
+            page_token = None
+            while True:
+                with self.client() as service:
+                    results = self._execute('files.list', service.files().list(
+                        q=f"'{parent}' in parents and mimeType = '{FOLDER_MIME_TYPE}' and trashed = false",
+                        pageSize=1000,
+                        pageToken=page_token,
+                        fields="nextPageToken, files(id)",
+                        supportsAllDrives=True,
+                        includeItemsFromAllDrives=True
+                    ))
+                for folder in results.get('files', []):
+                    pending.append(folder['id'])
+                    yield folder['id']
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+    
+    def walk_folder(self, folder_id, path=''):
+        """Yield (relative_path, file_info) for every file below a folder, depth first"""
+        for file_info in self.iter_files(folder_id):
+            relative_path = f"{path}{file_info['name']}"
+            if file_info.get('mimeType') == FOLDER_MIME_TYPE:
+                yield from self.walk_folder(file_info['id'], f"{relative_path}/")
+            else:
+                yield relative_path, file_info
+    
+    def is_downloadable(self, file_info):
+        """Native Google Docs have no binary content and cannot be fetched with get_media"""
+        return not file_info.get('mimeType', '').startswith(GOOGLE_APPS_MIME_PREFIX)
+    
     def delete_file(self, file_id):
         """Delete file from Google Drive"""
         try:
-            if not self.service:
+            if not self.is_configured():
                 return False
             
-            self.service.files().delete(fileId=file_id).execute()
+            with self.client() as service:
+                self._execute('files.delete', service.files().delete(fileId=file_id))
             logger.info(f"File deleted successfully: {file_id}")
             return True
-            
+        
         except Exception as e:
             logger.error(f"Error deleting file: {str(e)}")
             return False
@@ -153,16 +643,17 @@ class GoogleDriveService:
     def get_file_info(self, file_id):
         """Get file information"""
         try:
-            if not self.service:
+            if not self.is_configured():
                 return None
             
-            file_info = self.service.files().get(
-                fileId=file_id,
-                fields="id, name, size, createdTime, modifiedTime, webViewLink, mimeType"
-            ).execute()
+            with self.client() as service:
+                file_info = self._execute('files.get', service.files().get(
+                    fileId=file_id,
+                    fields=FILE_FIELDS
+                ))
             
             return file_info
-            
+        
         except Exception as e:
             logger.error(f"Error getting file info: {str(e)}")
             return None
@@ -0,0 +1,92 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class UpdateLedger:
+    """
+    Remembers which Telegram updates and transfer jobs were already taken.
+    State lives in a small SQLite database next to the token cache, so a
+    redelivered update_id or a resent file is recognised by whichever worker
+    on the host receives it. Only the last UPDATE_DEDUP_WINDOW update ids are
+    kept; job claims expire after JOB_CLAIM_TTL in case a worker died.
+    """
+    
+    PRUNE_EVERY = 100
+    
+    def __init__(self, path=None, window=None, job_ttl=None):
+        self.path = path or Config.STATE_DB_PATH
+        self.window = window or Config.UPDATE_DEDUP_WINDOW
+        self.job_ttl = job_ttl or Config.JOB_CLAIM_TTL
+        self.stats = {'updates_seen': 0, 'duplicate_updates': 0, 'jobs_claimed': 0, 'jobs_attached': 0}
+        self._claims = 0
+        self._lock = threading.Lock()
+        self._conn = None
+    
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS updates (update_id INTEGER PRIMARY KEY, seen_at REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, owner INTEGER, started_at REAL)')
+            self._conn = conn
+        return self._conn
+    
+    def claim_update(self, update_id):
+        """True the first time an update_id is seen on this host, False for a redelivery"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                cursor = conn.execute('INSERT OR IGNORE INTO updates (update_id, seen_at) VALUES (?, ?)',
+                                      (update_id, time.time()))
+                claimed = cursor.rowcount == 1
+                
+                self._claims += 1
+                if self._claims % self.PRUNE_EVERY == 0:
+                    # update_ids only grow, so the window is the newest N ids
+                    conn.execute('DELETE FROM updates WHERE update_id <= (SELECT MAX(update_id) FROM updates) - ?',
+                                 (self.window,))
+                
+                self.stats['updates_seen'] += 1
+                if not claimed:
+                    self.stats['duplicate_updates'] += 1
+                return claimed
+        
+        except sqlite3.Error as e:
+            # Processing twice is better than dropping an update
+            logger.error(f"Update dedup unavailable: {str(e)}")
+            return True
+    
+    def claim_job(self, key):
+        """True if this worker may run the job, False while another run of it is in flight"""
+        try:
+            with self._lock:
+                now = time.time()
+                cursor = self._connection().execute(
+                    'INSERT INTO jobs (key, owner, started_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, started_at = excluded.started_at '
+                    'WHERE jobs.started_at < ?',
+                    (key, os.getpid(), now, now - self.job_ttl))
+                claimed = cursor.rowcount == 1
+                self.stats['jobs_claimed' if claimed else 'jobs_attached'] += 1
+                return claimed
+        
+        except sqlite3.Error as e:
+            logger.error(f"Job claims unavailable: {str(e)}")
+            return True
+    
+    def release_job(self, key):
+        try:
+            with self._lock:
+                self._connection().execute('DELETE FROM jobs WHERE key = ? AND owner = ?', (key, os.getpid()))
+        except sqlite3.Error as e:
+            logger.error(f"Error releasing job {key}: {str(e)}")
+    
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
@@ -0,0 +1,123 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+
+# Attributes every LogRecord has; anything else was passed with extra= and becomes a JSON field
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, thread, msg and any extra= fields"""
+    
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes one in every LOG_SAMPLE_EVERY records that carry extra={'sample': key},
+    counted per key, e.g. per-chunk progress lines. Other records always pass.
+    """
+    
+    def __init__(self, every=None):
+        super().__init__()
+        self.every = every or Config.LOG_SAMPLE_EVERY
+        self.counts = {}
+        self.lock = threading.Lock()
+    
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None or self.every <= 1:
+            return True
+        with self.lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+        return count % self.every == 0
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread, which does the formatting and the
+    write. The message itself is rendered before the record is queued, once
+    the level and sampling filters have passed it, so arguments that change
+    afterwards can't alter it. When the queue is full the record is dropped
+    and counted rather than blocking.
+    """
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # Same process, so no pickling: only the message and the traceback are rendered now
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_handler = None
+
+def setup_logging():
+    """Route all logging through a bounded queue to one writer thread; safe to call more than once"""
+    global _listener, _handler
+    if _listener is not None:
+        return _handler
+    
+    output = logging.StreamHandler(sys.stderr)
+    if Config.LOG_FORMAT == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+    _handler.addFilter(SamplingFilter())
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(Config.LOG_LEVEL)
+    
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+    return _handler
+
+def _stop_listener():
+    """Flush what is still queued when the worker exits"""
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass
+
+def get_stats():
+    if _handler is None:
+        return None
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped, 'format': Config.LOG_FORMAT,
+            'level': Config.LOG_LEVEL}
@@ -0,0 +1,55 @@
+import logging
+import threading
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class MediaGroupCollector:
+    """
+    Collects Telegram album updates that share a media_group_id.
+    Telegram delivers every item of an album as a separate update, so items
+    are buffered until no new one has arrived for the configured window and
+    the whole group is then handed to the flush callback at once.
+    """
+    
+    def __init__(self, on_flush, window=None):
+        self.on_flush = on_flush
+        self.window = window if window is not None else Config.MEDIA_GROUP_WINDOW
+        self.groups = {}
+        self.lock = threading.Lock()
+    
+    def add(self, media_group_id, chat_id, file_info, file_type):
+        """Add an album item and restart the group's flush timer"""
+        with self.lock:
+            group = self.groups.get(media_group_id)
+            if group is None:
+                group = {'chat_id': chat_id, 'items': [], 'timer': None}
+                self.groups[media_group_id] = group
+            elif group['timer']:
+                group['timer'].cancel()
+            
+            group['items'].append((file_info, file_type))
+            
+            timer = threading.Timer(self.window, self._flush, args=(media_group_id,))
+            timer.daemon = True
+            group['timer'] = timer
+            timer.start()
+    
+    def _flush(self, media_group_id):
+        """Hand a completed group to the flush callback"""
+        with self.lock:
+            group = self.groups.pop(media_group_id, None)
+        
+        if not group:
+            return
+        
+        try:
+            logger.info(f"Flushing media group {media_group_id} with {len(group['items'])} items")
+            self.on_flush(group['chat_id'], group['items'])
+        except Exception as e:
+            logger.error(f"Error flushing media group {media_group_id}: {str(e)}")
+    
+    def pending_groups(self):
+        """Number of albums still being collected"""
+        with self.lock:
+            return len(self.groups)
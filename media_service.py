@@ -0,0 +1,250 @@
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from temp_storage import temp_storage
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi', '.3gp', '.ts')
+# Containers that can be rewritten with moov first while keeping their format and name
+FASTSTART_MUXERS = {'.mp4': 'mp4', '.m4v': 'mp4', '.mov': 'mov'}
+THUMBNAIL_SIZE = 320  # Telegram's limit for thumbnail width and height
+THUMBNAIL_MAX_BYTES = 200 * 1024
+
+class MediaError(RuntimeError):
+    """Raised when ffmpeg or ffprobe fails on a file"""
+
+def run_tool(args, timeout):
+    """
+    Run ffmpeg/ffprobe and return (stdout, cpu_seconds).
+    The process is reaped with wait4, so the CPU time is exactly that of this
+    job even while other jobs run concurrently.
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=out, stderr=err)
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpu_seconds = usage.ru_utime + usage.ru_stime
+        
+        if process.returncode != 0:
+            err.seek(0)
+            message = err.read().decode('utf-8', 'replace').strip().splitlines()
+            raise MediaError(f"{os.path.basename(args[0])} exited with {process.returncode}: "
+                             f"{message[-1] if message else 'no output'}")
+        out.seek(0)
+        return out.read(), cpu_seconds
+
+def is_faststart(path):
+    """True for an MP4/MOV whose moov box comes before mdat, i.e. playable while still downloading"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                size, kind = struct.unpack('>I4s', header)
+                if kind == b'moov':
+                    return True
+                if kind == b'mdat':
+                    return False
+                if size == 1:
+                    size = struct.unpack('>Q', f.read(8))[0] - 8
+                elif size == 0:
+                    return False
+                f.seek(size - 8, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return False
+
+class MediaResult:
+    """Output of a media job; path/filename point at the original file when it was left as-is"""
+    
+    def __init__(self, path, filename):
+        self.path = path
+        self.filename = filename
+        self.thumbnail = None
+        self.actions = []
+        self.cpu_time = 0.0
+        self.wall_time = 0.0
+        self.spool_files = []
+    
+    @property
+    def changed(self):
+        return self.path in self.spool_files
+    
+    def read_thumbnail(self):
+        if not self.thumbnail:
+            return None
+        with open(self.thumbnail, 'rb') as f:
+            return f.read()
+    
+    def cleanup(self):
+        """Remove the files the job produced and return their space to the temp budget"""
+        for path in self.spool_files:
+            temp_storage.release(path)
+        self.spool_files = []
+
+class MediaService:
+    """
+    Opt-in ffmpeg stage for videos: stream-copy remux of MP4/MOV files that
+    are not faststart, thumbnails for Telegram, and re-encoding above
+    MEDIA_COMPRESS_ABOVE.
+    Jobs run on a bounded pool of MEDIA_WORKERS ffmpeg processes; request
+    threads only wait for them, and every job reports the CPU time it used.
+    """
+    
+    def __init__(self):
+        self.ffmpeg = shutil.which(Config.FFMPEG_PATH)
+        self.ffprobe = shutil.which(Config.FFPROBE_PATH)
+        self.enabled = Config.MEDIA_PROCESSING and bool(self.ffmpeg and self.ffprobe)
+        self.pool = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'remuxed': 0, 'compressed': 0, 'thumbnails': 0, 'unchanged': 0, 'failed': 0,
+                      'cpu_seconds': 0.0, 'wall_seconds': 0.0}
+        
+        if Config.MEDIA_PROCESSING and not self.enabled:
+            logger.warning("ffmpeg/ffprobe not found, media processing disabled")
+    
+    def _executor(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=Config.MEDIA_WORKERS, thread_name_prefix='media')
+            return self.pool
+    
+    def is_video(self, filename, mime_type=None):
+        if mime_type and mime_type.startswith('video/'):
+            return True
+        return os.path.splitext(filename or '')[1].lower() in VIDEO_EXTENSIONS
+    
+    def process(self, file_path, filename, mime_type=None, thumbnail=False, compress=True):
+        """
+        Run the media stage for a downloaded file and wait for it.
+        Returns a MediaResult, or None when the file is not a video, the stage
+        is disabled or ffmpeg failed; callers then use the original file.
+        """
+        if not self.enabled or not self.is_video(filename, mime_type):
+            return None
+        
+        # Each ffmpeg run is killed after MEDIA_JOB_TIMEOUT, so the wait is bounded
+        future = self._executor().submit(self._run_job, file_path, filename, thumbnail, compress)
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Media processing of {filename} failed: {str(e)}")
+            with self._lock:
+                self.stats['failed'] += 1
+            return None
+    
+    def _run_job(self, file_path, filename, thumbnail, compress):
+        """Probe, then remux or re-encode and grab a thumbnail; runs on a media pool thread"""
+        started = time.perf_counter()
+        result = MediaResult(file_path, filename)
+        try:
+            self._apply(result, thumbnail, compress)
+        except Exception:
+            result.cleanup()
+            raise
+        
+        result.wall_time = time.perf_counter() - started
+        self._record(result)
+        return result
+    
+    def _apply(self, result, thumbnail, compress):
+        info = self._probe(result.path, result)
+        streams = info.get('streams', [])
+        video = [s for s in streams if s.get('codec_type') == 'video'
+                 and not s.get('disposition', {}).get('attached_pic')]
+        if not video:
+            return
+        formats = info.get('format', {}).get('format_name', '').split(',')
+        duration = float(info.get('format', {}).get('duration') or 0)
+        size = os.path.getsize(result.path)
+        muxer = FASTSTART_MUXERS.get(os.path.splitext(result.filename)[1].lower())
+        
+        if compress and Config.MEDIA_COMPRESS_ABOVE and size > Config.MEDIA_COMPRESS_ABOVE:
+            self._transcode(result, 'compress', f"{os.path.splitext(result.filename)[0]}.mp4", 'mp4', size, [
+                '-map', '0:V:0', '-map', '0:a:0?',
+                '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(Config.MEDIA_COMPRESS_CRF),
+                '-c:a', 'aac', '-b:a', '128k'])
+        elif muxer and muxer in formats and not is_faststart(result.path):
+            # Every stream copied, moov moved to the front: no decoding, roughly disk speed
+            self._transcode(result, 'remux', result.filename, muxer, size, ['-map', '0', '-c', 'copy'])
+        
+        if thumbnail:
+            self._thumbnail(result, min(duration / 2, 3.0))
+    
+    def _probe(self, file_path, result):
+        output, cpu = run_tool([self.ffprobe, '-v', 'error', '-print_format', 'json',
+                                '-show_format', '-show_streams', file_path], Config.MEDIA_JOB_TIMEOUT)
+        result.cpu_time += cpu
+        return json.loads(output or b'{}')
+    
+    def _transcode(self, result, action, filename, muxer, size, options):
+        """Write result.path to a new faststart file of the given muxer with the given stream options"""
+        output_path = temp_storage.allocate('media', filename, size, preallocate=False)
+        result.spool_files.append(output_path)
+        
+        _, cpu = run_tool([self.ffmpeg, '-nostdin', '-v', 'error', '-y', '-i', result.path, *options,
+                           '-movflags', '+faststart', '-threads', str(Config.MEDIA_FFMPEG_THREADS),
+                           '-f', muxer, output_path], Config.MEDIA_JOB_TIMEOUT)
+        result.cpu_time += cpu
+        temp_storage.adjust(output_path, os.path.getsize(output_path))
+        
+        result.path = output_path
+        result.filename = filename
+        result.actions.append(action)
+    
+    def _thumbnail(self, result, offset):
+        """A JPEG frame within Telegram's thumbnail limits; a missing thumbnail is not an error"""
+        thumb_path = temp_storage.allocate('thumb', f"{result.filename}.jpg", THUMBNAIL_MAX_BYTES, preallocate=False)
+        result.spool_files.append(thumb_path)
+        
+        scale = (f"scale='min({THUMBNAIL_SIZE},iw)':'min({THUMBNAIL_SIZE},ih)'"
+                 f":force_original_aspect_ratio=decrease")
+        try:
+            _, cpu = run_tool([self.ffmpeg, '-nostdin', '-v', 'error', '-y', '-ss', f"{offset:.2f}", '-i', result.path,
+                               '-frames:v', '1', '-vf', scale, '-q:v', '5', '-f', 'image2', thumb_path],
+                              Config.MEDIA_JOB_TIMEOUT)
+            result.cpu_time += cpu
+        except MediaError as e:
+            logger.warning(f"No thumbnail for {result.filename}: {str(e)}")
+            return
+        
+        if 0 < os.path.getsize(thumb_path) <= THUMBNAIL_MAX_BYTES:
+            result.thumbnail = thumb_path
+            result.actions.append('thumbnail')
+    
+    def _record(self, result):
+        with self._lock:
+            self.stats['jobs'] += 1
+            self.stats['cpu_seconds'] += result.cpu_time
+            self.stats['wall_seconds'] += result.wall_time
+            for action, key in (('remux', 'remuxed'), ('compress', 'compressed'), ('thumbnail', 'thumbnails')):
+                if action in result.actions:
+                    self.stats[key] += 1
+            if not result.actions:
+                self.stats['unchanged'] += 1
+        
+        logger.info(f"Media job for {result.filename}: {', '.join(result.actions) or 'unchanged'}, "
+                    f"{result.cpu_time:.2f}s CPU in {result.wall_time:.2f}s")
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        stats['workers'] = Config.MEDIA_WORKERS
+        stats['cpu_seconds'] = round(stats['cpu_seconds'], 2)
+        stats['wall_seconds'] = round(stats['wall_seconds'], 2)
+        return stats
@@ -0,0 +1,231 @@
+import json
+import logging
+import random
+import socket
+import threading
+import time
+import httplib2
+import requests
+from urllib3.exceptions import NewConnectionError
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_DRIVE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError', 'internalError'}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+class TransientError(Exception):
+    """A failure worth retrying, e.g. a 429 or 5xx answer; retry_after is the server's hint in seconds"""
+    
+    def __init__(self, message, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open"""
+
+def drive_error_reasons(error):
+    """Reasons listed in the body of a Drive HttpError"""
+    try:
+        details = json.loads(error.content.decode('utf-8')).get('error', {})
+        return {item.get('reason') for item in details.get('errors', [])}
+    except (ValueError, AttributeError, TypeError):
+        return set()
+
+def is_retryable(error):
+    """Classify an exception from a Drive or Telegram call as transient (retry) or permanent (fail now)"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, TransientError):
+        return True
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        if status in RETRYABLE_STATUS_CODES:
+            return True
+        return status == 403 and bool(drive_error_reasons(error) & RETRYABLE_DRIVE_REASONS)
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS_CODES
+    # Connection resets, timeouts and DNS failures
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, socket.timeout,
+                              httplib2.HttpLib2Error, TransportError))
+
+def is_rate_limited(error):
+    """A 429 or Drive rate-limit answer: the endpoint is healthy but asks us to slow down"""
+    if isinstance(error, TransientError):
+        return error.status == 429 or error.retry_after is not None
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status == 429 or (status == 403 and bool(drive_error_reasons(error) & RATE_LIMIT_REASONS))
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code == 429
+    return False
+
+def is_unsent(error):
+    """
+    Retry predicate for calls that must not run twice (messages, copies, new
+    folders): true only for failures that show the server never acted on the
+    request, i.e. a rate-limit answer or a connection that was never
+    established. A 5xx or a dropped connection may follow a success.
+    """
+    if is_rate_limited(error):
+        return True
+    if isinstance(error, (TransientError, HttpError, requests.HTTPError)):
+        return False
+    if isinstance(error, requests.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+    return isinstance(error, (ConnectionRefusedError, socket.gaierror, httplib2.ServerNotFoundError))
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))"""
+    base = Config.RETRY_BASE_DELAY if base is None else base
+    cap = Config.RETRY_MAX_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+    After BREAKER_FAILURE_THRESHOLD consecutive transient failures the circuit
+    opens and calls fail immediately for BREAKER_RESET_TIMEOUT seconds; then a
+    single probe call is let through (half-open) and its result closes or
+    re-opens the circuit.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.BREAKER_RESET_TIMEOUT
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0
+        self.probe_in_flight = False
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'short_circuits': 0, 'opened': 0,
+                         'rate_limited': 0}
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """Whether a call may go out now"""
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+            elif self.state != self.CLOSED:
+                self.counters['short_circuits'] += 1
+                return False
+            
+            self.counters['calls'] += 1
+            return True
+    
+    def record_success(self):
+        with self.lock:
+            self.counters['successes'] += 1
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            if self.state != self.CLOSED:
+                logger.info("Circuit %s closed", self.name)
+            self.state = self.CLOSED
+    
+    def record_failure(self):
+        with self.lock:
+            self.counters['failures'] += 1
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.counters['opened'] += 1
+                    logger.warning("Circuit %s opened after %d failures", self.name, self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+    
+    def release_probe(self):
+        """A permanent error says nothing about the endpoint's health; let another probe through"""
+        with self.lock:
+            self.probe_in_flight = False
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['state'] = self.state
+            stats['consecutive_failures'] = self.consecutive_failures
+            return stats
+
+class Resilience:
+    """Retries and circuit breakers for every outbound Drive and Telegram endpoint"""
+    
+    def __init__(self):
+        self.breakers = {}
+        self.lock = threading.Lock()
+    
+    def breaker(self, endpoint):
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(endpoint)
+            return self.breakers[endpoint]
+    
+    def call(self, endpoint, func, *args, retry=True, classify=is_retryable, **kwargs):
+        """
+        Call func through the endpoint's circuit breaker, retrying transient
+        failures with jittered exponential backoff. Rate limits are waited out
+        but do not count towards opening the circuit. Calls whose side effects
+        cannot be repeated (e.g. a body streamed from a generator) pass
+        retry=False and only get the breaker; calls that must not run twice
+        pass a predicate such as is_unsent that says which failures are safe
+        to repeat.
+        """
+        breaker = self.breaker(endpoint)
+        attempts = Config.RETRY_MAX_ATTEMPTS if retry else 1
+        
+        for attempt in range(attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"{endpoint} is unavailable, try again shortly")
+            
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not classify(e):
+                    breaker.release_probe()
+                    raise
+                
+                # A rate limit is backed off, not held against the endpoint's health
+                if is_rate_limited(e):
+                    breaker.release_probe()
+                    with breaker.lock:
+                        breaker.counters['rate_limited'] += 1
+                else:
+                    breaker.record_failure()
+                retry_after = getattr(e, 'retry_after', None)
+                # No point waiting for a retry the open breaker would reject
+                if (attempt == attempts - 1 or breaker.state == breaker.OPEN
+                        or (retry_after or 0) > Config.RETRY_MAX_DELAY
+                        or (callable(retry) and not retry(e))):
+                    raise
+                
+                delay = max(backoff_delay(attempt), retry_after or 0)
+                with breaker.lock:
+                    breaker.counters['retries'] += 1
+                logger.warning("%s failed (%s), retry %d in %.1fs", endpoint, e, attempt + 1, delay)
+                time.sleep(delay)
+                continue
+            
+            breaker.record_success()
+            return result
+    
+    def get_stats(self):
+        """State and counters of every endpoint's breaker"""
+        with self.lock:
+            breakers = list(self.breakers.items())
+        return {endpoint: breaker.get_stats() for endpoint, breaker in sorted(breakers)}
+
+# Shared by every service in the process so one endpoint has one breaker
+resilience = Resilience()
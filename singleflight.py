@@ -0,0 +1,68 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    """One in-flight call and the result its waiters will share"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key.
+    The first caller (the leader) runs the function; callers arriving while
+    it runs wait and receive the same result, or the same exception, instead
+    of starting their own fetch. Once the call returns the key is forgotten,
+    so later calls run afresh. Calls are only shared within one process,
+    which is why the deploy runs a single gunicorn worker with threads.
+    """
+    
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.stats = {'leaders': 0, 'coalesced': 0}
+    
+    def do(self, key, func, *args, **kwargs):
+        """Return (result, shared); shared is True when another caller's result was reused"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                self.stats['leaders'] += 1
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+            
+            if call.waiters:
+                logger.info(f"Shared result of {key} with {call.waiters} waiting request(s)")
+        
+        return call.result, False
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self.calls)
+            return stats
@@ -0,0 +1,104 @@
+import json
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = '.manifest.json'
+PART_NAME_PATTERN = re.compile(r'^(?P<base>.+)\.(?P<index>\d{3})$')
+
+def part_name(filename, index):
+    """Name of the index-th part (1-based), e.g. movie.mkv.001"""
+    return f"{filename}.{index:03d}"
+
+def manifest_name(filename):
+    """Name of the manifest document describing a split file"""
+    return f"{filename}{MANIFEST_SUFFIX}"
+
+def is_join_file(filename):
+    """True for names /join collects: numbered parts and manifests"""
+    return bool(filename) and (filename.endswith(MANIFEST_SUFFIX) or bool(PART_NAME_PATTERN.match(filename)))
+
+def iter_part_ranges(size, part_size):
+    """Yield (index, start, end) byte ranges covering a file of the given size"""
+    index = 1
+    for start in range(0, size, part_size):
+        yield index, start, min(start + part_size, size)
+        index += 1
+
+def build_manifest(filename, size, part_size, parts):
+    """Build the JSON manifest for a file split into (name, size) parts"""
+    return json.dumps({
+        'version': 1,
+        'name': filename,
+        'size': size,
+        'part_size': part_size,
+        'parts': [{'name': name, 'size': part_size_} for name, part_size_ in parts]
+    }, indent=2).encode('utf-8')
+
+class JoinSession:
+    """Parts and manifest collected from a chat while a /join is in progress"""
+    
+    def __init__(self):
+        self.parts = {}
+        self.manifest = None
+        self.lock = threading.Lock()
+        self.touched = time.monotonic()
+    
+    def add_part(self, name, file_info):
+        with self.lock:
+            self.parts[name] = file_info
+            self.touched = time.monotonic()
+    
+    def set_manifest(self, manifest):
+        with self.lock:
+            self.manifest = manifest
+            self.touched = time.monotonic()
+    
+    def is_expired(self, ttl):
+        """True once nothing arrived for ttl seconds"""
+        with self.lock:
+            return time.monotonic() - self.touched > ttl
+    
+    def is_complete(self):
+        """A session is complete once the manifest and every part it lists have arrived"""
+        with self.lock:
+            if not self.manifest:
+                return False
+            return all(part['name'] in self.parts for part in self.manifest['parts'])
+    
+    def ordered_parts(self):
+        """Return (name, file_info) in join order, from the manifest or by part number"""
+        with self.lock:
+            if self.manifest:
+                return [(part['name'], self.parts[part['name']]) for part in self.manifest['parts']
+                        if part['name'] in self.parts]
+            
+            numbered = []
+            for name, file_info in self.parts.items():
+                match = PART_NAME_PATTERN.match(name)
+                if match:
+                    numbered.append((int(match.group('index')), name, file_info))
+            return [(name, file_info) for _, name, file_info in sorted(numbered)]
+    
+    def missing_parts(self):
+        with self.lock:
+            if not self.manifest:
+                return []
+            return [part['name'] for part in self.manifest['parts'] if part['name'] not in self.parts]
+    
+    def target_name(self):
+        """Name of the reassembled file"""
+        if self.manifest:
+            return self.manifest['name']
+        
+        parts = self.ordered_parts()
+        if parts:
+            match = PART_NAME_PATTERN.match(parts[0][0])
+            return match.group('base')
+        return 'joined_file'
+    
+    def total_size(self):
+        return self.manifest['size'] if self.manifest else None
@@ -0,0 +1,148 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class TempStorageFull(OSError):
+    """Raised when a spool file cannot be admitted within the disk budget in time"""
+
+class TempStorageManager:
+    """
+    Hands out unique spool files under TEMP_STORAGE_PATH.
+    Every spool file reserves bytes against TEMP_STORAGE_BUDGET; new jobs wait
+    until enough of the budget is free, so concurrent transfers cannot fill
+    the disk. A background janitor removes orphaned files left behind by
+    crashed jobs or other workers.
+    """
+    
+    def __init__(self, path=None, budget=None):
+        self.path = path or Config.TEMP_STORAGE_PATH
+        self.budget = budget or Config.TEMP_STORAGE_BUDGET
+        self.reservations = {}
+        self.bytes_reserved = 0
+        self.peak_reserved = 0
+        self.waiting = 0
+        self.admission_waits = 0
+        self.cond = threading.Condition()
+        self._janitor = None
+        os.makedirs(self.path, exist_ok=True)
+    
+    def allocate(self, prefix, filename='', size=None, preallocate=True, timeout=None):
+        """Reserve space for a new spool file and return its unique path"""
+        reserve = size if size is not None else Config.MAX_FILE_SIZE
+        reserve = min(reserve, self.budget)
+        timeout = Config.TEMP_ADMISSION_TIMEOUT if timeout is None else timeout
+        
+        with self.cond:
+            if self.bytes_reserved + reserve > self.budget:
+                self.admission_waits += 1
+                self.waiting += 1
+                try:
+                    admitted = self.cond.wait_for(
+                        lambda: self.bytes_reserved + reserve <= self.budget, timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    raise TempStorageFull(f"Temp storage budget exhausted ({self.bytes_reserved} bytes in use)")
+            
+            self.bytes_reserved += reserve
+            self.peak_reserved = max(self.peak_reserved, self.bytes_reserved)
+        
+        try:
+            safe_name = os.path.basename(filename.replace('\\', '/'))[-100:]
+            fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=f"_{safe_name}" if safe_name else '',
+                                        dir=self.path)
+            try:
+                if size and preallocate:
+                    self._preallocate(fd, size)
+            finally:
+                os.close(fd)
+        except Exception:
+            self._unreserve(reserve)
+            raise
+        
+        with self.cond:
+            self.reservations[path] = reserve
+        return path
+    
+    def _preallocate(self, fd, size):
+        """Reserve the blocks up front so the file is contiguous and ENOSPC surfaces early"""
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except AttributeError:
+            pass
+        except OSError as e:
+            logger.debug("fallocate not available for spool file: %s", e)
+    
+    def open_spool(self, path):
+        """Open a spool file for writing without discarding its preallocated blocks"""
+        return open(path, 'r+b')
+    
+    def adjust(self, path, size):
+        """Change the reservation of a spool file once its real size is known"""
+        with self.cond:
+            if path not in self.reservations:
+                return
+            self.bytes_reserved += size - self.reservations[path]
+            self.reservations[path] = size
+            self.peak_reserved = max(self.peak_reserved, self.bytes_reserved)
+            self.cond.notify_all()
+    
+    def release(self, path):
+        """Delete a spool file and return its bytes to the budget"""
+        with self.cond:
+            reserve = self.reservations.pop(path, None)
+        
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            if reserve is not None:
+                self._unreserve(reserve)
+    
+    def _unreserve(self, reserve):
+        with self.cond:
+            self.bytes_reserved -= reserve
+            self.cond.notify_all()
+    
+    def active_paths(self):
+        with self.cond:
+            return set(self.reservations)
+    
+    def usage(self):
+        """Current budget usage"""
+        with self.cond:
+            return {
+                'budget': self.budget,
+                'reserved': self.bytes_reserved,
+                'peak_reserved': self.peak_reserved,
+                'files': len(self.reservations),
+                'waiting': self.waiting,
+                'admission_waits': self.admission_waits
+            }
+    
+    def start_janitor(self, file_utils, interval=None, max_age_hours=None):
+        """Start the background thread that removes orphaned spool files"""
+        if self._janitor is not None:
+            return
+        
+        interval = interval or Config.TEMP_JANITOR_INTERVAL
+        max_age_hours = max_age_hours or Config.TEMP_ORPHAN_AGE_HOURS
+        
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    file_utils.cleanup_old_files(max_age_hours, exclude=self.active_paths())
+                except Exception as e:
+                    logger.error(f"Temp storage janitor failed: {str(e)}")
+        
+        self._janitor = threading.Thread(target=run, name='temp-janitor', daemon=True)
+        self._janitor.start()
+
+# Shared by every service in the process so the budget covers all transfers
+temp_storage = TempStorageManager()
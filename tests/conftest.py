@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Config reads the environment at import time, so point state and spool files at a scratch directory first
+_scratch = tempfile.mkdtemp(prefix='bot-tests-')
+os.environ.setdefault('TEMP_STORAGE_PATH', os.path.join(_scratch, 'temp_files'))
+os.environ.setdefault('STATE_DB_PATH', os.path.join(_scratch, 'state.db'))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('MEDIA_PROCESSING', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
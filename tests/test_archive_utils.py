@@ -0,0 +1,80 @@
+import io
+import os
+import threading
+import zipfile
+
+import pytest
+
+from archive_utils import ChunkPipe, PipedUpload, StreamingZipWriter, VolumeWriter, estimate_zip_size
+
+class Sink:
+    """Volume sink that keeps what was written"""
+    
+    def __init__(self, index):
+        self.index = index
+        self.buffer = io.BytesIO()
+        self.aborted = False
+    
+    def write(self, data):
+        return self.buffer.write(data)
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        return self.buffer.getvalue()
+    
+    def abort(self):
+        self.aborted = True
+
+def test_chunk_pipe_delivers_bytes_in_order():
+    pipe = ChunkPipe(max_chunks=2)
+    
+    def produce():
+        for index in range(10):
+            pipe.write(bytes([index]) * 100)
+        pipe.close()
+    
+    producer = threading.Thread(target=produce)
+    producer.start()
+    data = pipe.read(150) + pipe.read()
+    producer.join()
+    assert data == b''.join(bytes([index]) * 100 for index in range(10))
+
+def test_chunk_pipe_write_fails_after_abort():
+    pipe = ChunkPipe()
+    pipe.abort()
+    with pytest.raises(BrokenPipeError):
+        pipe.write(b'data')
+
+def test_piped_upload_returns_consumer_result():
+    upload = PipedUpload(lambda pipe: len(pipe.read()))
+    upload.write(b'x' * 1000)
+    assert upload.close() == 1000
+
+def test_volume_writer_cuts_exact_volumes():
+    sinks = []
+    writer = VolumeWriter(lambda index: sinks.append(Sink(index)) or sinks[-1], 10)
+    writer.write(b'a' * 25)
+    results = writer.close()
+    assert [sink.index for sink in sinks] == [1, 2, 3]
+    assert results == [b'a' * 10, b'a' * 10, b'a' * 5]
+
+def test_volume_writer_opens_no_volume_for_exact_fit():
+    sinks = []
+    writer = VolumeWriter(lambda index: sinks.append(Sink(index)) or sinks[-1], 10)
+    writer.write(b'a' * 10)
+    assert writer.close() == [b'a' * 10]
+
+def test_estimate_covers_incompressible_deflated_entries():
+    # Deflate adds a few bytes per 64KB block of random data, more than a fixed per-entry margin
+    entries = [('random.bin', os.urandom(4 * 1024 * 1024)), ('notes.txt', os.urandom(50 * 1024))]
+    sink = Sink(1)
+    archive = StreamingZipWriter(sink)
+    for name, data in entries:
+        archive.add_chunks(name, [data], len(data))
+    output = archive.close()
+    
+    assert len(output) <= estimate_zip_size((name, len(data)) for name, data in entries)
+    with zipfile.ZipFile(io.BytesIO(output)) as check:
+        assert check.read('random.bin') == entries[0][1]
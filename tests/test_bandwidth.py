@@ -0,0 +1,58 @@
+from unittest import mock
+
+from bandwidth import BULK, EGRESS, INGRESS, INTERACTIVE, BandwidthManager, RateMeter, TokenBucket
+
+def test_token_bucket_goes_into_debt_and_refills():
+    bucket = TokenBucket(100)
+    bucket.updated = 0.0
+    assert bucket.charge(100, 0.0) == 0
+    assert bucket.charge(50, 0.0) == 0.5
+    
+    # Half a second later the debt is paid back; burst is capped at one second
+    assert bucket.charge(0, 0.5) == 0
+    bucket._refill(10.0)
+    assert bucket.tokens == 100
+
+def test_rate_meter_averages_over_its_window():
+    meter = RateMeter(window=2)
+    meter.add(100, 10.1)
+    meter.add(100, 10.9)
+    meter.add(300, 11.5)
+    assert meter.rate(11.9) == 250
+    assert meter.rate(12.0) == 150
+    assert meter.rate(20.0) == 0
+    assert meter.total == 500
+
+def test_transfers_are_classed_by_size_or_context():
+    manager = BandwidthManager(interactive_max=1000)
+    assert manager.flow(INGRESS, 500).priority == INTERACTIVE
+    assert manager.flow(INGRESS, 5000).priority == BULK
+    with manager.bulk():
+        assert manager.flow(INGRESS, 500).priority == BULK
+    assert manager.flow(INGRESS).priority == INTERACTIVE
+
+def test_unknown_size_turns_bulk_once_it_grows():
+    manager = BandwidthManager(interactive_max=1000)
+    flow = manager.flow(EGRESS)
+    flow.consume(800)
+    assert flow.priority == INTERACTIVE
+    flow.consume(800)
+    assert flow.priority == BULK
+
+def test_unlimited_direction_never_sleeps():
+    manager = BandwidthManager(ingress_limit=0, egress_limit=0)
+    with mock.patch('bandwidth.time.sleep') as sleep:
+        manager.flow(INGRESS, 10).consume(10 ** 9)
+    sleep.assert_not_called()
+    classes = manager.get_stats()[INGRESS]['classes']
+    assert classes[INTERACTIVE]['bytes'] + classes[BULK]['bytes'] == 10 ** 9
+
+def test_bulk_gets_only_its_share_while_interactive_runs():
+    with mock.patch('bandwidth.time.monotonic', return_value=100.0), mock.patch('bandwidth.time.sleep') as sleep:
+        manager = BandwidthManager(ingress_limit=1000, bulk_share=0.25, interactive_max=10 ** 6)
+        manager.flow(INGRESS, 10, priority=INTERACTIVE).consume(100)
+        assert manager.get_stats()[INGRESS]['interactive_active']
+        
+        # The shared bucket still has 900 tokens, but bulk is held to 250 bytes/s
+        manager.flow(INGRESS, priority=BULK).consume(500)
+    sleep.assert_called_once_with(1.0)
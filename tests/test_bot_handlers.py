@@ -0,0 +1,105 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from unittest import mock
+
+from bot_handlers import BotHandler
+from config import Config
+from drive_accounts import DriveAccount
+from google_drive_service import GoogleDriveService, FOLDER_MIME_TYPE
+
+def make_handler():
+    handler = BotHandler.__new__(BotHandler)
+    handler.google_drive = mock.Mock()
+    handler.file_utils = mock.Mock()
+    handler.send_message = mock.Mock(return_value=True)
+    handler.stats = {'files_uploaded': 0, 'files_downloaded': 0, 'errors': 0}
+    return handler
+
+def test_folder_files_above_the_size_cap_are_sent_in_parts_like_single_links():
+    handler = make_handler()
+    handler.google_drive.download_file.return_value = '/tmp/big.bin'
+    handler.send_file_to_telegram = mock.Mock(return_value=True)
+    file_info = {'id': 'f', 'name': 'big.bin', 'size': str(Config.MAX_FILE_SIZE * 2)}
+    
+    assert handler.transfer_drive_file_to_telegram(1, 'dir/big.bin', file_info) == ('dir/big.bin', None)
+    handler.send_file_to_telegram.assert_called_once_with(1, '/tmp/big.bin', 'big.bin', None)
+
+def test_size_limit_messages_state_the_limit_the_bot_enforces():
+    limit_mb = min(Config.MAX_FILE_SIZE, Config.TELEGRAM_DOWNLOAD_LIMIT) // (1024 * 1024)
+    assert make_handler().max_telegram_file_size() == Config.TELEGRAM_FILE_LIMIT
+    assert f"{limit_mb}MB" in Config.MESSAGES['file_too_large']
+    assert f"{limit_mb}MB for files sent to the bot" in Config.MESSAGES['help']
+
+class FakeDrive:
+    """Drive client of one account over a shared tree; every call is logged with the account name"""
+    
+    def __init__(self, account, tree, calls):
+        self.account = account
+        self.tree = tree
+        self.calls = calls
+    
+    def files(self):
+        return self
+    
+    def permissions(self):
+        return self
+    
+    def answer(self, action, result, **kwargs):
+        self.calls.append((self.account, action, kwargs))
+        return mock.Mock(execute=mock.Mock(return_value=result))
+    
+    def get(self, fileId, fields):
+        return self.answer('get', {'id': fileId, 'name': 'Shared'})
+    
+    def list(self, q, **kwargs):
+        folder_id = re.match(r"'([^']+)' in parents", q).group(1)
+        return self.answer('list', {'files': self.tree.get(folder_id, [])})
+    
+    def create(self, fileId=None, body=None, **kwargs):
+        if fileId:
+            return self.answer('permission', {}, fileId=fileId)
+        folder_id = f"new-{body['name']}"
+        return self.answer('folder', {'id': folder_id, 'name': body['name'], 'webViewLink': 'link'},
+                           name=body['name'], parents=body['parents'])
+    
+    def copy(self, fileId, body, **kwargs):
+        return self.answer('copy', {'id': f"copy-{fileId}", 'size': '1'}, fileId=fileId, parents=body['parents'])
+
+def test_clone_recreates_a_nested_tree_on_one_account_and_shares_only_the_root():
+    tree = {
+        'src': [{'id': 'a', 'name': 'a.txt'}, {'id': 'sub', 'name': 'Sub', 'mimeType': FOLDER_MIME_TYPE}],
+        'sub': [{'id': 'b', 'name': 'b.txt'}, {'id': 'deep', 'name': 'Deep', 'mimeType': FOLDER_MIME_TYPE}],
+        'deep': [{'id': 'c', 'name': 'c.txt'}]
+    }
+    calls = []
+    primary, secondary = (DriveAccount({'client_email': f"account{index}@example.com"}, 'home')
+                          for index in range(2))
+    
+    drive = GoogleDriveService()
+    drive._initialized = True
+    drive.credentials = object()
+    drive.accounts = [primary, secondary]
+    drive.router = mock.Mock()
+    drive.router.candidates.return_value = [secondary, primary]
+    
+    @contextmanager
+    def client(account=None, wait=True):
+        yield FakeDrive((account or primary).name, tree, calls)
+    drive.client = client
+    
+    handler = make_handler()
+    handler.google_drive = drive
+    handler.copy_pool = ThreadPoolExecutor(max_workers=2)
+    handler.stats['files_cloned'] = 0
+    
+    handler.handle_clone_folder(1, 'src')
+    
+    writes = [(account, action, kwargs) for account, action, kwargs in calls if action not in ('get', 'list')]
+    assert {account for account, action, kwargs in writes} == {secondary.name}
+    folders = {kwargs['name']: kwargs['parents'] for account, action, kwargs in writes if action == 'folder'}
+    assert folders == {'Shared': ['home'], 'Sub': ['new-Shared'], 'Deep': ['new-Sub']}
+    copies = {kwargs['fileId']: kwargs['parents'] for account, action, kwargs in writes if action == 'copy'}
+    assert copies == {'a': ['new-Shared'], 'b': ['new-Sub'], 'c': ['new-Deep']}
+    assert [kwargs['fileId'] for account, action, kwargs in writes if action == 'permission'] == ['new-Shared']
+    assert handler.stats['files_cloned'] == 3
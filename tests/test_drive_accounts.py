@@ -0,0 +1,48 @@
+from drive_accounts import AccountRouter, DriveAccount, UsageLedger
+
+def make_router(tmp_path, strategy, count=3, quota=1000):
+    accounts = [DriveAccount({'client_email': f"account{index}@example.com"}) for index in range(count)]
+    ledger = UsageLedger(str(tmp_path / 'drive_usage.json'))
+    return AccountRouter(accounts, strategy=strategy, daily_quota=quota, ledger=ledger)
+
+def test_least_used_prefers_the_account_with_most_quota_left(tmp_path):
+    router = make_router(tmp_path, 'least_used')
+    first, second, third = router.accounts
+    router.record_upload(first, 500)
+    router.record_upload(second, 100)
+    
+    assert router.candidates(size=10) == [third, second, first]
+
+def test_accounts_without_room_for_the_file_are_skipped(tmp_path):
+    router = make_router(tmp_path, 'least_used')
+    first, second, third = router.accounts
+    router.record_upload(first, 900)
+    
+    assert first not in router.candidates(size=200)
+    assert first in router.candidates(size=100)
+
+def test_hash_keeps_a_key_on_the_same_account(tmp_path):
+    router = make_router(tmp_path, 'hash')
+    order = router.candidates('report.pdf')
+    
+    assert len(order) == 3
+    assert router.candidates('report.pdf') == order
+    assert make_router(tmp_path, 'hash').candidates('report.pdf')[0].name == order[0].name
+
+def test_hash_falls_over_to_the_next_account_on_the_ring(tmp_path):
+    router = make_router(tmp_path, 'hash')
+    order = router.candidates('report.pdf')
+    router.report_quota_error(order[0], 'quotaExceeded')
+    
+    assert router.candidates('report.pdf') == order[1:]
+    assert router.failovers == 1
+
+def test_repeated_rate_limits_back_off_longer(tmp_path):
+    router = make_router(tmp_path, 'least_used')
+    account = router.accounts[0]
+    router.report_quota_error(account, 'userRateLimitExceeded')
+    first_block = router.ledger.snapshot(max_age=0)[account.name]['blocked_until']
+    router.report_quota_error(account, 'userRateLimitExceeded')
+    
+    assert router.ledger.snapshot(max_age=0)[account.name]['blocked_until'] > first_block
+    assert router.ledger.strikes(account.name) == 2
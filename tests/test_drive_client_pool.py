@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from archive_utils import PipedUpload
+from drive_client_pool import DriveClientPool
+
+def make_pool(size):
+    built = []
+    
+    def build_client():
+        built.append(object())
+        return built[-1]
+    return DriveClientPool(build_client, size), built
+
+def test_returned_clients_are_reused():
+    pool, built = make_pool(2)
+    with pool.client() as first:
+        pass
+    with pool.client() as second:
+        assert second is first
+    
+    assert len(built) == 1
+    assert pool.stats()['checkouts'] == 2
+    assert pool.stats()['in_use'] == 0
+
+def test_checkout_blocks_until_a_client_is_returned():
+    pool, built = make_pool(1)
+    client = pool.acquire()
+    taken = []
+    waiter = threading.Thread(target=lambda: taken.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    
+    pool.release(client)
+    waiter.join(1)
+    assert taken == [client]
+    assert pool.stats()['waits'] == 1
+
+@pytest.mark.parametrize('error', [ConnectionError('reset'), OSError('broken pipe')])
+def test_client_is_dropped_after_a_transport_error(error):
+    pool, built = make_pool(1)
+    with pytest.raises(type(error)):
+        with pool.client():
+            raise error
+    
+    with pool.client() as client:
+        assert client is built[1]
+    assert pool.stats()['created'] == 1
+
+def test_nested_checkout_on_a_full_pool_does_not_deadlock():
+    # A Drive download streamed into a piped upload: whichever side takes the only
+    # client, the other must not wait for it while the pipe is full or empty
+    pool, built = make_pool(1)
+    
+    def consume(pipe):
+        with pool.client(wait=False):
+            return sum(len(chunk) for chunk in pipe)
+    
+    def produce():
+        upload = PipedUpload(consume)
+        with pool.client(wait=False):
+            for _ in range(upload.pipe.max_chunks * 2):
+                upload.write(b'x' * 1024)
+        results.append(upload.close())
+    
+    results = []
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    producer.join(2)
+    assert not producer.is_alive()
+    assert results == [32 * 1024]
+    assert pool.stats()['overflows'] == 1
+    assert pool.stats()['created'] == 1
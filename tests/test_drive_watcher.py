@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from drive_watcher import DriveWatcher, MirrorState
+
+FILE = {'id': 'f1', 'name': 'report.pdf', 'parents': ['folder'], 'mimeType': 'application/pdf'}
+
+def make_watcher(state, send_file):
+    drive = mock.Mock()
+    drive.iter_subfolders.return_value = []
+    drive.list_changes.return_value = ([], None, 'token-2')
+    drive.is_downloadable.return_value = True
+    return DriveWatcher(drive, send_file, ThreadPoolExecutor(max_workers=2), folder_id='folder', chat_id='chat',
+                        state=state)
+
+def test_failed_files_are_retried_after_a_restart(tmp_path):
+    state = MirrorState(str(tmp_path / 'state.db'))
+    state.set('page_token:folder', 'token-1')
+    
+    failing = make_watcher(state, mock.Mock(return_value=(None, 'Telegram is down')))
+    failing.google_drive.list_changes.return_value = ([{'file': FILE}], None, 'token-2')
+    assert failing.poll() == 0
+    
+    # A new process sees the queued file and sends it before reading new changes
+    send_file = mock.Mock(return_value=(True, None))
+    restarted = make_watcher(MirrorState(str(tmp_path / 'state.db')), send_file)
+    assert restarted.poll() == 1
+    assert send_file.call_args.args[2]['id'] == 'f1'
+    assert restarted.state.is_mirrored('f1')
+    assert restarted.state.pending_retries('folder') == []
+
+def test_files_are_given_up_after_max_attempts(tmp_path):
+    state = MirrorState(str(tmp_path / 'state.db'))
+    assert state.record_failure('folder', FILE, 2) == 1
+    assert state.is_pending_retry('f1')
+    assert state.record_failure('folder', FILE, 2) == 2
+    assert not state.is_pending_retry('f1')
+
+def test_lease_is_held_for_the_whole_poll(tmp_path):
+    state = MirrorState(str(tmp_path / 'state.db'))
+    assert state.acquire_lease('mirror:folder', 0.3)
+    
+    with state.hold_lease('mirror:folder', 0.3) as lost:
+        time.sleep(0.7)
+        expires = state._connection().execute('SELECT expires FROM leases').fetchone()[0]
+        assert expires > time.time()
+    assert not lost.is_set()
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from unittest import mock
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from drive_accounts import DriveAccount
+from google_drive_service import GoogleDriveService, FOLDER_MIME_TYPE
+
+def make_service(pages):
+    """A service whose files.list calls return the given pages, or raise them if they are exceptions"""
+    service = GoogleDriveService()
+    service._initialized = True
+    service.credentials = object()
+    
+    @contextmanager
+    def client(account=None, wait=True):
+        yield mock.MagicMock()
+    
+    service.client = client
+    service._execute = mock.Mock(side_effect=pages)
+    return service
+
+def test_iter_files_follows_pages():
+    service = make_service([
+        {'files': [{'id': 'a', 'name': 'a'}], 'nextPageToken': 'p2'},
+        {'files': [{'id': 'b', 'name': 'b'}]}
+    ])
+    assert [info['id'] for info in service.iter_files('folder')] == ['a', 'b']
+
+def test_iter_files_raises_when_a_page_fails():
+    service = make_service([
+        {'files': [{'id': 'a', 'name': 'a'}], 'nextPageToken': 'p2'},
+        RuntimeError('listing failed')
+    ])
+    files = service.iter_files('folder')
+    assert next(files)['id'] == 'a'
+    with pytest.raises(RuntimeError):
+        next(files)
+
+def test_walk_folder_propagates_listing_errors_from_subfolders():
+    service = make_service([
+        {'files': [{'id': 'sub', 'name': 'sub', 'mimeType': FOLDER_MIME_TYPE}]},
+        RuntimeError('listing failed')
+    ])
+    with pytest.raises(RuntimeError):
+        list(service.walk_folder('folder'))
+
+def test_find_by_sha256_searches_every_account():
+    service = make_service([
+        RuntimeError('account unavailable'),
+        {'files': []},
+        {'files': [{'id': 'copy', 'name': 'movie.mkv'}]}
+    ])
+    service.accounts = [DriveAccount({'client_email': f"account{index}@example.com"}) for index in range(4)]
+    
+    assert service.find_by_sha256('abc')['id'] == 'copy'
+    assert service._execute.call_count == 3
+
+def test_small_uploads_skip_the_duplicate_lookup(tmp_path):
+    path = tmp_path / 'note.txt'
+    path.write_bytes(b'hello')
+    service = make_service([])
+    service.find_by_sha256 = mock.Mock(return_value={'name': 'note.txt', 'webViewLink': 'old'})
+    service._upload_with_failover = mock.Mock(return_value={'id': 'new', 'name': 'note.txt', 'webViewLink': 'new'})
+    service._verify_upload = mock.Mock()
+    
+    with mock.patch('google_drive_service.Config.DEDUP_MIN_SIZE', 1024):
+        assert service.upload_file(str(path), 'note.txt') == 'new'
+    service.find_by_sha256.assert_not_called()
+    
+    with mock.patch('google_drive_service.Config.DEDUP_MIN_SIZE', 1):
+        assert service.upload_file(str(path), 'note.txt') == 'old'
+
+def test_corrupt_upload_is_deleted_on_the_account_that_stored_it(tmp_path):
+    path = tmp_path / 'movie.mkv'
+    path.write_bytes(b'hello')
+    primary, secondary = [DriveAccount({'client_email': f"account{index}@example.com"}) for index in range(2)]
+    clients = {primary.name: mock.MagicMock(), secondary.name: mock.MagicMock()}
+    quota_error = HttpError(httplib2.Response({'status': '403'}),
+                            b'{"error": {"errors": [{"reason": "quotaExceeded"}]}}')
+    
+    def execute(endpoint, request, classify=None, retry=True):
+        if endpoint == 'files.create' and request is clients[primary.name].files().create.return_value:
+            raise quota_error
+        if endpoint == 'files.create':
+            return {'id': 'corrupt', 'name': 'movie.mkv', 'size': '5', 'md5Checksum': 'not-the-md5'}
+        return {}
+    
+    service = make_service([])
+    service.accounts = [primary, secondary]
+    service.router = mock.Mock()
+    service.router.candidates.return_value = [primary, secondary]
+    
+    @contextmanager
+    def client(account=None, wait=True):
+        yield clients[(account or primary).name]
+    
+    service.client = client
+    service._execute = mock.Mock(side_effect=execute)
+    
+    assert service.upload_file(str(path), 'movie.mkv') is None
+    clients[secondary.name].files().delete.assert_called_once_with(fileId='corrupt')
+    clients[primary.name].files().delete.assert_not_called()
+    service.router.record_upload.assert_not_called()
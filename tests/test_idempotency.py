@@ -0,0 +1,50 @@
+from unittest import mock
+
+from idempotency import UpdateLedger
+
+def make_ledger(tmp_path, **kwargs):
+    return UpdateLedger(str(tmp_path / 'state.db'), **kwargs)
+
+def test_redelivered_update_is_claimed_once(tmp_path):
+    ledger = make_ledger(tmp_path)
+    assert ledger.claim_update(1)
+    assert not ledger.claim_update(1)
+    assert ledger.claim_update(2)
+    assert ledger.get_stats()['duplicate_updates'] == 1
+
+def test_workers_share_the_ledger(tmp_path):
+    assert make_ledger(tmp_path).claim_update(7)
+    assert not make_ledger(tmp_path).claim_update(7)
+
+def test_only_the_newest_window_of_updates_is_kept(tmp_path):
+    ledger = make_ledger(tmp_path, window=10)
+    ledger.PRUNE_EVERY = 1
+    for update_id in range(1, 31):
+        ledger.claim_update(update_id)
+    
+    # Pruned ids count as new again; recent ones are still duplicates
+    assert ledger.claim_update(5)
+    assert not ledger.claim_update(30)
+
+def test_job_claim_blocks_until_released(tmp_path):
+    ledger = make_ledger(tmp_path)
+    assert ledger.claim_job('url:https://example.com/a')
+    assert not make_ledger(tmp_path).claim_job('url:https://example.com/a')
+    
+    ledger.release_job('url:https://example.com/a')
+    assert make_ledger(tmp_path).claim_job('url:https://example.com/a')
+
+def test_stale_job_claim_can_be_retaken(tmp_path):
+    ledger = make_ledger(tmp_path, job_ttl=60)
+    with mock.patch('idempotency.time.time', return_value=1000):
+        assert ledger.claim_job('file:abc')
+    with mock.patch('idempotency.time.time', return_value=1030):
+        assert not ledger.claim_job('file:abc')
+    with mock.patch('idempotency.time.time', return_value=1061):
+        assert ledger.claim_job('file:abc')
+
+def test_broken_database_fails_open(tmp_path):
+    ledger = make_ledger(tmp_path)
+    ledger.path = str(tmp_path)
+    assert ledger.claim_update(1)
+    assert ledger.claim_job('file:abc')
@@ -0,0 +1,50 @@
+import json
+import logging
+import queue
+import sys
+
+from log_utils import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+def make_record(msg='hello %s', args=('world',), level=logging.INFO, **extra):
+    record = logging.LogRecord('bot', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_sampling_keeps_one_in_every_n_per_key():
+    sampler = SamplingFilter(every=3)
+    kept = [sampler.filter(make_record(sample='upload')) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    
+    assert sampler.filter(make_record(sample='download'))
+    assert all(sampler.filter(make_record()) for _ in range(5))
+
+def test_json_formatter_writes_one_object_with_extra_fields():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = make_record(level=logging.ERROR, chat_id=42, sample='upload')
+        record.exc_info = sys.exc_info()
+    
+    line = JsonFormatter().format(record)
+    entry = json.loads(line)
+    assert '\n' not in line
+    assert entry['msg'] == 'hello world'
+    assert entry['level'] == 'ERROR'
+    assert entry['logger'] == 'bot'
+    assert entry['chat_id'] == 42
+    assert 'sample' not in entry
+    assert 'ValueError: boom' in entry['exc']
+    assert entry['ts'].endswith('Z')
+
+def test_queued_record_keeps_the_message_as_it_was_logged():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    state = {'progress': 10}
+    handler.handle(make_record('progress %s', (state,)))
+    state['progress'] = 90
+    
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "progress {'progress': 10}"
+    
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.dropped == 1
@@ -0,0 +1,31 @@
+import threading
+import time
+
+from media_group_service import MediaGroupCollector
+
+def test_album_is_flushed_once_with_every_item_after_the_window():
+    flushed = []
+    done = threading.Event()
+    
+    def on_flush(chat_id, items):
+        flushed.append((chat_id, items))
+        done.set()
+    
+    collector = MediaGroupCollector(on_flush, window=0.2)
+    adders = [threading.Thread(target=collector.add, args=('album', 1, {'file_id': str(index)}, 'photo'))
+              for index in range(5)]
+    for adder in adders:
+        adder.start()
+    for adder in adders:
+        adder.join()
+    
+    assert flushed == []
+    assert collector.pending_groups() == 1
+    
+    assert done.wait(2)
+    time.sleep(0.3)
+    assert len(flushed) == 1
+    chat_id, items = flushed[0]
+    assert chat_id == 1
+    assert sorted(info['file_id'] for info, file_type in items) == ['0', '1', '2', '3', '4']
+    assert collector.pending_groups() == 0
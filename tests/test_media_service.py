@@ -0,0 +1,69 @@
+import struct
+from unittest import mock
+
+from media_service import MediaResult, MediaService, is_faststart
+
+def box(kind, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+def probe(format_name):
+    return {'format': {'format_name': format_name, 'duration': '10'},
+            'streams': [{'codec_type': 'video', 'codec_name': 'h264'}, {'codec_type': 'audio', 'codec_name': 'opus'}]}
+
+def run_apply(path, filename, format_name):
+    service = MediaService()
+    result = MediaResult(str(path), filename)
+    with mock.patch.object(service, '_probe', return_value=probe(format_name)), \
+            mock.patch.object(service, '_transcode') as transcode:
+        service._apply(result, thumbnail=False, compress=True)
+    return transcode
+
+def test_faststart_is_read_from_the_box_order(tmp_path):
+    path = tmp_path / 'a.mp4'
+    path.write_bytes(box(b'ftyp', b'isom') + box(b'moov') + box(b'mdat', b'x' * 16))
+    assert is_faststart(str(path))
+    
+    path.write_bytes(box(b'ftyp', b'isom') + box(b'mdat', b'x' * 16) + box(b'moov'))
+    assert not is_faststart(str(path))
+
+def test_slow_start_mp4_is_remuxed_in_place_with_every_stream(tmp_path):
+    path = tmp_path / 'clip.MOV'
+    path.write_bytes(box(b'ftyp', b'qt  ') + box(b'mdat', b'x' * 16) + box(b'moov'))
+    
+    transcode = run_apply(path, 'clip.MOV', 'mov,mp4,m4a,3gp,3g2,mj2')
+    (_, action, filename, muxer, _, options), _ = transcode.call_args
+    assert (action, filename, muxer) == ('remux', 'clip.MOV', 'mov')
+    assert options == ['-map', '0', '-c', 'copy']
+
+def test_other_containers_and_faststart_files_are_left_alone(tmp_path):
+    path = tmp_path / 'clip.mkv'
+    path.write_bytes(b'\x1aE\xdf\xa3' + b'x' * 16)
+    run_apply(path, 'clip.mkv', 'matroska,webm').assert_not_called()
+    
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(box(b'ftyp', b'isom') + box(b'moov') + box(b'mdat', b'x' * 16))
+    run_apply(path, 'clip.mp4', 'mov,mp4,m4a,3gp,3g2,mj2').assert_not_called()
+
+def test_album_items_go_through_the_media_stage(tmp_path):
+    from bot_handlers import BotHandler
+    
+    original = tmp_path / 'clip.mp4'
+    remuxed = tmp_path / 'remuxed.mp4'
+    original.write_bytes(b'old')
+    remuxed.write_bytes(b'new')
+    media = MediaResult(str(original), 'clip.mp4')
+    media.path = str(remuxed)
+    media.spool_files = [str(remuxed)]
+    
+    handler = BotHandler.__new__(BotHandler)
+    handler.max_telegram_file_size = lambda: 1024
+    handler.download_telegram_file = mock.Mock(return_value=str(original))
+    handler.media_service = mock.Mock()
+    handler.media_service.process.return_value = media
+    handler.google_drive = mock.Mock()
+    handler.google_drive.upload_file.return_value = 'link'
+    handler.file_utils = mock.Mock()
+    
+    assert handler.transfer_album_item({'file_id': 'f', 'file_name': 'clip.mp4', 'file_size': 3}) == \
+        ('clip.mp4', 'link', None)
+    handler.google_drive.upload_file.assert_called_once_with(str(remuxed), 'clip.mp4', None)
@@ -0,0 +1,110 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from bot_handlers import BotHandler
+from resilience import CircuitBreaker, CircuitOpenError, Resilience, TransientError, is_rate_limited, is_unsent
+
+@pytest.fixture(autouse=True)
+def no_backoff():
+    with mock.patch('resilience.Config.RETRY_BASE_DELAY', 0):
+        yield
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert not breaker.allow()
+    assert breaker.get_stats()['short_circuits'] == 1
+
+def test_breaker_lets_one_probe_through_after_the_reset_timeout():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+    with mock.patch('resilience.time.monotonic', return_value=100):
+        breaker.allow()
+        breaker.record_failure()
+    
+    with mock.patch('resilience.time.monotonic', return_value=131):
+        assert breaker.allow()
+        assert breaker.state == breaker.HALF_OPEN
+        assert not breaker.allow()
+        
+        # A permanent error frees the probe without judging the endpoint
+        breaker.release_probe()
+        assert breaker.allow()
+        breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker('test', failure_threshold=5, reset_timeout=30)
+    breaker.state = breaker.HALF_OPEN
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+def test_call_retries_transient_errors_only():
+    resilience = Resilience()
+    func = mock.Mock(side_effect=[TransientError('503', status=503), 'ok'])
+    assert resilience.call('test', func) == 'ok'
+    assert func.call_count == 2
+    
+    func = mock.Mock(side_effect=ValueError('bad request'))
+    with pytest.raises(ValueError):
+        resilience.call('test', func)
+    assert func.call_count == 1
+
+def test_open_circuit_fails_fast():
+    resilience = Resilience()
+    resilience.breaker('test').state = CircuitBreaker.OPEN
+    resilience.breaker('test').opened_at = float('inf')
+    func = mock.Mock()
+    with pytest.raises(CircuitOpenError):
+        resilience.call('test', func)
+    func.assert_not_called()
+
+def test_unsent_predicate_repeats_only_what_the_server_never_ran():
+    resilience = Resilience()
+    func = mock.Mock(side_effect=[TransientError('429', status=429), 'ok'])
+    assert resilience.call('test', func, retry=is_unsent) == 'ok'
+    
+    func = mock.Mock(side_effect=TransientError('502', status=502))
+    with pytest.raises(TransientError):
+        resilience.call('test', func, retry=is_unsent)
+    assert func.call_count == 1
+    assert resilience.breaker('test').get_stats()['failures'] == 1
+    
+    assert is_unsent(requests.ConnectTimeout())
+    assert not is_unsent(requests.ReadTimeout())
+
+def test_send_message_is_not_repeated_after_a_server_error():
+    handler = BotHandler.__new__(BotHandler)
+    handler.api_url = 'https://api.telegram.org/bottest'
+    response = mock.Mock(status_code=502)
+    response.json.return_value = {}
+    
+    with mock.patch('bot_handlers.requests.request', return_value=response) as request:
+        assert handler.send_message(1, 'hello') is False
+    assert request.call_count == 1
+    assert request.call_args.kwargs['timeout']
+
+def test_rate_limits_back_off_without_opening_the_circuit():
+    resilience = Resilience()
+    breaker = resilience.breaker('test')
+    breaker.failure_threshold = 1
+    func = mock.Mock(side_effect=[TransientError('429', retry_after=0, status=429),
+                                  TransientError('slow down', retry_after=0), 'ok'])
+    
+    assert resilience.call('test', func) == 'ok'
+    stats = breaker.get_stats()
+    assert stats['state'] == CircuitBreaker.CLOSED
+    assert stats['failures'] == 0
+    assert stats['rate_limited'] == 2
+    assert not is_rate_limited(TransientError('503', status=503))
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+def test_concurrent_callers_share_the_leaders_result():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'link'
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('url:a', fetch)))
+    leader.start()
+    started.wait(5)
+    
+    followers = [threading.Thread(target=lambda: results.append(flight.do('url:a', fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.get_stats()['coalesced'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    
+    assert len(calls) == 1
+    assert sorted(results) == [('link', False)] + [('link', True)] * 3
+    assert flight.get_stats() == {'leaders': 1, 'coalesced': 3, 'in_flight': 0}
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    
+    def fetch():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('download failed')
+    
+    errors = []
+    
+    def call():
+        try:
+            flight.do('url:a', fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+    
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.get_stats()['coalesced'] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    
+    assert errors == ['download failed', 'download failed']
+
+def test_finished_key_runs_afresh():
+    flight = SingleFlight()
+    assert flight.do('url:a', lambda: 1) == (1, False)
+    assert flight.do('url:a', lambda: 2) == (2, False)
+    with pytest.raises(ValueError):
+        flight.do('url:b', lambda: int('x'))
+    assert flight.get_stats()['in_flight'] == 0
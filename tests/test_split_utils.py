@@ -0,0 +1,88 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from bot_handlers import BotHandler
+from config import Config
+from split_utils import JoinSession, build_manifest, iter_part_ranges, part_name
+
+def test_part_ranges_cover_the_file():
+    assert list(iter_part_ranges(25, 10)) == [(1, 0, 10), (2, 10, 20), (3, 20, 25)]
+    assert list(iter_part_ranges(0, 10)) == []
+
+def test_join_session_orders_by_part_number_without_manifest():
+    session = JoinSession()
+    for index in (3, 1, 2):
+        session.add_part(part_name('movie.mkv', index), {'file_id': str(index)})
+    session.add_part('unrelated.txt', {'file_id': 'x'})
+    
+    assert [name for name, _ in session.ordered_parts()] == ['movie.mkv.001', 'movie.mkv.002', 'movie.mkv.003']
+    assert session.target_name() == 'movie.mkv'
+    assert not session.is_complete()
+
+def test_join_session_completes_from_manifest():
+    manifest = json.loads(build_manifest('movie.mkv', 25, 10, [('movie.mkv.001', 10), ('movie.mkv.002', 10),
+                                                               ('movie.mkv.003', 5)]))
+    session = JoinSession()
+    session.set_manifest(manifest)
+    session.add_part('movie.mkv.002', {})
+    assert session.missing_parts() == ['movie.mkv.001', 'movie.mkv.003']
+    
+    session.add_part('movie.mkv.001', {})
+    session.add_part('movie.mkv.003', {})
+    assert session.is_complete()
+    assert session.total_size() == 25
+
+def test_split_upload_succeeds_when_only_the_note_fails(tmp_path):
+    path = tmp_path / 'big.bin'
+    path.write_bytes(b'x' * 25)
+    
+    handler = BotHandler.__new__(BotHandler)
+    handler.part_upload_pool = ThreadPoolExecutor(max_workers=2)
+    handler.send_buffer_to_telegram = mock.Mock(return_value='file-id')
+    handler.send_message = mock.Mock(return_value=False)
+    
+    with mock.patch('bot_handlers.Config.SPLIT_PART_SIZE', 10):
+        assert handler.send_file_in_parts(1, str(path), 'big.bin') is True
+    # Three parts plus the manifest
+    assert handler.send_buffer_to_telegram.call_count == 4
+
+def make_join_handler():
+    handler = BotHandler.__new__(BotHandler)
+    handler.join_sessions = {1: JoinSession()}
+    handler.send_message = mock.Mock(return_value=True)
+    handler.handle_file_message = mock.Mock(return_value=True)
+    handler.media_groups = mock.Mock()
+    return handler
+
+def test_default_parts_can_be_fetched_back_for_join():
+    assert Config.SPLIT_PART_SIZE <= Config.TELEGRAM_DOWNLOAD_LIMIT
+
+def test_only_parts_and_manifests_join_an_open_session():
+    handler = make_join_handler()
+    handler.handle_message(1, {'document': {'file_id': 'a', 'file_name': 'movie.mkv.001', 'file_size': 10}})
+    handler.handle_message(1, {'document': {'file_id': 'b', 'file_name': 'holiday.jpg', 'file_size': 10}})
+    handler.handle_message(1, {'photo': [{'file_id': 'c', 'file_size': 10}]})
+    
+    assert list(handler.join_sessions[1].parts) == ['movie.mkv.001']
+    # The photo and the unrelated document are uploaded as usual, with a note that /join is still open
+    assert handler.handle_file_message.call_count == 2
+    assert handler.send_message.call_count == 2
+
+def test_parts_too_large_to_fetch_are_refused():
+    handler = make_join_handler()
+    size = handler.max_telegram_file_size() + 1
+    handler.handle_join_part(1, {'file_id': 'a', 'file_name': 'movie.mkv.001', 'file_size': size})
+    
+    assert handler.join_sessions[1].parts == {}
+    assert 'cannot be joined' in handler.send_message.call_args.args[1]
+
+def test_idle_join_session_expires():
+    handler = make_join_handler()
+    with mock.patch('bot_handlers.Config.JOIN_SESSION_TTL', 0), mock.patch('split_utils.time.monotonic',
+                                                                          return_value=time.monotonic() + 1):
+        handler.handle_message(1, {'document': {'file_id': 'a', 'file_name': 'movie.mkv.001', 'file_size': 10}})
+    
+    assert 1 not in handler.join_sessions
+    handler.handle_file_message.assert_called_once()
@@ -0,0 +1,72 @@
+import datetime
+import threading
+import time
+
+from token_cache import TokenCache, TokenManager
+
+class FakeCredentials:
+    """Service account credentials whose refresh mints numbered tokens valid for an hour"""
+    
+    service_account_email = 'bot@example.com'
+    scopes = ['https://www.googleapis.com/auth/drive']
+    
+    def __init__(self):
+        self.token = None
+        self.expiry = None
+        self.refreshes = 0
+        self.lock = threading.Lock()
+    
+    def refresh(self, request):
+        with self.lock:
+            self.refreshes += 1
+            self.token = f"token-{self.refreshes}"
+        time.sleep(0.05)
+        self.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(hours=1)
+
+def make_manager(tmp_path, credentials=None):
+    return TokenManager(credentials or FakeCredentials(), TokenCache(str(tmp_path / 'tokens.json')))
+
+def test_cached_token_skips_the_refresh(tmp_path):
+    manager = make_manager(tmp_path)
+    with manager.cache.locked():
+        manager.cache.write(manager.key, 'shared-token', time.time() + 3600)
+    
+    manager.ensure_fresh()
+    assert manager.credentials.token == 'shared-token'
+    assert manager.credentials.refreshes == 0
+    assert manager.stats['cache_hits'] == 1
+    assert manager.seconds_left() > manager.refresh_margin
+
+def test_expired_token_is_refreshed_once_across_threads(tmp_path):
+    credentials = FakeCredentials()
+    credentials.token = 'old-token'
+    credentials.expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(seconds=1)
+    # One cache object per manager, like separate workers sharing the file
+    managers = [make_manager(tmp_path, credentials) for _ in range(8)]
+    with managers[0].cache.locked():
+        managers[0].cache.write(managers[0].key, 'old-token', time.time() - 1)
+    
+    threads = [threading.Thread(target=manager.ensure_fresh) for manager in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert credentials.refreshes == 1
+    assert credentials.token == 'token-1'
+
+def test_corrupt_cache_file_falls_back_to_a_fresh_token(tmp_path):
+    manager = make_manager(tmp_path)
+    (tmp_path / 'tokens.json').write_text('{not json')
+    
+    manager.ensure_fresh()
+    assert manager.credentials.token == 'token-1'
+    assert manager.cache.read(manager.key)[0] == 'token-1'
+
+def test_missing_cache_file_falls_back_to_a_fresh_token(tmp_path):
+    manager = make_manager(tmp_path)
+    assert manager.cache.read(manager.key) == (None, None)
+    
+    manager.ensure_fresh()
+    assert manager.credentials.refreshes == 1
+    assert make_manager(tmp_path).cache.read(manager.key)[0] == 'token-1'
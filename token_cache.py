@@ -0,0 +1,182 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from config import Config
+from resilience import resilience
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+
+_credentials_cache = {}
+_credentials_lock = threading.Lock()
+
+def get_service_account_credentials(credentials_dict, scopes=None):
+    """Build service account credentials once per key and scope set"""
+    scopes = tuple(scopes or DRIVE_SCOPES)
+    key = (credentials_dict.get('client_email'), credentials_dict.get('private_key_id'), scopes)
+    with _credentials_lock:
+        credentials = _credentials_cache.get(key)
+        if credentials is None:
+            credentials = Credentials.from_service_account_info(credentials_dict, scopes=list(scopes))
+            _credentials_cache[key] = credentials
+        return credentials
+
+class TokenCache:
+    """
+    Access tokens shared by every worker on the host through a JSON file.
+    Reads and writes happen under an exclusive flock, so only one worker
+    mints a new token while the others pick it up from the file.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or os.path.join(Config.TOKEN_CACHE_DIR, 'drive_tokens.json')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._thread_lock = threading.Lock()
+    
+    def locked(self):
+        """Exclusive lock across threads and worker processes"""
+        return FileLock(f"{self.path}.lock", self._thread_lock)
+    
+    def read(self, key):
+        """Return (token, expiry_timestamp) for a key, or (None, None); call while locked"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f).get(key)
+            if entry:
+                return entry['token'], entry['expiry']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None, None
+    
+    def write(self, key, token, expiry):
+        """Store a token atomically; call while locked"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        
+        now = time.time()
+        entries = {k: v for k, v in entries.items() if v.get('expiry', 0) > now}
+        entries[key] = {'token': token, 'expiry': expiry}
+        
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+class FileLock:
+    """Exclusive lock shared by the threads of this process and by other worker processes"""
+    
+    def __init__(self, path, thread_lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.fd = None
+    
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except Exception:
+            self.thread_lock.release()
+            raise
+        return self
+    
+    def __exit__(self, *exc):
+        try:
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+        finally:
+            self.thread_lock.release()
+
+class TokenManager:
+    """
+    Keeps a credential's access token fresh ahead of expiry.
+    A background thread refreshes the token TOKEN_REFRESH_MARGIN seconds
+    before it expires, taking it from the shared cache when another worker
+    already minted one, so request paths never wait on the token endpoint.
+    """
+    
+    def __init__(self, credentials, cache=None):
+        self.credentials = credentials
+        self.cache = cache or TokenCache()
+        self.key = hashlib.sha256(
+            f"{credentials.service_account_email}:{' '.join(sorted(credentials.scopes or []))}".encode('utf-8')
+        ).hexdigest()[:32]
+        self.refresh_margin = Config.TOKEN_REFRESH_MARGIN
+        self.stats = {'refreshes': 0, 'cache_hits': 0, 'failures': 0, 'last_error': None}
+        self._thread = None
+    
+    def _expiry_timestamp(self):
+        expiry = self.credentials.expiry
+        if not expiry:
+            return 0
+        return expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+    
+    def seconds_left(self):
+        if not self.credentials.token:
+            return 0
+        return self._expiry_timestamp() - time.time()
+    
+    def ensure_fresh(self):
+        """Make sure the credential holds a token valid for at least the refresh margin"""
+        if self.seconds_left() > self.refresh_margin:
+            return
+        
+        with self.cache.locked():
+            token, expiry = self.cache.read(self.key)
+            if token and expiry - time.time() > self.refresh_margin:
+                self.credentials.token = token
+                self.credentials.expiry = datetime.datetime.fromtimestamp(
+                    expiry, datetime.timezone.utc).replace(tzinfo=None)
+                self.stats['cache_hits'] += 1
+                return
+            
+            resilience.call('google:token', self.credentials.refresh, Request())
+            self.stats['refreshes'] += 1
+            self.cache.write(self.key, self.credentials.token, self._expiry_timestamp())
+            logger.info("Refreshed Google Drive access token")
+    
+    def start(self):
+        """Start the background refresher"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='token-refresher', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        retry_delay = 5
+        while True:
+            try:
+                self.ensure_fresh()
+                self.stats['last_error'] = None
+                retry_delay = 5
+                sleep_for = max(self.seconds_left() - self.refresh_margin, 5)
+            except Exception as e:
+                self.stats['failures'] += 1
+                self.stats['last_error'] = str(e)
+                logger.error(f"Error refreshing Google Drive access token: {str(e)}")
+                sleep_for = retry_delay
+                retry_delay = min(retry_delay * 2, 300)
+            time.sleep(sleep_for)
+    
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['expires_in'] = max(int(self.seconds_left()), 0)
+        return stats